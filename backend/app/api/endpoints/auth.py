@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.db.database import get_db
@@ -8,19 +9,32 @@ from pydantic import BaseModel
 
 router = APIRouter()
 
+def buscar_usuario(db: Session, username: str):
+    usuario = db.query(models.Usuario).filter(models.Usuario.username == username).first()
+    # Devolver la conexión al pool ANTES de esperar a bcrypt: si no, una ola
+    # de logins en cola acapara las conexiones y bloquea al resto de la API
+    db.close()
+    return usuario
+
+def guardar_hash(db: Session, usuario_id: int, nuevo_hash: str):
+    db.query(models.Usuario).filter(models.Usuario.id == usuario_id).update(
+        {models.Usuario.hashed_password: nuevo_hash}, synchronize_session=False
+    )
+    db.commit()
+
 @router.post("/token")
-def login_para_token(
+async def login_para_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
 ):
     """
     Login con códigos de error especiales para el frontend.
+    Es async: la consulta va al threadpool y bcrypt al pool dedicado, así
+    una ola de logins no deja sin workers a los demás endpoints.
     """
 
     # 1. Buscar usuario
-    usuario = db.query(models.Usuario).filter(
-        models.Usuario.username == form_data.username
-    ).first()
+    usuario = await run_in_threadpool(buscar_usuario, db, form_data.username)
 
     # 451 → Usuario no encontrado
     if not usuario:
@@ -36,12 +50,16 @@ def login_para_token(
             detail="Usuario inactivo"
         )
 
-    # 452 → Credenciales incorrectas
-    if not security.verify_password(form_data.password, usuario.hashed_password):
+    # 452 → Credenciales incorrectas (503 si el pool de bcrypt está saturado)
+    valida, nuevo_hash = await security.verificar_password_async(form_data.password, usuario.hashed_password)
+    if not valida:
         raise HTTPException(
             status_code=452,
             detail="Credenciales incorrectas"
         )
+    if nuevo_hash:
+        # BCRYPT_REHASH: el costo configurado cambió → guardar el hash nuevo
+        await run_in_threadpool(guardar_hash, db, usuario.id, nuevo_hash)
 
     # 453 → Usuario no permitido (si aplica)
     # Ejemplo: solo admins pueden ingresar
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from app.core.security import get_current_user
+from app.core.catalogos import catalogos
+
+router = APIRouter()
+
+
+# -----------------------------------------
+# GET /catalogos → pabellones + tipos de cirugía
+# -----------------------------------------
+@router.get("/")
+async def obtener_catalogos(request: Request, usuario=Depends(get_current_user)):
+    """
+    Ambos catálogos en una respuesta, ya serializada en memoria y con su
+    versión (también como ETag): con If-None-Match vigente responde 304.
+    """
+    version, cuerpo = catalogos.serializado()
+    etag = f'"catalogos-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        raise HTTPException(status_code=304, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
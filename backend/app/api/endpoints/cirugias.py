@@ -1,17 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import inspect, update
+from typing import List, Optional
 from datetime import datetime, date, time, timedelta
+from functools import partial
 from pydantic import BaseModel
 
-from app.db.database import get_db
+from app.db.database import get_db, get_db_async, en_sesion
 from app.db import models
 from app.core.security import get_current_user
-from app.schemas.cirugia import CirugiaCreate, CirugiaUpdate, CirugiaOut
+from app.schemas.cirugia import (
+    CirugiaCreate, CirugiaUpdate, CirugiaOut, CirugiaExpandida, CirugiaTablero, PabellonTablero,
+    CirugiaEliminadaOut, CambiosCirugias, PropuestaIntervalo, ResultadoValidacion,
+    SlotLibre, SolicitudSlot, ResultadoSlot, SolicitudPlan, PlanDia, CirugiaImportada
+)
+from app.schemas.importacion import ReporteImportacion
 from app.db.models import EstadoCirugia
+from app.core.scheduler import scheduler
+from app.core.eventos import hub
+from app.core import agenda
+from app.core.agenda import TIEMPO_ASEO
+from app.core.bloqueos import bloqueo_agenda
+from app.core import planificador
+from app.core import importacion, paginacion
+from app.core.catalogos import catalogos
+from app.core import metricas
+from app.core import delta
 
 router = APIRouter()
-TIEMPO_ASEO = 30
+log = logging.getLogger(__name__)
 
 # --- HELPERS ---
 def combinar_fecha_hora(fecha: date, hora: time) -> datetime:
@@ -22,31 +43,43 @@ def calcular_fin(fecha: date, hora_inicio: time, duracion: int, extra: int = 0)
 
 def hay_solapamiento(i1, f1, i2, f2): return not (f1 <= i2 or i1 >= f2)
 
-# 🔥 LÓGICA AUTOMÁTICA MEJORADA 🔥
+# 🔥 LÓGICA AUTOMÁTICA (SET-BASED) 🔥
 def actualizar_estados_automaticos(db: Session):
+    """
+    Dos UPDATE masivos apoyados en los índices (estado, inicio_ts) y
+    (estado, fin_estimado_ts): el costo depende solo de las filas que cambian.
+    Devuelve los ids activados y los ids complicados.
+    """
     ahora = datetime.now()
-    # Buscamos SOLO las programadas o en curso
-    cirugias = db.query(models.Cirugia).filter(models.Cirugia.estado.in_([EstadoCirugia.PROGRAMADA, EstadoCirugia.EN_CURSO])).all()
-    
-    for c in cirugias:
-        inicio_real = combinar_fecha_hora(c.fecha, c.hora_inicio)
-        fin_estimado = inicio_real + timedelta(minutes=c.duracion_programada + (c.extra_time or 0))
-        
-        # 1. PASAR A EN CURSO AUTOMÁTICAMENTE
-        if c.estado == EstadoCirugia.PROGRAMADA:
-            # Si ya es la hora (o pasó la hora), se activa
-            if ahora >= inicio_real:
-                print(f"⚡ ACTIVANDO CIRUGÍA ID {c.id}: {inicio_real} vs {ahora}")
-                c.estado = EstadoCirugia.EN_CURSO
-                db.add(c)
-
-        # 2. PASAR A COMPLICADA (OPCIONAL: SI SE PASA DEL TIEMPO)
-        elif c.estado == EstadoCirugia.EN_CURSO:
-            if ahora >= fin_estimado:
-                c.estado = EstadoCirugia.COMPLICADA
-                db.add(c)
+    seq = models.cambio_pendiente(db)
+
+    # 1. PASAR A EN CURSO AUTOMÁTICAMENTE
+    activadas = db.execute(
+        update(models.Cirugia)
+        .where(models.Cirugia.estado == EstadoCirugia.PROGRAMADA, models.Cirugia.inicio_ts <= ahora)
+        .values(estado=EstadoCirugia.EN_CURSO, cambio_seq=seq, actualizado_en=ahora)
+        .returning(models.Cirugia.id, models.Cirugia.pabellon_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # 2. PASAR A COMPLICADA (SI SE PASA DEL TIEMPO)
+    complicadas = db.execute(
+        update(models.Cirugia)
+        .where(models.Cirugia.estado == EstadoCirugia.EN_CURSO, models.Cirugia.fin_estimado_ts <= ahora)
+        .values(estado=EstadoCirugia.COMPLICADA, cambio_seq=seq, actualizado_en=ahora)
+        .returning(models.Cirugia.id, models.Cirugia.pabellon_id)
+        .execution_options(synchronize_session=False)
+    ).all()
 
     db.commit()
+    metricas.TRANSICIONES.inc("endpoint", EstadoCirugia.EN_CURSO.value, valor=len(activadas))
+    metricas.TRANSICIONES.inc("endpoint", EstadoCirugia.COMPLICADA.value, valor=len(complicadas))
+    for cid, pid in activadas:
+        log.debug("Cirugía %s activada (EN_CURSO)", cid)
+        hub.publicar("estado", id=cid, pabellon_id=pid, estado=EstadoCirugia.EN_CURSO.value)
+    for cid, pid in complicadas:
+        hub.publicar("estado", id=cid, pabellon_id=pid, estado=EstadoCirugia.COMPLICADA.value)
+    return [cid for cid, _ in activadas], [cid for cid, _ in complicadas]
 
 def cirugia_to_out(c):
     return CirugiaOut(
@@ -57,34 +90,342 @@ def cirugia_to_out(c):
         hora_fin_estimada=calcular_fin(c.fecha, c.hora_inicio, c.duracion_programada, c.extra_time or 0)
     )
 
+# expand= → relación y columnas que se agregan inline (ver CirugiaExpandida)
+EXPANSIONES = {
+    "paciente": (models.Cirugia.paciente_rel, {"paciente_nombre": models.Paciente.nombre, "paciente_rut": models.Paciente.rut}),
+    "doctor": (models.Cirugia.doctor_rel, {"doctor_nombre": models.Usuario.nombre_completo}),
+    "tipo": (models.Cirugia.tipo_cirugia_rel, {"tipo_nombre": models.TipoCirugia.nombre, "tipo_duracion": models.TipoCirugia.duracion_estimada}),
+    "pabellon": (models.Cirugia.pabellon_rel, {"pabellon_nombre": models.Pabellon.nombre}),
+}
+
+def expansiones_pedidas(expand: Optional[str]):
+    pedidas = [e.strip() for e in (expand or "").split(",") if e.strip()]
+    desconocidas = [e for e in pedidas if e not in EXPANSIONES]
+    if desconocidas:
+        raise HTTPException(400, f"Expansiones no disponibles: {', '.join(desconocidas)} (permitidas: {', '.join(EXPANSIONES)})")
+    return list(dict.fromkeys(pedidas))
+
+def cirugia_expandida(c, expansiones):
+    # Las relaciones vienen cargadas por joinedload: no hay lazy-load por fila
+    extra = {}
+    for nombre in expansiones:
+        relacion, columnas = EXPANSIONES[nombre]
+        rel = getattr(c, relacion.key)
+        extra.update({campo: getattr(rel, col.key) if rel is not None else None for campo, col in columnas.items()})
+    return CirugiaExpandida(**cirugia_to_out(c).dict(), **extra)
+
+def publicar_cambio(tipo: str, c, **extra):
+    # Evento compacto hacia los tableros conectados (WebSocket/SSE)
+    hub.publicar(tipo, id=c.id, pabellon_id=c.pabellon_id, cirugia=jsonable_encoder(cirugia_to_out(c)), **extra)
+
+def exigir_horario_libre(db: Session, c):
+    # Revalida una cirugía ya modificada en memoria (sin flush) contra su pabellón/día
+    if c.estado in agenda.ESTADOS_LIBRES: return
+    agenda.exigir_disponible(db, c.pabellon_id, c.fecha, c.hora_inicio,
+                             c.duracion_programada, c.extra_time, excluir=c.id)
+
+CAMPOS_HORARIO = ("pabellon_id", "fecha", "hora_inicio", "duracion_programada", "extra_time")
+
+def valor_cargado(c, campo):
+    # Lo que tenía la fila al cargarla, aunque ya se haya modificado en memoria
+    historia = inspect(c).attrs[campo].history
+    return (historia.deleted or historia.unchanged or [getattr(c, campo)])[0]
+
+def exigir_sin_cambios_concurrentes(db: Session, c):
+    # La cirugía se cargó antes del bloqueo: si otro request la movió o
+    # reprogramó (o reactivó) entre medio, validar con los datos viejos dejaría
+    # una reserva doble (el UPDATE solo escribe las columnas modificadas aquí).
+    # Del estado solo importa si ocupa horario: el scheduler lo avanza solo.
+    with db.no_autoflush:
+        fila = db.query(*(getattr(models.Cirugia, campo) for campo in CAMPOS_HORARIO), models.Cirugia.estado) \
+            .filter(models.Cirugia.id == c.id).first()
+    if fila is None:
+        raise HTTPException(404, "No existe")
+    *horario, estado_actual = fila
+    cargado = [valor_cargado(c, campo) for campo in CAMPOS_HORARIO]
+    if horario != cargado or \
+            (estado_actual in agenda.ESTADOS_LIBRES) != (valor_cargado(c, "estado") in agenda.ESTADOS_LIBRES):
+        raise HTTPException(409, "La cirugía cambió mientras se editaba, vuelva a intentarlo")
+
+def guardar_reprogramada(db: Session, c):
+    # Verificar + commit bajo el bloqueo del pabellón/día de origen y de destino
+    # (ver core/bloqueos.py): así dos cambios a la misma cirugía se serializan
+    origen = (valor_cargado(c, "pabellon_id"), valor_cargado(c, "fecha"))
+    with bloqueo_agenda(db, origen, (c.pabellon_id, c.fecha)):
+        exigir_sin_cambios_concurrentes(db, c)
+        exigir_horario_libre(db, c)
+        db.commit()
+    db.refresh(c)
+
 # --- ENDPOINTS ---
 
-@router.get("/", response_model=List[CirugiaOut])
-def listar_cirugias(pabellon_id: int | None = None, fecha: date | None = None, db: Session = Depends(get_db)):
-    q = db.query(models.Cirugia)
+@router.get("/tablero", response_model=List[PabellonTablero])
+async def tablero(desde: date | None = None, hasta: date | None = None, db=Depends(get_db_async)):
+    """
+    Snapshot completo del tablero: todos los pabellones con sus cirugías
+    (y nombres de paciente, doctor, tipo y pabellón, ver CirugiaExpandida)
+    en UNA sola consulta, agrupada aquí.
+    """
+    return await en_sesion(db, consultar_tablero, desde, hasta)
+
+def consultar_tablero(db: Session, desde: date | None, hasta: date | None):
+    # Pabellones y tipos salen del caché de catálogos: la consulta solo
+    # junta las cirugías con sus nombres de paciente y doctor
+    q = db.query(models.Cirugia, models.Paciente.nombre, models.Paciente.rut, models.Usuario.nombre_completo) \
+        .outerjoin(models.Paciente, models.Paciente.id == models.Cirugia.paciente_id) \
+        .outerjoin(models.Usuario, models.Usuario.id == models.Cirugia.doctor_id)
+    if desde: q = q.filter(models.Cirugia.fecha >= desde)
+    if hasta: q = q.filter(models.Cirugia.fecha <= hasta)
+    filas = q.order_by(models.Cirugia.pabellon_id, models.Cirugia.fecha, models.Cirugia.hora_inicio).all()
+
+    tablero = {
+        pab.id: PabellonTablero(id=pab.id, nombre=pab.nombre, es_compleja=pab.es_compleja, capacidad=pab.capacidad, tasks=[])
+        for pab in catalogos.pabellones()
+    }
+    for c, paciente, rut, doctor in filas:
+        pab = tablero.get(c.pabellon_id)
+        if pab is None:
+            continue
+        tipo = catalogos.tipo(c.tipo_cirugia_id)
+        pab.tasks.append(CirugiaTablero(
+            **cirugia_to_out(c).dict(), paciente_nombre=paciente, paciente_rut=rut, doctor_nombre=doctor,
+            tipo_nombre=tipo.nombre if tipo else None, tipo_duracion=tipo.duracion_estimada if tipo else None,
+            pabellon_nombre=pab.nombre
+        ))
+    return list(tablero.values())
+
+@router.get("/", response_model=List[CirugiaExpandida], response_model_exclude_unset=True)
+async def listar_cirugias(
+    response: Response,
+    pabellon_id: int | None = None, fecha: date | None = None,
+    desde: date | None = None, hasta: date | None = None,
+    estado: List[EstadoCirugia] | None = Query(None),
+    doctor_id: int | None = None, paciente_id: int | None = None,
+    limite: int | None = Query(None, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: str | None = None, fields: str | None = None, expand: str | None = None,
+    db=Depends(get_db_async)
+):
+    """
+    expand=paciente,doctor,tipo,pabellon agrega los nombres (y RUT/duración)
+    inline con JOINs en la misma consulta; se combina con fields= y limite=.
+    """
+    return await en_sesion(
+        db, consultar_cirugias, response, pabellon_id, fecha, desde, hasta, estado,
+        doctor_id, paciente_id, limite, cursor, fields, expand
+    )
+
+def consultar_cirugias(db: Session, response, pabellon_id, fecha, desde, hasta, estado,
+                       doctor_id, paciente_id, limite, cursor, fields, expand=None):
+    # Orden cronológico con el id de desempate; keyset sobre (inicio_ts, id)
+    orden = [models.Cirugia.inicio_ts, models.Cirugia.id]
+    campos = paginacion.campos_solicitados(fields, models.Cirugia, CirugiaOut)
+    expansiones = expansiones_pedidas(expand)
+    q = paginacion.consulta(db, models.Cirugia, campos, orden)
+    for nombre in expansiones:
+        relacion, columnas = EXPANSIONES[nombre]
+        if campos is None:
+            q = q.options(joinedload(relacion).load_only(*columnas.values()))
+        else:
+            q = q.outerjoin(relacion).add_columns(*(col.label(campo) for campo, col in columnas.items()))
+            campos = campos + list(columnas)
     if pabellon_id: q = q.filter(models.Cirugia.pabellon_id == pabellon_id)
     if fecha: q = q.filter(models.Cirugia.fecha == fecha)
-    return [cirugia_to_out(c) for c in q.order_by(models.Cirugia.fecha, models.Cirugia.hora_inicio).all()]
+    if desde: q = q.filter(models.Cirugia.fecha >= desde)
+    if hasta: q = q.filter(models.Cirugia.fecha <= hasta)
+    if estado: q = q.filter(models.Cirugia.estado.in_(estado))
+    if doctor_id: q = q.filter(models.Cirugia.doctor_id == doctor_id)
+    if paciente_id: q = q.filter(models.Cirugia.paciente_id == paciente_id)
+
+    filas = paginacion.paginar(q, orden, cursor, limite, response)
+    if campos: return paginacion.proyectar(filas, campos, response)
+    if expansiones: return [cirugia_expandida(c, expansiones) for c in filas]
+    return [cirugia_to_out(c) for c in filas]
+
+@router.get("/cambios", response_model=CambiosCirugias)
+def cambios(since: int = 0, db: Session = Depends(get_db)):
+    """
+    Delta-sync: cirugías creadas/modificadas y tombstones de las eliminadas
+    con cambio_seq > since. El cliente guarda `cursor` y lo manda en el
+    siguiente poll (since=0 → carga completa). Solo se entrega hasta el
+    último cambio confirmado al empezar (ver core/delta.py).
+    Con `resync` la respuesta es una carga completa: `since` es anterior a
+    los tombstones purgados y el cliente debe reemplazar su copia.
+    """
+    delta.purgar_si_corresponde(db)
+    horizonte = delta.horizonte(db)
+    resync = 0 < since < horizonte
+    if resync:
+        since = 0
+
+    tope = delta.tope(db)
+    modificadas = db.query(models.Cirugia).filter(models.Cirugia.cambio_seq > since, models.Cirugia.cambio_seq <= tope) \
+        .order_by(models.Cirugia.cambio_seq, models.Cirugia.id).all()
+    eliminadas = db.query(models.CirugiaEliminada) \
+        .filter(models.CirugiaEliminada.cambio_seq > since, models.CirugiaEliminada.cambio_seq <= tope) \
+        .order_by(models.CirugiaEliminada.cambio_seq, models.CirugiaEliminada.id).all()
+
+    # Una carga completa deja al cliente al día hasta el horizonte de la purga
+    cursor = max(since or horizonte, tope)
+    return CambiosCirugias(
+        cursor=cursor,
+        resync=resync,
+        cirugias=[cirugia_to_out(c) for c in modificadas],
+        eliminadas=[CirugiaEliminadaOut(id=e.cirugia_id, pabellon_id=e.pabellon_id, cambio_seq=e.cambio_seq) for e in eliminadas]
+    )
+
+@router.post("/validar", response_model=List[ResultadoValidacion])
+def validar(propuestas: List[PropuestaIntervalo], db: Session = Depends(get_db)):
+    """Valida N horarios propuestos de una vez (contra la agenda y entre sí, en orden)."""
+    return agenda.validar_propuestas(db, propuestas)
+
+def slot_to_out(inicio: datetime, hueco_hasta: datetime, p, duracion: int):
+    return SlotLibre(
+        pabellon_id=p.id, pabellon_nombre=p.nombre, es_compleja=bool(p.es_compleja),
+        fecha=inicio.date(), hora_inicio=inicio.time(), inicio=inicio,
+        fin_ocupacion=inicio + timedelta(minutes=duracion + TIEMPO_ASEO), hueco_hasta=hueco_hasta
+    )
+
+@router.get("/slots", response_model=List[SlotLibre])
+def slots(tipo_cirugia_id: int, desde: datetime | None = None, hasta: datetime | None = None,
+          compleja: bool = False, limite: int = 5, db: Session = Depends(get_db)):
+    """
+    Primeros huecos libres para un tipo de cirugía (duración estimada + aseo)
+    entre todos los pabellones aptos, por sweep-line sobre su ocupación.
+    """
+    tipo = catalogos.tipo(tipo_cirugia_id)
+    if not tipo: raise HTTPException(404, "Tipo de cirugía no encontrado")
+    desde = desde or datetime.now()
+    hasta = hasta or desde + timedelta(days=7)
+    if hasta <= desde: raise HTTPException(400, "'hasta' debe ser posterior a 'desde'")
+
+    pabellones = agenda.pabellones_aptos(catalogos.pabellones(), compleja)
+    ocupacion = agenda.cargar_ocupacion(db, [p.id for p in pabellones], desde, hasta)
+    encontrados = agenda.primeros_huecos(
+        ocupacion, pabellones, desde, hasta, tipo.duracion_estimada + TIEMPO_ASEO, max(1, min(limite, 50))
+    )
+    return [slot_to_out(ini, hueco_hasta, p, tipo.duracion_estimada) for ini, hueco_hasta, p in encontrados]
+
+@router.post("/slots/lote", response_model=List[ResultadoSlot])
+def slots_lote(solicitudes: List[SolicitudSlot], db: Session = Depends(get_db)):
+    """
+    Versión en lote: el primer hueco para cada solicitud, en orden. Cada hueco
+    asignado se reserva para las siguientes. Una consulta en total (los
+    tipos y pabellones salen del caché de catálogos).
+    """
+    if not solicitudes: return []
+    ahora = datetime.now()
+    ventanas = [(s.desde or ahora, s.hasta or (s.desde or ahora) + timedelta(days=7)) for s in solicitudes]
+
+    pabellones = catalogos.pabellones()
+    ocupacion = agenda.cargar_ocupacion(
+        db, [p.id for p in pabellones], min(d for d, _ in ventanas), max(h for _, h in ventanas)
+    )
+
+    resultados = []
+    for i, (s, (desde, hasta)) in enumerate(zip(solicitudes, ventanas)):
+        tipo = catalogos.tipo(s.tipo_cirugia_id)
+        duracion = s.duracion_programada or (tipo.duracion_estimada if tipo else None)
+        if duracion is None:
+            resultados.append(ResultadoSlot(indice=i, error="Tipo de cirugía no encontrado")); continue
+
+        encontrados = agenda.primeros_huecos(
+            ocupacion, agenda.pabellones_aptos(pabellones, s.compleja), desde, hasta, duracion + TIEMPO_ASEO, 1
+        )
+        if not encontrados:
+            resultados.append(ResultadoSlot(indice=i, error="Sin hueco disponible en la ventana")); continue
+
+        ini, hueco_hasta, p = encontrados[0]
+        slot = slot_to_out(ini, hueco_hasta, p, duracion)
+        agenda.reservar(ocupacion, p.id, ini, slot.fin_ocupacion)
+        resultados.append(ResultadoSlot(indice=i, slot=slot))
+    return resultados
+
+@router.post("/planificar", response_model=PlanDia)
+def planificar(solicitud: SolicitudPlan, db: Session = Depends(get_db)):
+    """
+    Asigna un lote de casos pendientes a pabellones/horas sin choques.
+    dry_run=true (por defecto) solo devuelve el plan con su utilización;
+    dry_run=false lo guarda en UNA transacción, bajo el bloqueo de todos los
+    pabellones involucrados y revalidando contra la agenda vigente.
+    """
+    if solicitud.jornada_fin <= solicitud.jornada_inicio:
+        raise HTTPException(400, "La jornada debe terminar después de empezar")
+
+    pabellones = catalogos.pabellones()
+    tipos = {i: t for i in {c.tipo_cirugia_id for c in solicitud.casos} if (t := catalogos.tipo(i))}
+
+    asignaciones, sin_asignar, stats = planificador.planificar(
+        db, solicitud.fecha, solicitud.casos, pabellones, tipos, solicitud.jornada_inicio, solicitud.jornada_fin
+    )
+    plan = PlanDia(fecha=solicitud.fecha, dry_run=solicitud.dry_run, asignaciones=asignaciones,
+                   sin_asignar=sin_asignar, estadisticas=stats)
+    if solicitud.dry_run or not asignaciones:
+        return plan
+
+    claves = {(a["pabellon_id"], solicitud.fecha) for a in asignaciones}
+    with bloqueo_agenda(db, *claves):
+        # Alguien pudo agendar entre la carga y el bloqueo → revalidar
+        propuestas = [PropuestaIntervalo(pabellon_id=a["pabellon_id"], fecha=a["fecha"], hora_inicio=a["hora_inicio"],
+                                         duracion_programada=a["duracion_programada"]) for a in asignaciones]
+        if not all(r["ok"] for r in agenda.validar_propuestas(db, propuestas)):
+            raise HTTPException(409, "La agenda cambió durante la planificación, vuelva a intentarlo")
+        # ...y la de los doctores, que el planificador también había esquivado
+        if planificador.choques_doctores(db, solicitud.fecha, solicitud.casos, asignaciones):
+            raise HTTPException(409, "La agenda de un doctor cambió durante la planificación, vuelva a intentarlo")
+
+        nuevas = []
+        for a in asignaciones:
+            caso = solicitud.casos[a["indice"]]
+            nuevas.append(models.Cirugia(
+                paciente_id=caso.paciente_id, doctor_id=caso.doctor_id, tipo_cirugia_id=caso.tipo_cirugia_id,
+                pabellon_id=a["pabellon_id"], fecha=a["fecha"], hora_inicio=a["hora_inicio"],
+                duracion_programada=a["duracion_programada"], extra_time=0,
+                estado=EstadoCirugia.PROGRAMADA, es_aseo=False
+            ))
+        db.add_all(nuevas)
+        db.expire_on_commit = False   # evita un SELECT por fila al leer los ids después
+        db.commit()
+
+    for n in nuevas: scheduler.rearmar(n)
+    plan.cirugia_ids = [n.id for n in nuevas]
+    hub.publicar("planificada", fecha=solicitud.fecha.isoformat(), ids=plan.cirugia_ids)
+    return plan
+
+@router.post("/bulk", response_model=ReporteImportacion)
+async def importar_cirugias(request: Request, formato: Optional[str] = None, modo: str = "parcial",
+                            db: Session = Depends(get_db)):
+    """
+    Importación masiva en streaming: NDJSON (un objeto por línea) o CSV con
+    encabezado. Se procesa por lotes, así que la memoria no depende del tamaño
+    del archivo. modo=parcial confirma cada lote con sus filas válidas;
+    modo=todo confirma solo si NINGUNA fila falló (si no, revierte todo).
+    """
+    reporte, confirmado = await importacion.importar(
+        request, db, partial(importacion.ImportadorCirugias, esquema=CirugiaImportada), formato, modo
+    )
+
+    if confirmado and reporte.insertadas:
+        await run_in_threadpool(scheduler.recargar)
+        hub.publicar("importada", insertadas=reporte.insertadas)
+    return reporte.como_dict(confirmado)
 
 @router.post("/", response_model=CirugiaOut, status_code=201)
 def crear_cirugia(datos: CirugiaCreate, db: Session = Depends(get_db)):
-    # Validar overlap (considerando aseo)
-    ini = combinar_fecha_hora(datos.fecha, datos.hora_inicio)
-    fin = ini + timedelta(minutes=datos.duracion_programada + (datos.extra_time or 0) + TIEMPO_ASEO)
-    
-    ocupados = db.query(models.Cirugia).filter(
-        models.Cirugia.pabellon_id == datos.pabellon_id, models.Cirugia.fecha == datos.fecha,
-        models.Cirugia.estado.notin_([EstadoCirugia.FINALIZADA, EstadoCirugia.CANCELADA])
-    ).all()
-    
-    for o in ocupados:
-        o_ini = combinar_fecha_hora(o.fecha, o.hora_inicio)
-        o_fin = o_ini + timedelta(minutes=o.duracion_programada + (o.extra_time or 0) + TIEMPO_ASEO)
-        if hay_solapamiento(ini, fin, o_ini, o_fin):
-            raise HTTPException(400, "Choque de horario (incluyendo 30min aseo)")
-
-    nueva = models.Cirugia(**datos.dict(), estado=EstadoCirugia.PROGRAMADA, es_aseo=False)
-    db.add(nueva); db.commit(); db.refresh(nueva)
+    tipo = catalogos.tipo(datos.tipo_cirugia_id)
+    if not tipo: raise HTTPException(404, "Tipo de cirugía no encontrado")
+    if not catalogos.pabellon(datos.pabellon_id): raise HTTPException(404, "Pabellón no encontrado")
+    if datos.duracion_programada is None:
+        datos.duracion_programada = tipo.duracion_estimada
+    # Validar overlap (considerando aseo) e insertar bajo el bloqueo del pabellón/día
+    with bloqueo_agenda(db, (datos.pabellon_id, datos.fecha)):
+        agenda.exigir_disponible(db, datos.pabellon_id, datos.fecha, datos.hora_inicio,
+                                 datos.duracion_programada, datos.extra_time)
+
+        nueva = models.Cirugia(**datos.dict(), estado=EstadoCirugia.PROGRAMADA, es_aseo=False)
+        db.add(nueva); db.commit()
+    db.refresh(nueva)
+    scheduler.rearmar(nueva)
+    publicar_cambio("creada", nueva)
     return cirugia_to_out(nueva)
 
 @router.put("/{cirugia_id}", response_model=CirugiaOut)
@@ -92,36 +433,63 @@ def modificar(cirugia_id: int, datos: CirugiaUpdate, db: Session = Depends(get_d
     c = db.query(models.Cirugia).filter(models.Cirugia.id == cirugia_id).first()
     if not c: raise HTTPException(404, "No existe")
     for k, v in datos.dict(exclude_unset=True).items(): setattr(c, k, v)
-    db.commit(); db.refresh(c)
+    guardar_reprogramada(db, c)
+    scheduler.rearmar(c)
+    publicar_cambio("modificada", c)
     return cirugia_to_out(c)
 
 @router.patch("/{cirugia_id}/estado", response_model=CirugiaOut)
 def estado(cirugia_id: int, body: dict, db: Session = Depends(get_db)):
     c = db.query(models.Cirugia).filter(models.Cirugia.id == cirugia_id).first()
     if not c: raise HTTPException(404)
-    c.estado = body.get("nuevo_estado")
-    db.commit(); db.refresh(c)
+    try:
+        nuevo = EstadoCirugia(body.get("nuevo_estado"))
+    except ValueError:
+        raise HTTPException(400, "Estado de cirugía inválido")
+    reactivada = c.estado in agenda.ESTADOS_LIBRES and nuevo not in agenda.ESTADOS_LIBRES
+    c.estado = nuevo
+    if reactivada:
+        # Vuelve a ocupar su horario, que pudo reservarse mientras estaba libre
+        guardar_reprogramada(db, c)
+    else:
+        db.commit(); db.refresh(c)
+    scheduler.rearmar(c)
+    publicar_cambio("estado", c, estado=c.estado.value)
     return cirugia_to_out(c)
 
 @router.patch("/{cirugia_id}", response_model=CirugiaOut)
 def mover(cirugia_id: int, body: dict, db: Session = Depends(get_db)):
     c = db.query(models.Cirugia).filter(models.Cirugia.id == cirugia_id).first()
-    if c: c.pabellon_id = body.get("pabellon_id"); db.commit(); db.refresh(c)
+    if not c: raise HTTPException(404, "No existe")
+    origen = c.pabellon_id
+    c.pabellon_id = body.get("pabellon_id"); guardar_reprogramada(db, c)
+    scheduler.rearmar(c)
+    publicar_cambio("movida", c, pabellon_origen=origen)
     return cirugia_to_out(c)
 
 @router.patch("/{cirugia_id}/extra-time", response_model=CirugiaOut)
 def extra(cirugia_id: int, body: dict, db: Session = Depends(get_db)):
     c = db.query(models.Cirugia).filter(models.Cirugia.id == cirugia_id).first()
-    if c: c.extra_time = body.get("extra_time"); db.commit(); db.refresh(c)
+    if not c: raise HTTPException(404, "No existe")
+    c.extra_time = body.get("extra_time"); guardar_reprogramada(db, c)
+    scheduler.rearmar(c)
+    publicar_cambio("extra", c)
     return cirugia_to_out(c)
 
 @router.delete("/{cirugia_id}", status_code=204)
 def delete(cirugia_id: int, db: Session = Depends(get_db)):
     c = db.query(models.Cirugia).filter(models.Cirugia.id == cirugia_id).first()
-    if c: db.delete(c); db.commit()
+    if c:
+        pabellon_id = c.pabellon_id
+        db.delete(c); db.commit(); scheduler.desarmar(cirugia_id)
+        hub.publicar("eliminada", id=cirugia_id, pabellon_id=pabellon_id)
 
-# --- IMPORTANTE: Endpoint para el polling ---
+# --- Endpoint para el polling ---
+# Con el scheduler activo las transiciones ocurren en el servidor a su hora,
+# así que esto es un no-op. Solo barre la tabla si el scheduler está apagado.
 @router.post("/actualizar-estados")
-def trigger_actualizar(db: Session = Depends(get_db)):
-    actualizar_estados_automaticos(db)
+async def trigger_actualizar(db=Depends(get_db_async)):
+    if not scheduler.activo:
+        with metricas.medir_trabajo("actualizar_estados"):
+            await en_sesion(db, actualizar_estados_automaticos)
     return {"ok": True}
\ No newline at end of file
@@ -1,78 +1,76 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import date, datetime
-from typing import List
+from datetime import date, datetime, time, timedelta
 
-from app.db.database import get_db
+from app.db.database import abrir_sesion, en_sesion
 from app.db import models
 from app.core.security import get_current_user
+from app.core.resumen import resumen
 from app.db.models import EstadoCirugia
 
 router = APIRouter()
 
 @router.get("/resumen")
-def obtener_resumen_dashboard(
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
-):
-    hoy = date.today()
+async def obtener_resumen_dashboard(user = Depends(get_current_user)):
+    # Snapshot en memoria invalidado por las escrituras: la sesión de BD
+    # se abre solo para recalcular
+    async def calcular():
+        async with abrir_sesion() as db:
+            return await en_sesion(db, calcular_resumen)
 
-    # 1. KPIs Generales (Solo de hoy)
-    # -------------------------------
-    cirugias_hoy = db.query(models.Cirugia).filter(
-        models.Cirugia.fecha == hoy,
-        models.Cirugia.es_aseo == False
-    ).all()
+    cuerpo = await resumen.obtener(calcular)
+    return Response(content=cuerpo, media_type="application/json", headers={"Cache-Control": "no-cache"})
 
-    total_hoy = len(cirugias_hoy)
-    en_ejecucion = sum(1 for c in cirugias_hoy if c.estado == EstadoCirugia.EN_CURSO)
-    retrasos = sum(1 for c in cirugias_hoy if c.estado == EstadoCirugia.COMPLICADA)
-    
-    # Aseo activo ahora mismo
-    aseo_activo = db.query(models.Cirugia).filter(
-        models.Cirugia.fecha == hoy,
-        models.Cirugia.es_aseo == True,
-        models.Cirugia.estado == EstadoCirugia.EN_ASEO
-    ).count()
 
-    # 2. Datos para Gráfico de Torta (Estados de hoy)
-    # -----------------------------------------------
-    # Contamos cuántas hay de cada estado hoy
-    stats_estados = db.query(
-        models.Cirugia.estado, func.count(models.Cirugia.id)
-    ).filter(
-        models.Cirugia.fecha == hoy,
-        models.Cirugia.es_aseo == False # Excluimos aseos del gráfico principal
-    ).group_by(models.Cirugia.estado).all()
+def calcular_resumen(db: Session):
+    hoy = date.today()
+    # Rango sobre inicio_ts (= fecha + hora_inicio) para usar los índices
+    inicio_hoy = datetime.combine(hoy, time.min)
+    inicio_manana = inicio_hoy + timedelta(days=1)
+    C = models.Cirugia
+
+    # 1. KPIs y gráfico de torta: UN agregado agrupado por (estado, es_aseo)
+    # ----------------------------------------------------------------------
+    conteos = db.query(C.estado, C.es_aseo, func.count(C.id)).filter(
+        C.inicio_ts >= inicio_hoy, C.inicio_ts < inicio_manana
+    ).group_by(C.estado, C.es_aseo).all()
+
+    # Excluimos aseos de los KPIs y del gráfico principal
+    grafico_map = {estado.name: n for estado, es_aseo, n in conteos if not es_aseo}
+    total_hoy = sum(grafico_map.values())
+    en_ejecucion = grafico_map.get(EstadoCirugia.EN_CURSO.name, 0)
+    retrasos = grafico_map.get(EstadoCirugia.COMPLICADA.name, 0)
 
-    # Convertimos a diccionario: { "PROGRAMADA": 5, "EN_CURSO": 2 ... }
-    grafico_map = {estado.name: count for estado, count in stats_estados}
+    # Aseo activo ahora mismo
+    aseo_activo = sum(n for estado, es_aseo, n in conteos if es_aseo and estado == EstadoCirugia.EN_ASEO)
 
     # Definimos el orden y categorías fijas para el gráfico
     labels_fijos = ["PROGRAMADA", "EN_CURSO", "FINALIZADA", "CANCELADA"]
     series_data = [grafico_map.get(k, 0) for k in labels_fijos]
 
-    # 3. Próximas Cirugías (Las siguientes 5 pendientes)
+    # 2. Próximas Cirugías (Las siguientes 5 pendientes)
     # --------------------------------------------------
-    proximas = db.query(models.Cirugia).filter(
-        models.Cirugia.fecha >= hoy,
-        models.Cirugia.estado == EstadoCirugia.PROGRAMADA,
-        models.Cirugia.es_aseo == False
-    ).order_by(models.Cirugia.fecha, models.Cirugia.hora_inicio).limit(5).all()
+    # Un solo SELECT con los nombres por JOIN (antes: un lazy-load por relación y fila)
+    proximas = db.query(
+        C.id, C.hora_inicio, C.fecha,
+        models.Paciente.nombre.label("paciente"),
+        models.Pabellon.nombre.label("pabellon"),
+        models.TipoCirugia.nombre.label("cirugia"),
+    ).outerjoin(C.paciente_rel).outerjoin(C.pabellon_rel).outerjoin(C.tipo_cirugia_rel).filter(
+        C.estado == EstadoCirugia.PROGRAMADA,
+        C.inicio_ts >= inicio_hoy,
+        C.es_aseo == False
+    ).order_by(C.inicio_ts, C.id).limit(5).all()
 
-    lista_proximas = []
-    for p in proximas:
-        paciente_nombre = p.paciente_rel.nombre if p.paciente_rel else "Sin Paciente"
-        pabellon_nombre = p.pabellon_rel.nombre if p.pabellon_rel else "Sin Pabellón"
-        lista_proximas.append({
-            "id": p.id,
-            "hora": p.hora_inicio.strftime("%H:%M"),
-            "fecha": p.fecha.strftime("%Y-%m-%d"),
-            "paciente": paciente_nombre,
-            "pabellon": pabellon_nombre,
-            "cirugia": p.tipo_cirugia_rel.nombre if p.tipo_cirugia_rel else "General"
-        })
+    lista_proximas = [{
+        "id": p.id,
+        "hora": p.hora_inicio.strftime("%H:%M"),
+        "fecha": p.fecha.strftime("%Y-%m-%d"),
+        "paciente": p.paciente or "Sin Paciente",
+        "pabellon": p.pabellon or "Sin Pabellón",
+        "cirugia": p.cirugia or "General"
+    } for p in proximas]
 
     return {
         "kpis": {
@@ -86,4 +84,4 @@ def obtener_resumen_dashboard(
             "labels": labels_fijos
         },
         "proximas_cirugias": lista_proximas
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.security import get_current_user
+from app.core.principales import principales
+from app.core.hashing import pool_hashing
+from app.core.resumen import resumen
+from app.core.diagnostico import diagnostico
+from app.db.database import async_engine
+from app.db.monitor_pool import monitor_sync, monitor_async
+
+router = APIRouter()
+
+
+def solo_admin(usuario_actual=Depends(get_current_user)):
+    if usuario_actual.rol != "Admin":
+        raise HTTPException(status_code=403, detail="No autorizado")
+    return usuario_actual
+
+
+# -----------------------------------------
+# GET /internal/auth-cache → caché de principales
+# -----------------------------------------
+@router.get("/auth-cache")
+def estado_cache_principales(usuario_actual=Depends(solo_admin)):
+    return principales.estadisticas()
+
+
+# -----------------------------------------
+# GET /internal/hashing → pool de bcrypt
+# -----------------------------------------
+@router.get("/hashing")
+def estado_pool_hashing(usuario_actual=Depends(solo_admin)):
+    return pool_hashing.estadisticas()
+
+
+# -----------------------------------------
+# GET /internal/dashboard-cache → snapshot del resumen
+# -----------------------------------------
+@router.get("/dashboard-cache")
+def estado_snapshot_resumen(usuario_actual=Depends(solo_admin)):
+    return resumen.estadisticas()
+
+
+# -----------------------------------------
+# GET /internal/db-pool → pool de conexiones
+# -----------------------------------------
+@router.get("/db-pool")
+def estado_pool_db(reiniciar: bool = False, usuario_actual=Depends(solo_admin)):
+    estado = {"sync": monitor_sync.estadisticas()}
+    if async_engine is not None:
+        estado["async"] = monitor_async.estadisticas()
+    if reiniciar:
+        monitor_sync.limpiar()
+        monitor_async.limpiar()
+    return estado
+
+
+# -----------------------------------------
+# GET /internal/diagnostico → consultas lentas y N+1 (DIAGNOSTICO_SQL=1)
+# -----------------------------------------
+@router.get("/diagnostico")
+def estado_diagnostico(usuario_actual=Depends(solo_admin)):
+    return diagnostico.estadisticas()
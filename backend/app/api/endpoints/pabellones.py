@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.db import models
 from app.core.security import get_current_user
+from app.core.versiones import etag_condicional
+from app.core.catalogos import catalogos
 from typing import List
 from pydantic import BaseModel
 
@@ -40,24 +42,23 @@ router = APIRouter()
 # GET /pabellones/  (Listar todos)
 # -----------------------------------------
 @router.get("/", response_model=List[PabellonOut])
-def leer_pabellones(
-    db: Session = Depends(get_db),
-    usuario = Depends(get_current_user)
+async def leer_pabellones(
+    usuario = Depends(get_current_user),
+    _etag = Depends(etag_condicional("pabellones"))
 ):
-    pabellones_db = db.query(models.Pabellon).all()
-    return pabellones_db
+    # Desde el caché de catálogos (core/catalogos.py): no toca la BD
+    return catalogos.pabellones()
 
 
 # -----------------------------------------
 # GET /pabellones/{id}  (Obtener uno)
 # -----------------------------------------
 @router.get("/{pabellon_id}", response_model=PabellonOut)
-def obtener_pabellon(
+async def obtener_pabellon(
     pabellon_id: int,
-    db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
-    pab = db.query(models.Pabellon).filter(models.Pabellon.id == pabellon_id).first()
+    pab = catalogos.pabellon(pabellon_id)
     if not pab:
         raise HTTPException(status_code=404, detail="Pabellón no encontrado")
     return pab
@@ -81,6 +82,7 @@ def crear_pabellon(
     db.add(pab)
     db.commit()
     db.refresh(pab)
+    catalogos.guardar_pabellon(pab)
     return pab
 
 
@@ -106,6 +108,7 @@ def actualizar_pabellon(
 
     db.commit()
     db.refresh(pab)
+    catalogos.guardar_pabellon(pab)
     return pab
 
 
@@ -124,4 +127,5 @@ def eliminar_pabellon(
 
     db.delete(pab)
     db.commit()
+    catalogos.quitar_pabellon(pabellon_id)
     return None
\ No newline at end of file
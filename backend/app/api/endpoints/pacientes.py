@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from functools import partial
 from pydantic import BaseModel
 from app.db.database import get_db
 from app.db import models
 from app.core.security import get_current_user
+from app.core.versiones import versiones, etag_condicional
+from app.core.rut import normalizar_rut
+from app.core import importacion, paginacion, busqueda
+from app.schemas.importacion import ReporteImportacion
 
 from app.schemas.paciente import (
     PacienteCreate, PacienteUpdate, PacienteOut
@@ -18,10 +24,38 @@ router = APIRouter()
 # -----------------------------------------
 @router.get("/", response_model=List[PacienteOut])
 def listar_pacientes(
+    response: Response,
+    nombre: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    _etag=Depends(etag_condicional("pacientes"))
+):
+    # Filtro por prefijo de nombre; paginación por id (ver core/paginacion.py)
+    orden = [models.Paciente.id]
+    campos = paginacion.campos_solicitados(fields, models.Paciente, PacienteOut)
+    q = paginacion.consulta(db, models.Paciente, campos, orden)
+    if nombre:
+        q = q.filter(paginacion.prefijo(models.Paciente.nombre, nombre))
+
+    filas = paginacion.paginar(q, orden, cursor, limite, response)
+    return paginacion.proyectar(filas, campos, response) if campos else filas
+
+
+# -----------------------------------------
+# GET /pacientes/buscar?q= → typeahead
+# -----------------------------------------
+@router.get("/buscar", response_model=List[PacienteOut])
+def buscar_pacientes(
+    q: str = Query(..., min_length=1),
+    limite: int = Query(10, ge=1, le=50),
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    return db.query(models.Paciente).all()
+    # Por nombre (sin tildes, prefijos y parecidos) o por RUT; ver core/busqueda.py
+    return busqueda.buscar_pacientes(db, q, limite)
 
 
 # -----------------------------------------
@@ -49,20 +83,52 @@ def crear_paciente(
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    # Validación opcional: rut único
-    if datos.rut:
-        existe_rut = db.query(models.Paciente).filter(models.Paciente.rut == datos.rut).first()
-        if existe_rut:
-            raise HTTPException(status_code=400, detail="Ya existe un paciente con ese RUT")
+    # RUT opcional, pero si viene debe ser válido; la unicidad la garantiza
+    # el índice único de rut_normalizado (sin un SELECT previo)
+    try:
+        normalizar_rut(datos.rut)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     paciente = models.Paciente(**datos.dict())
     db.add(paciente)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe un paciente con ese RUT")
     db.refresh(paciente)
+    versiones.incrementar("pacientes")
+    busqueda.indice.actualizar(paciente)
 
     return paciente
 
 
+# -----------------------------------------
+# POST /pacientes/bulk → importación masiva
+# -----------------------------------------
+@router.post("/bulk", response_model=ReporteImportacion)
+async def importar_pacientes(
+    request: Request,
+    formato: Optional[str] = None,
+    modo: str = "parcial",
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    """
+    NDJSON o CSV (con encabezado) en streaming, por lotes. Valida el RUT y
+    descarta duplicados contra la BD y dentro del archivo. modo=parcial
+    confirma cada lote; modo=todo solo si ninguna fila falló.
+    """
+    reporte, confirmado = await importacion.importar(
+        request, db, partial(importacion.ImportadorPacientes, esquema=PacienteCreate), formato, modo
+    )
+    if confirmado and reporte.insertadas:
+        versiones.incrementar("pacientes")
+        busqueda.indice.invalidar()
+    return reporte.como_dict(confirmado)
+
+
 # -----------------------------------------
 # PUT /pacientes/{id} → actualizar paciente
 # -----------------------------------------
@@ -78,12 +144,26 @@ def actualizar_paciente(
     if not paciente:
         raise HTTPException(status_code=404, detail="Paciente no encontrado")
 
-    # Update flexible (solo los campos enviados)
-    for campo, valor in datos.dict(exclude_unset=True).items():
+    # Update flexible (solo los campos enviados); el RUT se valida igual que al
+    # crear, pero solo si cambia: el formulario reenvía el RUT antiguo tal cual
+    cambios = datos.dict(exclude_unset=True)
+    if "rut" in cambios and cambios["rut"] != paciente.rut:
+        try:
+            normalizar_rut(cambios["rut"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    for campo, valor in cambios.items():
         setattr(paciente, campo, valor)
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe un paciente con ese RUT")
     db.refresh(paciente)
+    versiones.incrementar("pacientes")
+    busqueda.indice.actualizar(paciente)
 
     return paciente
 
@@ -104,5 +184,7 @@ def eliminar_paciente(
 
     db.delete(paciente)
     db.commit()
+    versiones.incrementar("pacientes")
+    busqueda.indice.quitar(paciente_id)
 
     return {"message": "Paciente eliminado correctamente"}
\ No newline at end of file
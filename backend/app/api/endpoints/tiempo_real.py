@@ -0,0 +1,81 @@
+# app/api/endpoints/tiempo_real.py
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.core.eventos import hub, CERRAR
+from app.core.principales import principales
+from app.core.security import resolver_principal
+
+router = APIRouter()
+
+# Cada cuánto se manda un ping si no hubo eventos (mantiene vivos los proxies
+# y detecta clientes desconectados)
+INTERVALO_PING = 25
+
+# Al modificar o desactivar un usuario se cierran sus conexiones abiertas;
+# el cliente reconecta y vuelve a pasar por resolver_principal
+principales.al_invalidar(hub.expulsar)
+
+
+# -----------------------------------------
+# WS /ws/tablero?token=...
+# -----------------------------------------
+@router.websocket("/ws/tablero")
+async def ws_tablero(websocket: WebSocket, token: str = ""):
+    # El navegador no puede mandar Authorization en un WebSocket → token por query.
+    # Mismas reglas que get_current_user: usuario existente y activo
+    try:
+        principal = await resolver_principal(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    cola = hub.suscribir(principal)
+    try:
+        while True:
+            try:
+                mensaje = await asyncio.wait_for(cola.get(), timeout=INTERVALO_PING)
+            except asyncio.TimeoutError:
+                mensaje = '{"tipo":"ping"}'
+            if mensaje is CERRAR:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Sesión invalidada")
+                break
+            await websocket.send_text(mensaje)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        hub.desuscribir(cola)
+
+
+# -----------------------------------------
+# GET /sse/tablero?token=...  (fallback SSE)
+# -----------------------------------------
+@router.get("/sse/tablero")
+async def sse_tablero(request: Request, token: str = ""):
+    principal = await resolver_principal(token)
+
+    async def flujo():
+        cola = hub.suscribir(principal)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), timeout=INTERVALO_PING)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if mensaje is CERRAR:
+                    break
+                yield f"data: {mensaje}\n\n"
+        finally:
+            hub.desuscribir(cola)
+
+    return StreamingResponse(
+        flujo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
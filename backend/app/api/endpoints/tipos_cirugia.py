@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
 from app.db import models
 from app.core.security import get_current_user
+from app.core.versiones import etag_condicional
+from app.core import paginacion
+from app.core.catalogos import catalogos
 
 from app.schemas.tipo_cirugia import (
     TipoCirugiaCreate,
@@ -20,10 +23,27 @@ router = APIRouter()
 # ------------------------------------------------------
 @router.get("/", response_model=List[TipoCirugiaOut])
 def listar_tipos_cirugia(
+    response: Response,
+    nombre: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    _etag=Depends(etag_condicional("tipos_cirugia"))
 ):
-    return db.query(models.TipoCirugia).all()
+    # Lista completa (lo que pide el front): desde el caché, sin BD
+    if not (nombre or limite or cursor or fields):
+        return catalogos.tipos()
+
+    orden = [models.TipoCirugia.id]
+    campos = paginacion.campos_solicitados(fields, models.TipoCirugia, TipoCirugiaOut)
+    q = paginacion.consulta(db, models.TipoCirugia, campos, orden)
+    if nombre:
+        q = q.filter(paginacion.prefijo(models.TipoCirugia.nombre, nombre))
+
+    filas = paginacion.paginar(q, orden, cursor, limite, response)
+    return paginacion.proyectar(filas, campos, response) if campos else filas
 
 
 # ------------------------------------------------------
@@ -32,10 +52,9 @@ def listar_tipos_cirugia(
 @router.get("/{tipo_id}", response_model=TipoCirugiaOut)
 def obtener_tipo(
     tipo_id: int,
-    db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    tipo = db.query(models.TipoCirugia).filter(models.TipoCirugia.id == tipo_id).first()
+    tipo = catalogos.tipo(tipo_id)
 
     if not tipo:
         raise HTTPException(status_code=404, detail="Tipo de cirugía no encontrado")
@@ -61,6 +80,7 @@ def crear_tipo_cirugia(
     db.add(tipo)
     db.commit()
     db.refresh(tipo)
+    catalogos.guardar_tipo(tipo)
 
     return tipo
 
@@ -85,6 +105,7 @@ def actualizar_tipo_cirugia(
 
     db.commit()
     db.refresh(tipo)
+    catalogos.guardar_tipo(tipo)
 
     return tipo
 
@@ -105,5 +126,6 @@ def eliminar_tipo_cirugia(
 
     db.delete(tipo)
     db.commit()
+    catalogos.quitar_tipo(tipo_id)
 
     return {"message": "Tipo de cirugía eliminado correctamente"}
\ No newline at end of file
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.db import models
 from app.core import security
 from app.core.security import get_current_user
+from app.core.versiones import versiones, etag_condicional
+from app.core.principales import principales
+from app.core import paginacion
 from pydantic import BaseModel
 from typing import List, Optional
 import secrets
@@ -93,13 +96,32 @@ def crear_usuario(
     db.add(db_usuario)
     db.commit()
     db.refresh(db_usuario)
+    versiones.incrementar("usuarios")
 
     return db_usuario
 
 # 2. Listar todos los usuarios
 @router.get("/", response_model=List[UsuarioOut])
-def listar_usuarios(db: Session = Depends(get_db)):
-    return db.query(models.Usuario).all()
+def listar_usuarios(
+    response: Response,
+    nombre: Optional[str] = None,
+    rol: Optional[str] = None,
+    es_activo: Optional[bool] = None,
+    limite: Optional[int] = Query(None, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    _etag=Depends(etag_condicional("usuarios"))
+):
+    orden = [models.Usuario.id]
+    campos = paginacion.campos_solicitados(fields, models.Usuario, UsuarioOut)
+    q = paginacion.consulta(db, models.Usuario, campos, orden)
+    if nombre: q = q.filter(paginacion.prefijo(models.Usuario.nombre_completo, nombre))
+    if rol: q = q.filter(models.Usuario.rol == rol)
+    if es_activo is not None: q = q.filter(models.Usuario.es_activo == es_activo)
+
+    filas = paginacion.paginar(q, orden, cursor, limite, response)
+    return paginacion.proyectar(filas, campos, response) if campos else filas
 
 # 3. Obtener usuario por ID
 @router.get("/{usuario_id}", response_model=UsuarioOut)
@@ -117,7 +139,7 @@ def actualizar_usuario(usuario_id: int, datos: UsuarioUpdate, db: Session = Depe
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     # Normalizar es_activo ("active"/"inactive" → boolean)
-    estado = normalizar_estado(usuario.es_activo, default=None)
+    estado = normalizar_estado(datos.es_activo, default=None)
 
     # Actualizar campos
     if datos.nombre_completo is not None:
@@ -131,6 +153,8 @@ def actualizar_usuario(usuario_id: int, datos: UsuarioUpdate, db: Session = Depe
 
     db.commit()
     db.refresh(usuario)
+    versiones.incrementar("usuarios")
+    principales.invalidar(usuario.username)
     return usuario
 
 # 5. Eliminar usuario
@@ -142,6 +166,8 @@ def eliminar_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
     db.delete(usuario)
     db.commit()
+    versiones.incrementar("usuarios")
+    principales.invalidar(usuario.username)
 
     return {"mensaje": "Usuario eliminado correctamente"}
 
@@ -156,15 +182,19 @@ def cambiar_password(
     Permite que un usuario autenticado cambie su propia contraseña.
     """
     
+    # get_current_user entrega un principal (caché), no el objeto ORM
+    usuario = db.query(models.Usuario).filter(models.Usuario.id == usuario_actual.id).first()
+
     # 1. Validar contraseña actual
-    if not security.verify_password(current_password, usuario_actual.hashed_password):
+    if not security.verify_password(current_password, usuario.hashed_password):
         raise HTTPException(status_code=400, detail="La contraseña actual es incorrecta")
 
     # 2. Asignar la nueva contraseña encriptada
-    usuario_actual.hashed_password = security.get_password_hash(new_password)
+    usuario.hashed_password = security.get_password_hash(new_password)
 
     # 3. Guardar cambios
     db.commit()
+    principales.invalidar(usuario.username)
 
     return {"mensaje": "Contraseña actualizada correctamente"}
 
@@ -192,5 +222,6 @@ def reset_password(
 
     usuario_db.hashed_password = security.get_password_hash(nueva_clave)
     db.commit()
+    principales.invalidar(usuario_db.username)
 
     return {"mensaje": f"Contraseña del usuario {usuario_id} actualizada"}
\ No newline at end of file
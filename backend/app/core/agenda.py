@@ -0,0 +1,249 @@
+# app/core/agenda.py
+
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, date, time, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.models import EstadoCirugia
+
+# ======================================================
+# SERVICIO DE CONFLICTOS DE AGENDA
+# ======================================================
+# Índice ordenado de intervalos ocupados por (pabellón, fecha). Cada
+# intervalo incluye el TIEMPO_ASEO posterior. Lo usan crear, modificar,
+# mover y extra-time, y la validación en lote.
+
+TIEMPO_ASEO = 30
+
+# Cirugías que ya no ocupan el pabellón
+ESTADOS_LIBRES = (EstadoCirugia.FINALIZADA, EstadoCirugia.CANCELADA)
+
+
+class Intervalo(NamedTuple):
+    inicio: datetime
+    fin: datetime
+    cirugia_id: Optional[int]
+
+
+def intervalo_ocupado(fecha: date, hora_inicio: time, duracion: int, extra: int = 0):
+    """(inicio, fin) de la ocupación del pabellón, aseo incluido."""
+    inicio = datetime.combine(fecha, hora_inicio)
+    return inicio, inicio + timedelta(minutes=(duracion or 0) + (extra or 0) + TIEMPO_ASEO)
+
+
+class IndiceAgenda:
+    """
+    Intervalos por clave (pabellon_id, fecha), ordenados por inicio.
+    `conflictos` bisecta por el fin propuesto y retrocede solo mientras un
+    intervalo anterior pueda alcanzar el inicio propuesto (acotado por la
+    ocupación más larga de esa clave): O(log n + k).
+    """
+
+    def __init__(self):
+        self._inicios = defaultdict(list)
+        self._intervalos = defaultdict(list)
+        self._max_duracion = defaultdict(timedelta)
+
+    @classmethod
+    def cargar(cls, db: Session, claves) -> "IndiceAgenda":
+        """Construye el índice para varias claves con UNA consulta."""
+        indice = cls()
+        claves = set(claves)
+        if not claves:
+            return indice
+
+        filas = db.query(
+            models.Cirugia.id, models.Cirugia.pabellon_id, models.Cirugia.fecha, models.Cirugia.hora_inicio,
+            models.Cirugia.duracion_programada, models.Cirugia.extra_time
+        ).filter(
+            models.Cirugia.pabellon_id.in_({p for p, _ in claves}),
+            models.Cirugia.fecha.in_({f for _, f in claves}),
+            models.Cirugia.estado.notin_(ESTADOS_LIBRES)
+        ).all()
+
+        for f in filas:
+            if (f.pabellon_id, f.fecha) in claves:
+                ini, fin = intervalo_ocupado(f.fecha, f.hora_inicio, f.duracion_programada, f.extra_time)
+                indice.agregar((f.pabellon_id, f.fecha), ini, fin, f.id)
+        return indice
+
+    def agregar(self, clave, inicio: datetime, fin: datetime, cirugia_id=None):
+        intervalo = Intervalo(inicio, fin, cirugia_id)
+        pos = bisect_right(self._inicios[clave], inicio)
+        self._intervalos[clave].insert(pos, intervalo)
+        self._inicios[clave].insert(pos, inicio)
+        self._max_duracion[clave] = max(self._max_duracion[clave], fin - inicio)
+
+    def liberar(self, cirugia_ids):
+        """Quita del índice las cirugías indicadas (p.ej. las que se reprograman)."""
+        cirugia_ids = set(cirugia_ids)
+        for clave, intervalos in self._intervalos.items():
+            if any(o.cirugia_id in cirugia_ids for o in intervalos):
+                intervalos[:] = [o for o in intervalos if o.cirugia_id not in cirugia_ids]
+                self._inicios[clave][:] = [o.inicio for o in intervalos]
+
+    def intervalos(self, clave):
+        return list(self._intervalos.get(clave, ()))
+
+    def conflictos(self, clave, inicio: datetime, fin: datetime, excluir=None):
+        """Intervalos de `clave` que se solapan con [inicio, fin)."""
+        intervalos = self._intervalos.get(clave)
+        if not intervalos:
+            return []
+
+        limite = inicio - self._max_duracion[clave]
+        pos = bisect_left(self._inicios[clave], fin) - 1
+        choques = []
+        while pos >= 0 and intervalos[pos].inicio > limite:
+            o = intervalos[pos]
+            if o.fin > inicio and (excluir is None or o.cirugia_id != excluir):
+                choques.append(o)
+            pos -= 1
+        choques.reverse()
+        return choques
+
+
+# ------------------------------------------------------
+# API usada por los endpoints
+# ------------------------------------------------------
+def buscar_conflictos(db: Session, pabellon_id: int, fecha: date, hora_inicio: time,
+                      duracion: int, extra: int = 0, excluir: Optional[int] = None):
+    """Ids de las cirugías del pabellón/día que chocan con el horario propuesto."""
+    clave = (pabellon_id, fecha)
+    indice = IndiceAgenda.cargar(db, [clave])
+    ini, fin = intervalo_ocupado(fecha, hora_inicio, duracion, extra)
+    return [o.cirugia_id for o in indice.conflictos(clave, ini, fin, excluir=excluir)]
+
+
+def exigir_disponible(db: Session, pabellon_id: int, fecha: date, hora_inicio: time,
+                      duracion: int, extra: int = 0, excluir: Optional[int] = None):
+    """Lanza 400 si el horario choca, indicando con qué cirugías."""
+    choques = buscar_conflictos(db, pabellon_id, fecha, hora_inicio, duracion, extra, excluir)
+    if choques:
+        ids = ", ".join(str(i) for i in choques)
+        raise HTTPException(400, f"Choque de horario (incluyendo {TIEMPO_ASEO}min aseo) con cirugía(s) {ids}")
+
+
+def validar_propuestas(db: Session, propuestas):
+    """
+    Valida N intervalos propuestos en una pasada: contra la agenda existente
+    (una sola consulta para todas las claves) y entre ellos mismos, en orden.
+    Cada propuesta necesita pabellon_id, fecha, hora_inicio, duracion_programada,
+    extra_time y opcionalmente cirugia_id (si reprograma una existente).
+    """
+    indice = IndiceAgenda.cargar(db, {(p.pabellon_id, p.fecha) for p in propuestas})
+
+    # Las cirugías que se reprograman dejan libre su horario actual
+    indice.liberar(p.cirugia_id for p in propuestas if getattr(p, "cirugia_id", None) is not None)
+
+    resultados = []
+    for i, p in enumerate(propuestas):
+        clave = (p.pabellon_id, p.fecha)
+        ini, fin = intervalo_ocupado(p.fecha, p.hora_inicio, p.duracion_programada, p.extra_time)
+        choques = indice.conflictos(clave, ini, fin, excluir=getattr(p, "cirugia_id", None))
+
+        existentes = [o.cirugia_id for o in choques if not isinstance(o.cirugia_id, str)]
+        entre_propuestas = [int(o.cirugia_id[1:]) for o in choques if isinstance(o.cirugia_id, str)]
+        ok = not choques
+        if ok:
+            # Las propuestas aceptadas ocupan su lugar para las siguientes ("#i")
+            indice.agregar(clave, ini, fin, f"#{i}")
+
+        resultados.append({
+            "indice": i, "ok": ok,
+            "conflictos": existentes, "conflictos_propuestas": entre_propuestas
+        })
+    return resultados
+
+
+# ------------------------------------------------------
+# BÚSQUEDA DE HUECOS LIBRES (sweep-line)
+# ------------------------------------------------------
+GRANULARIDAD = 5   # los inicios sugeridos caen en múltiplos de 5 minutos
+
+
+def redondear(momento: datetime) -> datetime:
+    """Redondea hacia arriba al múltiplo de GRANULARIDAD minutos."""
+    base = momento.replace(second=0, microsecond=0)
+    if base < momento:
+        base += timedelta(minutes=1)
+    resto = base.minute % GRANULARIDAD
+    return base + timedelta(minutes=(GRANULARIDAD - resto) % GRANULARIDAD)
+
+
+def cargar_ocupacion(db: Session, pabellon_ids, desde: datetime, hasta: datetime):
+    """{pabellon_id: [(inicio, fin), ...] ordenados} con UNA consulta (aseo incluido)."""
+    ocupacion = {pid: [] for pid in pabellon_ids}
+    if not ocupacion:
+        return ocupacion
+
+    filas = db.query(
+        models.Cirugia.pabellon_id, models.Cirugia.fecha, models.Cirugia.hora_inicio,
+        models.Cirugia.duracion_programada, models.Cirugia.extra_time
+    ).filter(
+        models.Cirugia.pabellon_id.in_(list(ocupacion)),
+        # el día anterior puede invadir la ventana pasada la medianoche
+        models.Cirugia.fecha >= desde.date() - timedelta(days=1),
+        models.Cirugia.fecha <= hasta.date(),
+        models.Cirugia.estado.notin_(ESTADOS_LIBRES)
+    ).all()
+
+    for f in filas:
+        ocupacion[f.pabellon_id].append(intervalo_ocupado(f.fecha, f.hora_inicio, f.duracion_programada, f.extra_time))
+    for intervalos in ocupacion.values():
+        intervalos.sort()
+    return ocupacion
+
+
+def huecos(ocupados, desde: datetime, hasta: datetime, minutos: int):
+    """
+    Recorre los intervalos ocupados (ordenados) de un pabellón y genera los
+    huecos (inicio, fin_hueco) de al menos `minutos` dentro de [desde, hasta).
+    """
+    necesario = timedelta(minutes=minutos)
+    cursor = redondear(desde)
+    for ini, fin in ocupados:
+        if fin <= cursor:
+            continue
+        limite = min(ini, hasta)
+        if limite - cursor >= necesario:
+            yield cursor, limite
+        if ini >= hasta:
+            return
+        cursor = redondear(max(cursor, fin))
+    if hasta - cursor >= necesario:
+        yield cursor, hasta
+
+
+def primeros_huecos(ocupacion, pabellones, desde: datetime, hasta: datetime, minutos: int, limite: int):
+    """
+    Los `limite` huecos más tempranos entre todos los pabellones dados.
+    A igual hora prefiere pabellones NO complejos, para reservar los complejos.
+    """
+    def candidatos(p):
+        for ini, fin_hueco in huecos(ocupacion.get(p.id, []), desde, hasta, minutos):
+            yield ini, bool(p.es_compleja), p.id, fin_hueco, p
+
+    generadores = [candidatos(p) for p in pabellones]
+    resultado = []
+    for ini, _, _, fin_hueco, p in heapq.merge(*generadores):
+        resultado.append((ini, fin_hueco, p))
+        if len(resultado) >= limite:
+            break
+    return resultado
+
+
+def pabellones_aptos(pabellones, compleja: Optional[bool]):
+    # compleja=True exige pabellón complejo; los casos simples pueden ir a cualquiera
+    return [p for p in pabellones if not compleja or p.es_compleja]
+
+
+def reservar(ocupacion, pabellon_id, inicio: datetime, fin: datetime):
+    """Marca un hueco como ocupado (búsquedas en lote)."""
+    insort(ocupacion.setdefault(pabellon_id, []), (inicio, fin))
@@ -0,0 +1,56 @@
+# app/core/bloqueos.py
+
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# ======================================================
+# BLOQUEOS FINOS POR (PABELLÓN, FECHA)
+# ======================================================
+# Verificar choques e insertar debe ser atómico por pabellón/día, pero sin
+# un lock global: reservas en pabellones distintos corren en paralelo.
+#
+# - PostgreSQL: pg_advisory_xact_lock(pabellon_id, fecha.toordinal()).
+#   Lo libera la propia BD en el commit/rollback, sirve entre procesos.
+# - SQLite (local): locks de proceso por franjas (lock striping). Memoria
+#   acotada y claves distintas casi siempre caen en franjas distintas.
+#
+# Uso: todo el "verificar + escribir + commit" va DENTRO del with.
+
+FRANJAS = 256
+_franjas = [threading.Lock() for _ in range(FRANJAS)]
+
+
+def _claves_ordenadas(claves):
+    # Orden fijo para que dos requests con varias claves nunca se bloqueen en cruz
+    return sorted({(int(p), f) for p, f in claves if p is not None and f is not None})
+
+
+@contextmanager
+def bloqueo_agenda(db: Session, *claves):
+    """Serializa las reservas sobre las claves (pabellon_id, fecha) indicadas."""
+    claves = _claves_ordenadas(claves)
+
+    if db.get_bind().dialect.name == "postgresql":
+        for pabellon_id, fecha in claves:
+            db.execute(
+                text("SELECT pg_advisory_xact_lock(:pabellon, :dia)"),
+                {"pabellon": pabellon_id, "dia": fecha.toordinal()}
+            )
+        yield
+        return
+
+    # La conexión se toma ANTES que las franjas: quien tiene una franja nunca
+    # espera al pool, porque si no, con el pool agotado por requests que
+    # esperan esa misma franja, ninguno avanza hasta el timeout del pool.
+    db.connection()
+    franjas = sorted({hash(clave) % FRANJAS for clave in claves})
+    for i in franjas:
+        _franjas[i].acquire()
+    try:
+        yield
+    finally:
+        for i in reversed(franjas):
+            _franjas[i].release()
@@ -0,0 +1,275 @@
+# app/core/busqueda.py
+
+import logging
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from sqlalchemy import case, false, func, or_, text
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core.texto import plegar
+from app.core.paginacion import prefijo
+
+# ======================================================
+# BÚSQUEDA DE PACIENTES (typeahead por nombre y RUT)
+# ======================================================
+# - PostgreSQL: pg_trgm sobre nombre_normalizado (índice GIN creado en
+#   migraciones.py) + prefijo del RUT canónico. Si la extensión no está
+#   instalada (sin permisos para crearla) se busca solo con LIKE.
+# - SQLite: índice en memoria del proceso, construido en la primera
+#   búsqueda y mantenido por los endpoints de escritura de pacientes:
+#     * palabras ordenadas → prefijos en O(log n + k)
+#     * trigramas invertidos → coincidencias parciales y errores de tipeo
+#     * RUT compactos ordenados → prefijo del RUT
+#
+# Orden de resultados: RUT, nombre que empieza por la consulta, alguna
+# palabra que empieza por ella, y al final los parecidos (similitud).
+
+SIMILITUD_MINIMA = 0.3   # mismo umbral por defecto que pg_trgm
+MAX_CANDIDATOS_PARECIDOS = 200
+_ES_RUT = re.compile(r"^[0-9][0-9.\s]*-?[0-9kK]?$")
+
+log = logging.getLogger(__name__)
+
+
+def consulta_rut(q: str):
+    """Prefijo del RUT canónico si la consulta parece un RUT, si no None."""
+    q = q.strip()
+    if not _ES_RUT.match(q):
+        return None
+    limpio = re.sub(r"[^0-9kK]", "", q).upper().lstrip("0")
+    if "-" in q and len(limpio) > 1:
+        return f"{limpio[:-1]}-{limpio[-1]}"
+    return limpio or None
+
+
+def trigramas(texto: str):
+    # Igual que pg_trgm: cada palabra con dos espacios antes y uno después
+    grams = set()
+    for palabra in texto.split():
+        relleno = f"  {palabra} "
+        grams.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return grams
+
+
+class IndicePacientes:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.construido = False
+
+    def precargar(self, session_factory):
+        """Construye el índice en segundo plano (evita que la 1ª búsqueda espere)."""
+        def construir():
+            db = session_factory()
+            try:
+                with self._lock:
+                    if not self.construido:
+                        self._construir(db)
+            finally:
+                db.close()
+        threading.Thread(target=construir, name="indice-pacientes", daemon=True).start()
+
+    def invalidar(self):
+        """Fuerza reconstruir en la próxima búsqueda (p.ej. tras un bulk)."""
+        with self._lock:
+            self.construido = False
+
+    def _construir(self, db: Session):
+        self._nombres = {}       # id -> nombre plegado
+        self._palabras = []      # (palabra, id) ordenadas
+        self._ruts = []          # (rut sin guion, id) ordenados
+        self._rut_de = {}
+        self._trigramas = {}     # trigrama -> array de ids (compacto: 4 bytes por entrada)
+        self._n_trigramas = {}
+        filas = db.query(models.Paciente.id, models.Paciente.nombre_normalizado, models.Paciente.rut_normalizado)
+        for pid, nombre, rut in filas:
+            self._indexar(pid, nombre, rut, ordenar=False)
+        self._palabras.sort()
+        self._ruts.sort()
+        self.construido = True
+
+    def _indexar(self, pid, nombre, rut, ordenar=True):
+        agregar = insort if ordenar else list.append
+        nombre = nombre or ""
+        self._nombres[pid] = nombre
+        for palabra in set(nombre.split()):
+            agregar(self._palabras, (palabra, pid))
+        grams = trigramas(nombre)
+        self._n_trigramas[pid] = len(grams)
+        for t in grams:
+            self._trigramas.setdefault(t, array("i")).append(pid)
+        if rut:
+            compacto = rut.replace("-", "")
+            self._rut_de[pid] = compacto
+            agregar(self._ruts, (compacto, pid))
+
+    def _desindexar(self, pid):
+        nombre = self._nombres.pop(pid, None)
+        if nombre is None:
+            return
+        for palabra in set(nombre.split()):
+            i = bisect_left(self._palabras, (palabra, pid))
+            if i < len(self._palabras) and self._palabras[i] == (palabra, pid):
+                del self._palabras[i]
+        self._n_trigramas.pop(pid, None)
+        for t in trigramas(nombre):
+            ids = self._trigramas.get(t)
+            if ids is not None and pid in ids:
+                ids.remove(pid)
+        compacto = self._rut_de.pop(pid, None)
+        if compacto:
+            i = bisect_left(self._ruts, (compacto, pid))
+            if i < len(self._ruts) and self._ruts[i] == (compacto, pid):
+                del self._ruts[i]
+
+    # -----------------------------
+    # Mantenimiento incremental
+    # -----------------------------
+    def actualizar(self, paciente):
+        with self._lock:
+            if self.construido:
+                self._desindexar(paciente.id)
+                self._indexar(paciente.id, paciente.nombre_normalizado, paciente.rut_normalizado)
+
+    def quitar(self, paciente_id: int):
+        with self._lock:
+            if self.construido:
+                self._desindexar(paciente_id)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    @staticmethod
+    def _rango(lista, prefijo_):
+        i = bisect_left(lista, (prefijo_,))
+        while i < len(lista) and lista[i][0].startswith(prefijo_):
+            yield lista[i][1]
+            i += 1
+
+    def buscar(self, db: Session, q: str, limite: int):
+        """Ids ordenados por relevancia."""
+        with self._lock:
+            if not self.construido:
+                self._construir(db)
+
+            resultado = []
+            rut = consulta_rut(q)
+            if rut:
+                for pid in self._rango(self._ruts, rut.replace("-", "")):
+                    resultado.append(pid)
+                    if len(resultado) >= limite:
+                        return resultado
+
+            plegada = plegar(q)
+            if not plegada:
+                return resultado
+            *completas, ultima = plegada.split()
+
+            # Prefijo: la última palabra puede estar a medio escribir,
+            # las anteriores deben ser prefijo de alguna palabra del nombre
+            vistos = set(resultado)
+            candidatos = []
+            for pid in self._rango(self._palabras, ultima):
+                if pid in vistos:
+                    continue
+                nombre = self._nombres[pid]
+                palabras = nombre.split()
+                if all(any(p.startswith(c) for p in palabras) for c in completas):
+                    vistos.add(pid)
+                    candidatos.append((not nombre.startswith(plegada), nombre, pid))
+                    if len(candidatos) >= limite * 4:
+                        break
+            candidatos.sort()
+            resultado += [pid for _, _, pid in candidatos[:limite - len(resultado)]]
+
+            # Parecidos (infijos o errores de tipeo) si faltan resultados
+            if len(resultado) < limite and len(plegada) >= 3:
+                grams = trigramas(plegada)
+                # Candidatos por los trigramas más raros (los muy comunes,
+                # como "ez ", no discriminan y dominarían el costo); la
+                # similitud exacta se calcula solo sobre los mejores
+                listas = sorted((self._trigramas.get(t, ()) for t in grams), key=len)
+                tope = max(1000, len(self._nombres) // 20)
+                raras = [l for l in listas if len(l) <= tope] or listas[:3]
+                comunes = Counter()
+                for ids in raras:
+                    comunes.update(ids)
+                parecidos = []
+                for pid, _ in comunes.most_common(MAX_CANDIDATOS_PARECIDOS):
+                    if pid in vistos:
+                        continue
+                    n = len(grams & trigramas(self._nombres[pid]))
+                    similitud = n / (len(grams) + self._n_trigramas[pid] - n)
+                    if similitud >= SIMILITUD_MINIMA:
+                        parecidos.append((-similitud, self._nombres[pid], pid))
+                parecidos.sort()
+                resultado += [pid for _, _, pid in parecidos[:limite - len(resultado)]]
+            return resultado
+
+
+indice = IndicePacientes()
+
+
+def usa_indice_local(bind) -> bool:
+    return bind.dialect.name != "postgresql"
+
+
+_trigramas_pg = {}   # url del engine -> pg_trgm instalado
+_trigramas_lock = threading.Lock()
+
+
+def tiene_pg_trgm(db: Session) -> bool:
+    """Si la BD tiene pg_trgm (se consulta una vez por engine)."""
+    bind = db.get_bind()
+    clave = str(bind.url)
+    with _trigramas_lock:
+        if clave in _trigramas_pg:
+            return _trigramas_pg[clave]
+    disponible = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    if not disponible:
+        log.warning("pg_trgm no está instalado: /pacientes/buscar usa solo LIKE (sin tolerancia a errores de tipeo)")
+    with _trigramas_lock:
+        _trigramas_pg[clave] = disponible
+    return disponible
+
+
+def buscar_postgres(db: Session, q: str, limite: int):
+    plegada = plegar(q) or ""
+    rut = consulta_rut(q)
+    N = models.Paciente.nombre_normalizado
+    trgm = bool(plegada) and tiene_pg_trgm(db)
+
+    condiciones = []
+    if rut:
+        condiciones.append(prefijo(models.Paciente.rut_normalizado, rut))
+    if plegada:
+        condiciones += [prefijo(N, plegada), N.like(f"% {plegada}%")]
+        # Sin pg_trgm: cualquier subcadena en vez de los parecidos
+        condiciones.append(N.op("%")(plegada) if trgm else N.like(f"%{plegada}%"))
+    if not condiciones:
+        return []
+
+    rango = case(
+        (prefijo(models.Paciente.rut_normalizado, rut) if rut else false(), 0),
+        (prefijo(N, plegada), 1),
+        (N.like(f"% {plegada}%"), 2),
+        else_=3,
+    )
+    orden = [rango, func.similarity(N, plegada).desc(), N] if trgm else [rango, N]
+    return db.query(models.Paciente).filter(or_(*condiciones)).order_by(*orden).limit(limite).all()
+
+
+def buscar_pacientes(db: Session, q: str, limite: int):
+    if not usa_indice_local(db.get_bind()):
+        return buscar_postgres(db, q, limite)
+
+    ids = indice.buscar(db, q, limite)
+    if not ids:
+        return []
+    por_id = {p.id: p for p in db.query(models.Paciente).filter(models.Paciente.id.in_(ids))}
+    return [por_id[i] for i in ids if i in por_id]
@@ -0,0 +1,149 @@
+# app/core/catalogos.py
+
+import json
+import threading
+from typing import NamedTuple, Optional
+
+from app.db import models
+from app.core.versiones import versiones, EPOCA
+
+# ======================================================
+# CACHÉ DE CATÁLOGOS (pabellones y tipos de cirugía)
+# ======================================================
+# Cambian unas pocas veces al año, pero los leen el polling, el tablero,
+# los slots, el planificador, la importación y cada crear_cirugia. Se
+# cargan una vez al iniciar (lifespan) y los endpoints de escritura de
+# pabellones.py y tipos_cirugia.py los actualizan después del commit
+# (write-through), junto con la versión del recurso en `versiones`.
+#
+# Las entradas son tuplas inmutables: los consumidores pueden guardarlas
+# sin copiar. Igual que `versiones`, supone un solo proceso de API.
+
+RECURSOS = ("pabellones", "tipos_cirugia")
+
+
+class PabellonCatalogo(NamedTuple):
+    id: int
+    nombre: str
+    es_compleja: bool
+    capacidad: int
+
+
+class TipoCatalogo(NamedTuple):
+    id: int
+    nombre: str
+    duracion_estimada: int
+    descripcion: Optional[str]
+
+
+def _pabellon(p) -> PabellonCatalogo:
+    return PabellonCatalogo(p.id, p.nombre, bool(p.es_compleja), p.capacidad or 1)
+
+
+def _tipo(t) -> TipoCatalogo:
+    return TipoCatalogo(t.id, t.nombre, t.duracion_estimada, t.descripcion)
+
+
+class CacheCatalogos:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pabellones = None   # id -> PabellonCatalogo (None = sin cargar)
+        self._tipos = {}          # id -> TipoCatalogo
+        self._serializado = None  # (version, bytes) de /catalogos
+        self.cargas = 0
+
+    # -----------------------------
+    # Carga
+    # -----------------------------
+    def cargar(self, session_factory=None):
+        if session_factory is None:
+            from app.db.database import SessionLocal as session_factory
+        db = session_factory()
+        try:
+            pabellones = {p.id: _pabellon(p) for p in db.query(models.Pabellon)}
+            tipos = {t.id: _tipo(t) for t in db.query(models.TipoCirugia)}
+        finally:
+            db.close()
+        with self._lock:
+            self._pabellones, self._tipos = pabellones, tipos
+            self._serializado = None
+            self.cargas += 1
+
+    def _asegurar(self):
+        # Scripts o tests que no pasan por el lifespan: carga perezosa
+        if self._pabellones is None:
+            self.cargar()
+
+    # -----------------------------
+    # Lectura
+    # -----------------------------
+    def pabellones(self):
+        """Todos los pabellones ordenados por id."""
+        self._asegurar()
+        return sorted(self._pabellones.values())
+
+    def pabellon(self, pabellon_id: int) -> Optional[PabellonCatalogo]:
+        self._asegurar()
+        return self._pabellones.get(pabellon_id)
+
+    def tipos(self):
+        """Todos los tipos de cirugía ordenados por id."""
+        self._asegurar()
+        return sorted(self._tipos.values())
+
+    def tipo(self, tipo_id: int) -> Optional[TipoCatalogo]:
+        self._asegurar()
+        return self._tipos.get(tipo_id)
+
+    # -----------------------------
+    # Write-through (después del commit)
+    # -----------------------------
+    def guardar_pabellon(self, p):
+        self._actualizar("pabellones", "_pabellones", p.id, _pabellon(p))
+
+    def quitar_pabellon(self, pabellon_id: int):
+        self._actualizar("pabellones", "_pabellones", pabellon_id, None)
+
+    def guardar_tipo(self, t):
+        self._actualizar("tipos_cirugia", "_tipos", t.id, _tipo(t))
+
+    def quitar_tipo(self, tipo_id: int):
+        self._actualizar("tipos_cirugia", "_tipos", tipo_id, None)
+
+    def _actualizar(self, recurso, atributo, clave, valor):
+        self._asegurar()
+        with self._lock:
+            # Copia y reemplazo: los lectores nunca ven un dict a medio modificar
+            nuevo = dict(getattr(self, atributo))
+            if valor is None:
+                nuevo.pop(clave, None)
+            else:
+                nuevo[clave] = valor
+            setattr(self, atributo, nuevo)
+            self._serializado = None
+        versiones.incrementar(recurso)
+
+    # -----------------------------
+    # /catalogos (pre-serializado)
+    # -----------------------------
+    def version(self) -> str:
+        return f"{EPOCA}-" + ".".join(str(versiones.actual(r)) for r in RECURSOS)
+
+    def serializado(self):
+        """(version, cuerpo JSON): se arma una vez por cambio de catálogo."""
+        self._asegurar()
+        actual = self._serializado
+        version = self.version()
+        if actual is not None and actual[0] == version:
+            return actual
+        cuerpo = json.dumps({
+            "version": version,
+            "pabellones": [p._asdict() for p in self.pabellones()],
+            "tipos_cirugia": [t._asdict() for t in self.tipos()],
+        }, ensure_ascii=False, separators=(",", ":")).encode()
+        self._serializado = (version, cuerpo)
+        return self._serializado
+
+
+catalogos = CacheCatalogos()
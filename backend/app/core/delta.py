@@ -0,0 +1,85 @@
+# app/core/delta.py
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.db import models
+
+# ======================================================
+# DELTA-SYNC: CURSOR Y PURGA DE TOMBSTONES
+# ======================================================
+# El cambio_seq se asigna en el commit y en orden de commit (ver
+# models.numerar_cambios): un número N confirmado implica que todos los
+# menores ya están confirmados o no existirán. /cambios lee primero el
+# mayor número confirmado (`tope`) y entrega solo hasta ahí; lo que se
+# confirme mientras tanto lleva un número mayor y sale en el siguiente poll,
+# aunque la transacción haya escrito sus filas mucho antes.
+#
+# Los tombstones (CirugiaEliminada) se purgan pasados TOMBSTONES_RETENCION_DIAS
+# y se guarda hasta qué cambio_seq se purgó: un cliente con `since` anterior
+# a ese horizonte ya no puede saber qué se eliminó y debe recargar todo.
+
+RETENCION_DIAS = int(os.getenv("TOMBSTONES_RETENCION_DIAS", "30"))
+PURGA_CADA_S = 3600
+HORIZONTE = "tombstones_purgados_hasta"   # fila en la tabla `secuencias`
+
+log = logging.getLogger(__name__)
+
+
+def tope(db) -> int:
+    """
+    Mayor cambio_seq confirmado, en UNA consulta (una sola foto de la BD):
+    todo cambio con número menor o igual ya es visible para las siguientes.
+    """
+    cirugias, tombstones = db.execute(select(
+        select(func.max(models.Cirugia.cambio_seq)).scalar_subquery(),
+        select(func.max(models.CirugiaEliminada.cambio_seq)).scalar_subquery(),
+    )).one()
+    return max(cirugias or 0, tombstones or 0)
+
+
+def horizonte(db) -> int:
+    """Mayor cambio_seq de los tombstones purgados (0 si nunca se purgó)."""
+    fila = db.get(models.Secuencia, HORIZONTE)
+    return fila.valor if fila else 0
+
+
+def purgar_tombstones(db) -> int:
+    """Elimina los tombstones más antiguos que la retención. Devuelve cuántos."""
+    limite = datetime.now() - timedelta(days=RETENCION_DIAS)
+    viejos = db.query(models.CirugiaEliminada).filter(models.CirugiaEliminada.eliminado_en < limite)
+    hasta = viejos.with_entities(func.max(models.CirugiaEliminada.cambio_seq)).scalar()
+    if hasta is None:
+        return 0
+
+    fila = db.get(models.Secuencia, HORIZONTE)
+    if fila is None:
+        db.add(models.Secuencia(nombre=HORIZONTE, valor=hasta))
+    else:
+        fila.valor = max(fila.valor, hasta)
+    # Todo lo que quede con cambio_seq <= hasta ya no se distingue del horizonte
+    borrados = db.query(models.CirugiaEliminada).filter(models.CirugiaEliminada.cambio_seq <= hasta) \
+        .delete(synchronize_session=False)
+    db.commit()
+    if borrados:
+        log.info("Tombstones purgados: %s (hasta cambio_seq %s)", borrados, hasta)
+    return borrados
+
+
+_lock = threading.Lock()
+_proxima_purga = 0.0
+
+
+def purgar_si_corresponde(db) -> int:
+    """Purga a lo más una vez cada PURGA_CADA_S por proceso (la llama /cambios)."""
+    global _proxima_purga
+    with _lock:
+        if time.monotonic() < _proxima_purga:
+            return 0
+        _proxima_purga = time.monotonic() + PURGA_CADA_S
+    return purgar_tombstones(db)
@@ -0,0 +1,254 @@
+# app/core/diagnostico.py
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# ======================================================
+# DIAGNÓSTICO SQL (opt-in: DIAGNOSTICO_SQL=1)
+# ======================================================
+# Pensado para desarrollo y para revisar un endpoint nuevo, no para dejarlo
+# encendido en producción (guarda el texto de cada sentencia del request):
+#
+# - Consulta lenta: toda sentencia que tarde más de DIAGNOSTICO_LENTA_MS va
+#   al log (WARNING) con sus parámetros y la ruta que la emitió.
+# - N+1: si un request ejecuta el mismo SELECT parametrizado más de
+#   DIAGNOSTICO_N_MAS_1 veces (el patrón de acceder a una relación lazy
+#   dentro de un loop), se marca el request y la sentencia (WARNING).
+# - Resumen por request: una línea DEBUG por request con sentencias y tiempo
+#   SQL (LOG_LEVEL=DEBUG), y el header Server-Timing (lo muestran las
+#   devtools del navegador).
+#
+# Los hallazgos recientes quedan en GET /internal/diagnostico.
+# `presupuesto_consultas` funciona siempre, aunque el modo esté apagado.
+
+DIAGNOSTICO_ACTIVO = os.getenv("DIAGNOSTICO_SQL", "0") == "1"
+LENTA_MS = float(os.getenv("DIAGNOSTICO_LENTA_MS", "100"))
+N_MAS_1 = int(os.getenv("DIAGNOSTICO_N_MAS_1", "5"))
+MAX_HALLAZGOS = 100
+MAX_PARAMETROS = 300   # caracteres de parámetros que van al log
+
+log = logging.getLogger(__name__)
+
+
+def _resumir_sql(statement: str, largo: int = 160) -> str:
+    texto = " ".join(statement.split())
+    return texto if len(texto) <= largo else texto[:largo] + "…"
+
+
+def _resumir_parametros(parameters, executemany: bool) -> str:
+    if executemany and parameters:
+        texto = f"{parameters[0]!r} (+{len(parameters) - 1} filas)"
+    else:
+        texto = repr(parameters)
+    return texto if len(texto) <= MAX_PARAMETROS else texto[:MAX_PARAMETROS] + "…"
+
+
+def _es_select(statement: str) -> bool:
+    return statement.lstrip()[:6].upper() == "SELECT"
+
+
+def _ruta(scope) -> str:
+    # El router deja la ruta atendida en el mismo dict del scope
+    if scope is None:
+        return "<fuera de request>"
+    ruta = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {ruta}"
+
+
+class _Traza:
+    __slots__ = ("scope", "sentencias", "segundos", "selects")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.sentencias = 0
+        self.segundos = 0.0
+        self.selects = Counter()   # SELECT parametrizado -> veces
+
+
+_traza = contextvars.ContextVar("diagnostico_sql", default=None)
+
+
+class Diagnostico:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hallazgos = deque(maxlen=MAX_HALLAZGOS)
+        self.lentas = 0
+        self.n_mas_1 = 0
+        self.requests = 0
+
+    def _registrar(self, hallazgo: dict):
+        with self._lock:
+            self.hallazgos.append(hallazgo)
+
+    # -----------------------------
+    # Eventos del engine
+    # -----------------------------
+    def instrumentar_engine(self, engine):
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._despues)
+        event.listen(engine, "handle_error", self._error)
+
+    @staticmethod
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("diagnostico_inicio", []).append(time.perf_counter())
+
+    @staticmethod
+    def _error(contexto):
+        conn = contexto.connection
+        if conn is not None and conn.info.get("diagnostico_inicio"):
+            conn.info["diagnostico_inicio"].pop()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("diagnostico_inicio")
+        if not inicios:
+            return
+        duracion = time.perf_counter() - inicios.pop()
+        traza = _traza.get()
+        if traza is not None:
+            traza.sentencias += 1
+            traza.segundos += duracion
+            if _es_select(statement):
+                traza.selects[statement] += 1
+
+        ms = duracion * 1000
+        if ms >= LENTA_MS:
+            ruta = _ruta(traza.scope if traza else None)
+            parametros = _resumir_parametros(parameters, executemany)
+            with self._lock:
+                self.lentas += 1
+            self._registrar({
+                "tipo": "lenta", "ruta": ruta, "ms": round(ms, 1),
+                "sql": _resumir_sql(statement, 500), "parametros": parametros, "en": time.time(),
+            })
+            log.warning("SQL lenta (%.0f ms) en %s: %s | parámetros: %s", ms, ruta, _resumir_sql(statement), parametros)
+
+    # -----------------------------
+    # Fin de request
+    # -----------------------------
+    def cerrar_request(self, traza: _Traza, estado: int, duracion: float):
+        ruta = _ruta(traza.scope)
+        repetidas = [(sql, n) for sql, n in traza.selects.most_common() if n > N_MAS_1]
+        with self._lock:
+            self.requests += 1
+            self.n_mas_1 += bool(repetidas)
+        for sql, n in repetidas:
+            self._registrar({"tipo": "n_mas_1", "ruta": ruta, "veces": n, "sql": _resumir_sql(sql, 500), "en": time.time()})
+            log.warning("Posible N+1 en %s: %s× %s", ruta, n, _resumir_sql(sql))
+        log.debug(
+            "%s → %s · %.1f ms · %s sentencias SQL · %.1f ms en SQL%s",
+            ruta, estado, duracion * 1000, traza.sentencias, traza.segundos * 1000,
+            f" · {len(repetidas)} N+1" if repetidas else "",
+        )
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "activo": DIAGNOSTICO_ACTIVO,
+                "umbral_lenta_ms": LENTA_MS,
+                "umbral_n_mas_1": N_MAS_1,
+                "requests": self.requests,
+                "lentas": self.lentas,
+                "requests_con_n_mas_1": self.n_mas_1,
+                "hallazgos": list(self.hallazgos)[::-1],
+            }
+
+
+diagnostico = Diagnostico()
+
+
+# ======================================================
+# MIDDLEWARE (solo se agrega con DIAGNOSTICO_SQL=1)
+# ======================================================
+class MiddlewareDiagnostico:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        traza = _Traza(scope)
+        token = _traza.set(traza)
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                servidor = f'sql;dur={traza.segundos * 1000:.1f};desc="{traza.sentencias} sentencias"'
+                mensaje = {**mensaje, "headers": list(mensaje.get("headers", [])) + [(b"server-timing", servidor.encode())]}
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _traza.reset(token)
+            diagnostico.cerrar_request(traza, estado, time.perf_counter() - inicio)
+
+
+# ======================================================
+# PRESUPUESTO DE CONSULTAS (para tests)
+# ======================================================
+class ConteoConsultas:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sentencias = []
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.sentencias.append(statement)
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    def detalle(self) -> str:
+        return "\n".join(f"  {n}× {_resumir_sql(sql)}" for sql, n in Counter(self.sentencias).most_common())
+
+
+def _engines_por_defecto():
+    from app.db.database import engine, async_engine
+    return [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+
+
+@contextmanager
+def contar_consultas(engines=None):
+    """Cuenta las sentencias SQL emitidas dentro del bloque (en cualquier hilo)."""
+    engines = engines or _engines_por_defecto()
+    conteo = ConteoConsultas()
+    for e in engines:
+        event.listen(e, "after_cursor_execute", conteo._registrar)
+    try:
+        yield conteo
+    finally:
+        for e in engines:
+            event.remove(e, "after_cursor_execute", conteo._registrar)
+
+
+@contextmanager
+def presupuesto_consultas(maximo: int, engines=None):
+    """Falla con AssertionError si el bloque emite más de `maximo` sentencias SQL.
+
+        with presupuesto_consultas(3):
+            r = client.get("/cirugias/tablero")
+
+    El mensaje de error lista las sentencias agrupadas: un N+1 se ve como
+    una sola sentencia repetida muchas veces.
+    """
+    with contar_consultas(engines) as conteo:
+        yield conteo
+    if conteo.total > maximo:
+        raise AssertionError(
+            f"Se esperaban a lo más {maximo} sentencias SQL y hubo {conteo.total}:\n{conteo.detalle()}"
+        )
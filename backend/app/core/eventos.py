@@ -0,0 +1,96 @@
+# app/core/eventos.py
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+# ======================================================
+# HUB DE EVENTOS (uno por proceso)
+# ======================================================
+# Los endpoints de cirugías y el scheduler publican eventos compactos;
+# cada cliente conectado por WebSocket/SSE tiene su propia cola.
+# `publicar` es seguro desde cualquier hilo (los endpoints `def` corren en
+# el threadpool y el scheduler en su propio hilo).
+
+TAMANO_COLA = 256
+
+# Marca que se deja en la cola de un cliente para que su endpoint cierre la
+# conexión (el usuario fue modificado/desactivado: debe reautenticarse)
+CERRAR = object()
+
+
+class HubEventos:
+
+    def __init__(self):
+        self._loop = None
+        self._colas = {}   # cola -> Principal del suscriptor (o None)
+        self._lock = threading.Lock()
+
+    def vincular(self, loop: asyncio.AbstractEventLoop):
+        """Se llama en el lifespan con el loop que atiende los sockets."""
+        self._loop = loop
+
+    @property
+    def conectados(self) -> int:
+        return len(self._colas)
+
+    def suscribir(self, principal=None) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=TAMANO_COLA)
+        with self._lock:
+            self._colas[cola] = principal
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue):
+        with self._lock:
+            self._colas.pop(cola, None)
+
+    def expulsar(self, username=None, usuario_id=None):
+        """Cierra las conexiones de un usuario (seguro desde cualquier hilo)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._expulsar, username, usuario_id)
+        except RuntimeError:
+            pass   # loop cerrándose
+
+    def _expulsar(self, username, usuario_id):
+        with self._lock:
+            colas = [
+                cola for cola, p in self._colas.items()
+                if p is not None and ((username is not None and p.username == username) or
+                                      (usuario_id is not None and p.id == usuario_id))
+            ]
+            for cola in colas:
+                del self._colas[cola]
+        for cola in colas:
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(CERRAR)
+
+    def publicar(self, tipo: str, **datos):
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._colas:
+            return
+        evento = {"tipo": tipo, "ts": datetime.now().isoformat(timespec="seconds"), **datos}
+        mensaje = json.dumps(evento, default=str, separators=(",", ":"))
+        try:
+            loop.call_soon_threadsafe(self._repartir, mensaje)
+        except RuntimeError:
+            pass   # loop cerrándose
+
+    def _repartir(self, mensaje: str):
+        with self._lock:
+            colas = list(self._colas)
+        for cola in colas:
+            try:
+                cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                # Cliente lento: descartamos su backlog y le pedimos recargar todo
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait('{"tipo":"resync"}')
+
+
+hub = HubEventos()
@@ -0,0 +1,93 @@
+# app/core/hashing.py
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# ======================================================
+# POOL DEDICADO PARA BCRYPT (con control de admisión)
+# ======================================================
+# bcrypt es CPU pura (~0.2-0.3 s por hash con costo 12). Si corre en el
+# threadpool por defecto de AnyIO, una ola de logins (cambio de turno) deja
+# sin workers al resto de los endpoints síncronos (polling del tablero).
+#
+# Aquí corre en su propio executor de HASH_WORKERS hilos, con a lo más
+# HASH_COLA_MAX trabajos esperando. Si está lleno responde 503 de inmediato
+# con Retry-After estimado, en vez de encolar sin límite.
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(2, (os.cpu_count() or 2) // 2))))
+HASH_COLA_MAX = int(os.getenv("HASH_COLA_MAX", "32"))
+
+
+class PoolHashing:
+
+    def __init__(self, workers: int = HASH_WORKERS, cola_max: int = HASH_COLA_MAX):
+        self.workers = workers
+        self.cola_max = cola_max
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._cupos = threading.BoundedSemaphore(workers + cola_max)
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.completados = 0
+        self.rechazados = 0
+        self._duracion_media = 0.25   # segundos, media móvil
+
+    def _admitir(self):
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self.rechazados += 1
+                espera = math.ceil((self.en_curso / self.workers) * self._duracion_media) or 1
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado, reintente en unos segundos",
+                headers={"Retry-After": str(espera)}
+            )
+        with self._lock:
+            self.en_curso += 1
+
+    def _medir(self, fn, *args):
+        inicio = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._lock:
+                self._duracion_media = 0.8 * self._duracion_media + 0.2 * duracion
+
+    def _liberar(self, _futuro):
+        with self._lock:
+            self.en_curso -= 1
+            self.completados += 1
+        self._cupos.release()
+
+    def enviar(self, fn, *args):
+        """Encola fn(*args) en el pool; 503 si está saturado. Devuelve un Future."""
+        self._admitir()
+        futuro = self._executor.submit(self._medir, fn, *args)
+        # El cupo se libera al terminar el trabajo, aunque el cliente se haya ido
+        futuro.add_done_callback(self._liberar)
+        return futuro
+
+    async def ejecutar(self, fn, *args):
+        """Para endpoints async: espera sin ocupar ningún hilo."""
+        return await asyncio.wrap_future(self.enviar(fn, *args))
+
+    def ejecutar_bloqueante(self, fn, *args):
+        """Para código síncrono: el hash igual corre (y se limita) en el pool."""
+        return self.enviar(fn, *args).result()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "workers": self.workers, "cola_max": self.cola_max,
+                "en_curso": self.en_curso, "completados": self.completados,
+                "rechazados": self.rechazados, "duracion_media_ms": round(self._duracion_media * 1000, 1),
+            }
+
+
+pool_hashing = PoolHashing()
@@ -0,0 +1,384 @@
+# app/core/importacion.py
+
+import csv
+import json
+import pickle
+import tempfile
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core import agenda
+from app.core.bloqueos import bloqueo_agenda
+from app.core.catalogos import catalogos
+from app.core.rut import normalizar_rut
+from app.core.texto import plegar
+
+# ======================================================
+# IMPORTACIÓN MASIVA EN STREAMING (NDJSON / CSV)
+# ======================================================
+# El cuerpo se parsea línea a línea y se procesa en lotes de TAMANO_LOTE:
+# la memoria queda acotada por el lote (más los sets de ids), no por el
+# tamaño del archivo. El reporte guarda como máximo MAX_ERRORES detalles.
+# En CSV un registro puede ocupar varias líneas (campos entre comillas con
+# saltos de línea): se acumulan líneas hasta cerrar las comillas.
+
+TAMANO_LOTE = 500
+MAX_ERRORES = 1000
+FORMATOS = ("ndjson", "csv")
+MODOS = ("parcial", "todo")
+
+
+async def leer_filas(stream, formato: str):
+    """Genera (numero_linea, dict | Exception) desde un stream de bytes."""
+    if formato not in FORMATOS:
+        raise HTTPException(400, f"Formato no soportado: {formato} (use ndjson o csv)")
+
+    buffer = b""
+    numero = 0
+    encabezado = None
+
+    async def lineas():
+        nonlocal buffer
+        async for trozo in stream:
+            buffer += trozo
+            *completas, buffer = buffer.split(b"\n")
+            for linea in completas:
+                yield linea
+        if buffer:
+            yield buffer
+
+    async def registros():
+        # (línea donde empieza, texto): en CSV las comillas abiertas (cantidad
+        # impar de `"`, las escapadas `""` cuentan doble) continúan el registro
+        nonlocal numero
+        pendiente, inicio = None, 0
+        async for cruda in lineas():
+            numero += 1
+            texto = cruda.decode("utf-8-sig")
+            if pendiente is not None:
+                pendiente += "\n" + texto
+            elif formato == "csv" and texto.count('"') % 2:
+                pendiente, inicio = texto, numero
+            else:
+                yield numero, texto
+                continue
+            if pendiente.count('"') % 2 == 0:
+                yield inicio, pendiente
+                pendiente = None
+        if pendiente is not None:
+            yield inicio, pendiente
+
+    async for linea, texto in registros():
+        texto = texto.strip()
+        if not texto:
+            continue
+        try:
+            if formato == "ndjson":
+                fila = json.loads(texto)
+                if not isinstance(fila, dict):
+                    raise ValueError("cada línea debe ser un objeto JSON")
+            else:
+                valores = next(csv.reader([texto], strict=True))
+                if encabezado is None:
+                    encabezado = [v.strip() for v in valores]
+                    continue
+                fila = {k: (v.strip() or None) for k, v in zip(encabezado, valores)}
+        except (ValueError, StopIteration, csv.Error) as e:
+            yield linea, e
+            continue
+        yield linea, fila
+
+
+async def por_lotes(filas, tamano: int = TAMANO_LOTE):
+    lote = []
+    async for item in filas:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class Reporte:
+    """Reporte por fila, con los detalles de error acotados."""
+
+    def __init__(self, modo: str):
+        if modo not in MODOS:
+            raise HTTPException(400, f"Modo no soportado: {modo} (use parcial o todo)")
+        self.modo = modo
+        self.procesadas = 0
+        self.insertadas = 0
+        self.con_error = 0
+        self.errores = []
+        self.errores_omitidos = 0
+
+    def error(self, linea: int, mensaje: str):
+        self.con_error += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({"linea": linea, "error": mensaje})
+        else:
+            self.errores_omitidos += 1
+
+    def como_dict(self, confirmado: bool, **extra):
+        return {
+            "modo": self.modo, "confirmado": confirmado,
+            "procesadas": self.procesadas, "insertadas": self.insertadas if confirmado else 0,
+            "con_error": self.con_error, "errores": sorted(self.errores, key=lambda e: e["linea"]),
+            "errores_omitidos": self.errores_omitidos, **extra
+        }
+
+
+def mensaje_validacion(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def validar_fila(esquema, fila):
+    if isinstance(fila, Exception):
+        raise ValueError(f"línea ilegible: {fila}")
+    try:
+        return esquema.model_validate(fila)
+    except ValidationError as e:
+        raise ValueError(mensaje_validacion(e))
+
+
+def confirmar_o_revertir(db: Session, reporte: Reporte, por_lote: bool) -> bool:
+    """Cierra la transacción según el modo; devuelve si quedó confirmada."""
+    confirmado = por_lote or reporte.con_error == 0
+    (db.commit if confirmado else db.rollback)()
+    return confirmado
+
+
+async def importar(request, db: Session, crear_importador, formato, modo: str):
+    """
+    Recorre el cuerpo del request por lotes y los procesa en el threadpool
+    (la BD es síncrona). Devuelve (reporte, confirmado).
+    """
+    formato = formato or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    reporte = Reporte(modo)
+    por_lote = modo == "parcial"
+
+    importador = await run_in_threadpool(crear_importador, db, reporte)
+    try:
+        async for lote in por_lotes(leer_filas(request.stream(), formato)):
+            await run_in_threadpool(importador.procesar_lote, lote, por_lote)
+        confirmado = await run_in_threadpool(importador.cerrar, por_lote)
+    except Exception:
+        await run_in_threadpool(db.rollback)
+        raise
+    return reporte, confirmado
+
+
+# ------------------------------------------------------
+# CIRUGÍAS
+# ------------------------------------------------------
+class ImportadorCirugias:
+    """
+    Valida FKs contra sets de ids precargados, revisa choques agrupando
+    el lote por (pabellón, fecha) y ordenando cada grupo UNA vez, e inserta
+    las filas válidas con un INSERT multi-fila por lote.
+
+    modo=parcial: cada lote verifica, inserta y confirma bajo el bloqueo de
+    sus claves. modo=todo: la transacción dura todo el archivo, así que los
+    lotes solo se validan y se apartan en un archivo temporal (memoria
+    acotada) juntando sus claves; `cerrar` toma TODAS las claves de una vez,
+    en el orden fijo de bloqueo_agenda, y las mantiene hasta el commit.
+    """
+
+    def __init__(self, db: Session, reporte: Reporte, esquema):
+        self.db = db
+        self.reporte = reporte
+        self.esquema = esquema
+        self.pacientes = {i for (i,) in db.query(models.Paciente.id)}
+        self.doctores = {i for (i,) in db.query(models.Usuario.id)}
+        self.pabellones = {p.id for p in catalogos.pabellones()}
+        self.tipos = {t.id: t.duracion_estimada for t in catalogos.tipos()}
+        self.claves = set()
+        self.apartadas = None
+
+    def _validar(self, numero, fila):
+        datos = validar_fila(self.esquema, fila)
+
+        faltantes = [
+            nombre for nombre, valor, ids in (
+                ("paciente_id", datos.paciente_id, self.pacientes),
+                ("doctor_id", datos.doctor_id, self.doctores),
+                ("pabellon_id", datos.pabellon_id, self.pabellones),
+                ("tipo_cirugia_id", datos.tipo_cirugia_id, self.tipos),
+            ) if valor not in ids
+        ]
+        if faltantes:
+            raise ValueError(f"no existe: {', '.join(faltantes)}")
+        if datos.duracion_programada is None:
+            datos.duracion_programada = self.tipos[datos.tipo_cirugia_id]
+        return datos
+
+    def procesar_lote(self, lote, confirmar_lote: bool):
+        validas = []
+        for numero, fila in lote:
+            self.reporte.procesadas += 1
+            try:
+                validas.append((numero, self._validar(numero, fila)))
+            except ValueError as e:
+                self.reporte.error(numero, str(e))
+
+        if not confirmar_lote:
+            self._apartar(validas)
+            return
+        claves = {(d.pabellon_id, d.fecha) for _, d in validas}
+        with bloqueo_agenda(self.db, *claves):
+            self._reservar(validas, claves)
+            self.db.commit()
+
+    def cerrar(self, por_lote: bool) -> bool:
+        if por_lote:
+            return confirmar_o_revertir(self.db, self.reporte, por_lote)
+        try:
+            with bloqueo_agenda(self.db, *self.claves):
+                for validas in self._recorrer_apartadas():
+                    self._reservar(validas, {(d.pabellon_id, d.fecha) for _, d in validas})
+                return confirmar_o_revertir(self.db, self.reporte, por_lote)
+        finally:
+            if self.apartadas:
+                self.apartadas.close()
+
+    def _apartar(self, validas):
+        self.claves |= {(d.pabellon_id, d.fecha) for _, d in validas}
+        if not validas:
+            return
+        if self.apartadas is None:
+            self.apartadas = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        pickle.dump(validas, self.apartadas)
+
+    def _recorrer_apartadas(self):
+        if self.apartadas is None:
+            return
+        self.apartadas.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.apartadas)
+            except EOFError:
+                return
+
+    def _reservar(self, validas, claves):
+        # Quien llama ya tiene bloqueadas las claves
+        indice = agenda.IndiceAgenda.cargar(self.db, claves)
+
+        grupos = {}
+        for numero, d in validas:
+            grupos.setdefault((d.pabellon_id, d.fecha), []).append((d.hora_inicio, numero, d))
+
+        aceptadas = []
+        for clave, grupo in grupos.items():
+            grupo.sort(key=lambda g: (g[0], g[1]))
+            for _, numero, d in grupo:
+                if d.estado not in agenda.ESTADOS_LIBRES:
+                    ini, fin = agenda.intervalo_ocupado(d.fecha, d.hora_inicio, d.duracion_programada, d.extra_time)
+                    choques = indice.conflictos(clave, ini, fin)
+                    if choques:
+                        ids = ", ".join(str(o.cirugia_id) for o in choques)
+                        self.reporte.error(numero, f"Choque de horario (incluyendo {agenda.TIEMPO_ASEO}min aseo) con {ids}")
+                        continue
+                    indice.agregar(clave, ini, fin, f"línea {numero}")
+                aceptadas.append(d)
+
+        if aceptadas:
+            self._insertar(aceptadas)
+
+    def _insertar(self, aceptadas):
+        # INSERT masivo (no dispara los eventos ORM): timestamps y secuencia a mano
+        seq = models.cambio_pendiente(self.db)
+        ahora = datetime.now()
+        filas = []
+        for d in aceptadas:
+            inicio_ts, fin_ts = models.calcular_timestamps(d.fecha, d.hora_inicio, d.duracion_programada, d.extra_time)
+            filas.append({
+                "paciente_id": d.paciente_id, "doctor_id": d.doctor_id, "pabellon_id": d.pabellon_id,
+                "tipo_cirugia_id": d.tipo_cirugia_id, "fecha": d.fecha, "hora_inicio": d.hora_inicio,
+                "duracion_programada": d.duracion_programada, "extra_time": d.extra_time or 0,
+                "estado": d.estado, "es_aseo": False,
+                "inicio_ts": inicio_ts, "fin_estimado_ts": fin_ts, "cambio_seq": seq, "actualizado_en": ahora,
+            })
+        self.db.execute(insert(models.Cirugia), filas)
+        self.reporte.insertadas += len(filas)
+
+
+# ------------------------------------------------------
+# PACIENTES
+# ------------------------------------------------------
+class ImportadorPacientes:
+    """
+    Normaliza y valida el RUT (dígito verificador incluido), deduplica
+    dentro del lote y contra la BD con UN `IN (...)` por lote sobre el
+    índice de rut_normalizado, e inserta el lote en un solo INSERT.
+    Los lotes anteriores ya están en la BD (o en la misma transacción),
+    así que no hace falta recordar los RUT vistos: la memoria no crece.
+    """
+
+    def __init__(self, db: Session, reporte: Reporte, esquema):
+        self.db = db
+        self.reporte = reporte
+        self.esquema = esquema
+
+    def procesar_lote(self, lote, confirmar_lote: bool):
+        validas = []
+        for numero, fila in lote:
+            self.reporte.procesadas += 1
+            try:
+                datos = validar_fila(self.esquema, fila)
+                validas.append((numero, datos, normalizar_rut(datos.rut)))
+            except ValueError as e:
+                self.reporte.error(numero, str(e))
+
+        ruts = {rut for _, _, rut in validas if rut}
+        existentes = dict(self.db.execute(
+            select(models.Paciente.rut_normalizado, models.Paciente.id)
+            .where(models.Paciente.rut_normalizado.in_(ruts))
+        ).all()) if ruts else {}
+
+        filas, vistos = [], {}
+        for numero, datos, rut in validas:
+            if rut in existentes:
+                self.reporte.error(numero, f"Ya existe un paciente con ese RUT (id {existentes[rut]})")
+                continue
+            if rut in vistos:
+                self.reporte.error(numero, f"RUT repetido en la línea {vistos[rut]}")
+                continue
+            if rut:
+                vistos[rut] = numero
+            filas.append((numero, {**datos.model_dump(), "rut_normalizado": rut, "nombre_normalizado": plegar(datos.nombre)}))
+
+        if filas:
+            self._insertar(filas)
+        if confirmar_lote:
+            self.db.commit()
+
+    def cerrar(self, por_lote: bool) -> bool:
+        return confirmar_o_revertir(self.db, self.reporte, por_lote)
+
+    def _insertar(self, filas):
+        # Otro request puede insertar el mismo RUT entre el SELECT de
+        # duplicados y el INSERT: el lote se reintenta fila a fila (cada una
+        # en su SAVEPOINT) y las que chocan con el índice único quedan como
+        # error de su línea, sin perder el resto.
+        try:
+            with self.db.begin_nested():
+                self.db.execute(insert(models.Paciente), [f for _, f in filas])
+            self.reporte.insertadas += len(filas)
+            return
+        except IntegrityError:
+            pass
+        for numero, fila in filas:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(models.Paciente), fila)
+                self.reporte.insertadas += 1
+            except IntegrityError:
+                self.reporte.error(numero, "Ya existe un paciente con ese RUT")
@@ -0,0 +1,309 @@
+# app/core/metricas.py
+
+import contextvars
+import os
+from contextlib import contextmanager
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+# ======================================================
+# MÉTRICAS (formato de texto de Prometheus, GET /metrics)
+# ======================================================
+# Contadores, medidores e histogramas mínimos, sin dependencias: lo justo
+# para exponer el formato de texto 0.0.4 que Prometheus sabe leer.
+#
+# - MiddlewareMetricas (ASGI puro) mide cada request HTTP por plantilla de
+#   ruta ("/cirugias/{cirugia_id}", no el id concreto), método y status:
+#   latencia, bytes de respuesta y requests en curso.
+# - Los eventos de cursor de SQLAlchemy suman sentencias y tiempo SQL al
+#   request en curso (contextvar: sigue al request también dentro del
+#   threadpool y de AsyncSession.run_sync).
+# - El scheduler y /actualizar-estados registran sus trabajos aquí.
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BUCKETS_SENTENCIAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")   # si se define, /metrics exige "Bearer <token>"
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _clave(self, valores):
+        if len(valores) != len(self.etiquetas):
+            raise ValueError(f"{self.nombre}: se esperaban etiquetas {self.etiquetas}")
+        return tuple(str(v) for v in valores)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for clave, valor in series:
+            lineas += self._lineas(clave, valor)
+        return lineas
+
+    def _lineas(self, clave, valor):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *etiquetas, valor=1):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._funcion = funcion   # se evalúa al exponer: {(valores de etiquetas): valor}
+
+    def inc(self, *etiquetas, valor=1):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def dec(self, *etiquetas, valor=1):
+        self.inc(*etiquetas, valor=-valor)
+
+    def exponer(self):
+        if self._funcion is not None:
+            try:
+                valores = self._funcion()
+            except Exception:
+                valores = {}
+            with self._lock:
+                self._series = {self._clave(k): v for k, v in valores.items() if v is not None}
+        return super().exponer()
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, *etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][bisect_left(self.buckets, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def _lineas(self, clave, serie):
+        cubetas, suma, cantidad = serie
+        lineas, acumulado = [], 0
+        for limite, n in zip(self.buckets + (float("inf"),), cubetas):
+            acumulado += n
+            le = f'le="{_numero(limite)}"'
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+        lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {cantidad}")
+        return lineas
+
+
+class Registro:
+
+    def __init__(self):
+        self._metricas = []
+
+    def agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self) -> str:
+        lineas = []
+        for m in self._metricas:
+            lineas += m.exponer()
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+# -----------------------------
+# HTTP
+# -----------------------------
+REQUESTS = registro.agregar(Contador(
+    "http_requests_total", "Requests HTTP atendidos", ("metodo", "ruta", "estado")))
+LATENCIA = registro.agregar(Histograma(
+    "http_request_duration_seconds", "Latencia de los requests HTTP", ("metodo", "ruta", "estado")))
+EN_CURSO = registro.agregar(Medidor(
+    "http_requests_en_curso", "Requests HTTP en curso", ("metodo",)))
+BYTES_RESPUESTA = registro.agregar(Histograma(
+    "http_response_bytes", "Tamaño del cuerpo de las respuestas", ("metodo", "ruta"), BUCKETS_BYTES))
+
+# -----------------------------
+# SQL por request
+# -----------------------------
+SQL_SENTENCIAS = registro.agregar(Histograma(
+    "http_sql_sentencias", "Sentencias SQL emitidas por request", ("metodo", "ruta"), BUCKETS_SENTENCIAS))
+SQL_SEGUNDOS = registro.agregar(Histograma(
+    "http_sql_duration_seconds", "Tiempo total en SQL por request", ("metodo", "ruta")))
+SQL_FUERA_DE_REQUEST = registro.agregar(Contador(
+    "sql_sentencias_fuera_de_request_total", "Sentencias SQL de trabajos en segundo plano (scheduler, precargas)"))
+
+# -----------------------------
+# Trabajos en segundo plano (transiciones de estado)
+# -----------------------------
+TRANSICIONES = registro.agregar(Contador(
+    "trabajo_transiciones_total", "Cirugías que cambiaron de estado automáticamente", ("origen", "estado")))
+TRABAJO_DURACION = registro.agregar(Histograma(
+    "trabajo_duration_seconds", "Duración de cada ejecución de un trabajo", ("trabajo",)))
+TRABAJO_ERRORES = registro.agregar(Contador(
+    "trabajo_errores_total", "Ejecuciones de trabajos que terminaron con error", ("trabajo",)))
+SCHEDULER_ATRASO = registro.agregar(Histograma(
+    "scheduler_atraso_seconds", "Demora entre el vencimiento y el disparo de una transición"))
+
+
+@contextmanager
+def medir_trabajo(trabajo: str):
+    """Registra duración y errores de una ejecución de `trabajo` (la excepción se propaga)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        TRABAJO_ERRORES.inc(trabajo)
+        raise
+    finally:
+        TRABAJO_DURACION.observar(time.perf_counter() - inicio, trabajo)
+
+
+def _pendientes_scheduler():
+    from app.core.scheduler import scheduler
+    return {(): scheduler.pendientes}
+
+
+def _conexiones_en_uso():
+    from app.db.monitor_pool import monitor_sync, monitor_async
+    return {(m.nombre,): m.en_uso() for m in (monitor_sync, monitor_async) if m.engine is not None}
+
+
+registro.agregar(Medidor(
+    "scheduler_transiciones_pendientes", "Transiciones armadas en el scheduler", funcion=_pendientes_scheduler))
+registro.agregar(Medidor(
+    "db_pool_conexiones_en_uso", "Conexiones del pool prestadas ahora", ("engine",), funcion=_conexiones_en_uso))
+
+
+# ======================================================
+# SQL: contextvar con el acumulado del request en curso
+# ======================================================
+class _SQLRequest:
+    __slots__ = ("sentencias", "segundos")
+
+    def __init__(self):
+        self.sentencias = 0
+        self.segundos = 0.0
+
+
+_sql_request = contextvars.ContextVar("sql_request", default=None)
+
+
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("metricas_inicio")
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    acumulado = _sql_request.get()
+    if acumulado is None:
+        SQL_FUERA_DE_REQUEST.inc()
+        return
+    acumulado.sentencias += 1
+    acumulado.segundos += duracion
+
+
+def _error_de_sentencia(contexto):
+    conn = contexto.connection
+    if conn is not None and conn.info.get("metricas_inicio"):
+        conn.info["metricas_inicio"].pop()
+
+
+def instrumentar_engine(engine):
+    """Cuenta sentencias y tiempo SQL de `engine` (sync, o el sync_engine de uno async)."""
+    event.listen(engine, "before_cursor_execute", _antes_de_sentencia)
+    event.listen(engine, "after_cursor_execute", _despues_de_sentencia)
+    event.listen(engine, "handle_error", _error_de_sentencia)
+
+
+# ======================================================
+# MIDDLEWARE HTTP (ASGI puro: no bufferiza el streaming SSE)
+# ======================================================
+class MiddlewareMetricas:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metodo = scope["method"]
+        estado = 500
+        enviados = 0
+        acumulado = _SQLRequest()
+        token = _sql_request.set(acumulado)
+
+        async def enviar(mensaje):
+            nonlocal estado, enviados
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                enviados += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        EN_CURSO.inc(metodo)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            EN_CURSO.dec(metodo)
+            _sql_request.reset(token)
+
+            # FastAPI deja la ruta que atendió el request en el scope: se usa
+            # su plantilla para no crear una serie por cada id
+            ruta = getattr(scope.get("route"), "path", None) or "<sin_ruta>"
+            REQUESTS.inc(metodo, ruta, estado)
+            LATENCIA.observar(duracion, metodo, ruta, estado)
+            BYTES_RESPUESTA.observar(enviados, metodo, ruta)
+            SQL_SENTENCIAS.observar(acumulado.sentencias, metodo, ruta)
+            SQL_SEGUNDOS.observar(acumulado.segundos, metodo, ruta)
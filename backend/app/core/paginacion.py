@@ -0,0 +1,105 @@
+# app/core/paginacion.py
+
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+# ======================================================
+# PAGINACIÓN POR CURSOR (KEYSET), FILTROS Y PROYECCIÓN
+# ======================================================
+# En vez de OFFSET (que recorre y descarta filas) se continúa desde la
+# última clave vista: WHERE (orden) > (cursor) ORDER BY orden LIMIT n.
+# El costo de cada página no depende de cuántas hay antes.
+#
+# - `limite` es opcional: sin él, la lista sale completa como siempre.
+# - El cursor de la página siguiente va en el header X-Siguiente-Cursor
+#   (el cuerpo sigue siendo la lista de siempre). Sin header = última página.
+# - `fields=a,b` consulta solo esas columnas (el id siempre va).
+
+LIMITE_MAXIMO = 1000
+HEADER_CURSOR = "X-Siguiente-Cursor"
+
+
+def codificar_cursor(valores) -> str:
+    crudo = json.dumps([v.isoformat() if isinstance(v, (date, time)) else v for v in valores])
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, orden):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(valores) != len(orden):
+            raise ValueError
+        convertidos = []
+        for v, col in zip(valores, orden):
+            tipo = col.type.python_type
+            if tipo in (datetime, date, time) and v is not None:
+                v = tipo.fromisoformat(v)
+            convertidos.append(v)
+        return convertidos
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def prefijo(columna, texto: str):
+    """`columna LIKE 'texto%'` escapando los comodines del usuario."""
+    escapado = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return columna.like(f"{escapado}%", escape="\\")
+
+
+def campos_solicitados(fields: Optional[str], modelo, esquema):
+    """Lista de campos a proyectar (id incluido) o None si no se pidió `fields`."""
+    if not fields:
+        return None
+    columnas = modelo.__table__.columns
+    permitidos = [f for f in esquema.model_fields if f in columnas]
+    pedidos = [f.strip() for f in fields.split(",") if f.strip()]
+    desconocidos = [f for f in pedidos if f not in permitidos]
+    if desconocidos:
+        raise HTTPException(400, f"Campos no disponibles: {', '.join(desconocidos)} (permitidos: {', '.join(permitidos)})")
+    return list(dict.fromkeys(["id"] + pedidos))
+
+
+def consulta(db: Session, modelo, campos, orden):
+    """Query del modelo completo, o solo de los campos pedidos + las columnas de orden."""
+    if campos is None:
+        return db.query(modelo)
+    columnas = [getattr(modelo, c) for c in campos]
+    columnas += [c for c in orden if c.key not in campos]
+    return db.query(*columnas)
+
+
+def paginar(query, orden, cursor: Optional[str], limite: Optional[int], response: Response):
+    """
+    Aplica el orden (la última columna debe ser única, p.ej. el id) y, si
+    hay `limite`, el corte keyset. Trae limite+1 filas para saber si sigue.
+    """
+    query = query.order_by(*orden)
+    if cursor:
+        valores = decodificar_cursor(cursor, orden)
+        if len(orden) == 1:
+            query = query.filter(orden[0] > valores[0])
+        else:
+            query = query.filter(tuple_(*orden) > tuple_(*valores))
+    if limite is None:
+        return query.all()
+
+    filas = query.limit(limite + 1).all()
+    if len(filas) > limite:
+        filas = filas[:limite]
+        response.headers[HEADER_CURSOR] = codificar_cursor([getattr(filas[-1], c.key) for c in orden])
+    return filas
+
+
+def proyectar(filas, campos, response: Response) -> JSONResponse:
+    """Respuesta con solo los campos pedidos (conserva ETag y cursor)."""
+    cuerpo = jsonable_encoder([{c: getattr(f, c) for c in campos} for f in filas])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return JSONResponse(cuerpo, headers=headers)
@@ -0,0 +1,172 @@
+# app/core/planificador.py
+
+from bisect import insort
+from datetime import datetime, date, time, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core import agenda
+from app.core.agenda import TIEMPO_ASEO, ESTADOS_LIBRES
+
+# ======================================================
+# PLANIFICADOR DEL DÍA
+# ======================================================
+# Asigna un lote de casos pendientes a pabellones y horas sin choques.
+# Heurística greedy de bin-packing:
+#   1. Ordena los casos del más restringido al menos restringido
+#      (complejos primero, luego por hora límite y los más largos antes).
+#   2. A cada caso le da el inicio factible más temprano entre los pabellones
+#      aptos, respetando la ventana del caso, la jornada, el aseo del pabellón
+#      y la agenda del doctor.
+#   3. Empates: pabellón más cargado (concentra la ocupación) y no complejo.
+
+
+def _conflicto_doctor(ocupado, inicio: datetime, fin: datetime):
+    """Fin del primer intervalo del doctor que choca con [inicio, fin), o None."""
+    for o_ini, o_fin in ocupado:
+        if o_ini >= fin:
+            return None
+        if o_fin > inicio:
+            return o_fin
+    return None
+
+
+def _primer_inicio(huecos_pabellon, ocupado_doctor, duracion: int):
+    """Inicio más temprano dentro de los huecos del pabellón con el doctor libre."""
+    cirugia = timedelta(minutes=duracion)
+    total = timedelta(minutes=duracion + TIEMPO_ASEO)
+    for hueco_ini, hueco_fin in huecos_pabellon:
+        inicio = hueco_ini
+        while inicio + total <= hueco_fin:
+            choque = _conflicto_doctor(ocupado_doctor, inicio, inicio + cirugia)
+            if choque is None:
+                return inicio
+            inicio = agenda.redondear(choque)
+    return None
+
+
+def cargar_agenda_doctores(db: Session, doctor_ids, fecha: date):
+    """{doctor_id: [(inicio, fin)]} del día, sin aseo (el doctor no limpia)."""
+    ocupacion = {d: [] for d in doctor_ids}
+    if not ocupacion:
+        return ocupacion
+    filas = db.query(
+        models.Cirugia.doctor_id, models.Cirugia.inicio_ts, models.Cirugia.fin_estimado_ts
+    ).filter(
+        models.Cirugia.doctor_id.in_(list(ocupacion)),
+        models.Cirugia.fecha == fecha,
+        models.Cirugia.estado.notin_(ESTADOS_LIBRES)
+    ).all()
+    for f in filas:
+        ocupacion[f.doctor_id].append((f.inicio_ts, f.fin_estimado_ts))
+    for intervalos in ocupacion.values():
+        intervalos.sort()
+    return ocupacion
+
+
+def choques_doctores(db: Session, fecha: date, casos, asignaciones):
+    """
+    Índices de las asignaciones cuyo doctor ya tiene otra cirugía encima,
+    según la agenda vigente (se usa al confirmar un plan ya calculado).
+    """
+    doctores = cargar_agenda_doctores(db, {casos[a["indice"]].doctor_id for a in asignaciones
+                                           if casos[a["indice"]].doctor_id}, fecha)
+    choques = []
+    for a in asignaciones:
+        ocupado = doctores.get(casos[a["indice"]].doctor_id)
+        if not ocupado:
+            continue
+        inicio = datetime.combine(a["fecha"], a["hora_inicio"])
+        if _conflicto_doctor(ocupado, inicio, inicio + timedelta(minutes=a["duracion_programada"])) is not None:
+            choques.append(a["indice"])
+    return choques
+
+
+def planificar(db: Session, fecha: date, casos, pabellones, tipos, jornada_inicio: time, jornada_fin: time):
+    """
+    Devuelve (asignaciones, sin_asignar, estadisticas). `casos` necesita
+    tipo_cirugia_id, doctor_id, paciente_id, compleja, duracion_programada,
+    desde y hasta (horas opcionales).
+    """
+    apertura = datetime.combine(fecha, jornada_inicio)
+    cierre = datetime.combine(fecha, jornada_fin)
+
+    ocupacion = agenda.cargar_ocupacion(db, [p.id for p in pabellones], apertura, cierre)
+    doctores = cargar_agenda_doctores(db, {c.doctor_id for c in casos if c.doctor_id}, fecha)
+    asignado_min = {p.id: 0 for p in pabellones}
+
+    def duracion_de(caso):
+        tipo = tipos.get(caso.tipo_cirugia_id)
+        return caso.duracion_programada or (tipo.duracion_estimada if tipo else None)
+
+    orden = sorted(
+        range(len(casos)),
+        key=lambda i: (not casos[i].compleja, casos[i].hasta or time.max, -(duracion_de(casos[i]) or 0))
+    )
+
+    asignaciones, sin_asignar = [], []
+    for i in orden:
+        caso = casos[i]
+        duracion = duracion_de(caso)
+        if duracion is None:
+            sin_asignar.append({"indice": i, "motivo": "Tipo de cirugía no encontrado"}); continue
+
+        desde = max(apertura, datetime.combine(fecha, caso.desde)) if caso.desde else apertura
+        hasta = min(cierre, datetime.combine(fecha, caso.hasta)) if caso.hasta else cierre
+        # La cirugía debe terminar antes de `hasta`; el aseo puede quedar después
+        limite = hasta + timedelta(minutes=TIEMPO_ASEO)
+        ocupado_doctor = doctores.get(caso.doctor_id, [])
+
+        mejor = None
+        for p in agenda.pabellones_aptos(pabellones, caso.compleja):
+            libres = agenda.huecos(ocupacion.get(p.id, []), desde, limite, duracion + TIEMPO_ASEO)
+            inicio = _primer_inicio(libres, ocupado_doctor, duracion)
+            if inicio is None:
+                continue
+            clave = (inicio, -asignado_min[p.id], bool(p.es_compleja), p.id)
+            if mejor is None or clave < mejor[0]:
+                mejor = (clave, inicio, p)
+
+        if mejor is None:
+            sin_asignar.append({"indice": i, "motivo": "Sin hueco compatible (pabellón, ventana o doctor)"}); continue
+
+        _, inicio, p = mejor
+        fin = inicio + timedelta(minutes=duracion + TIEMPO_ASEO)
+        agenda.reservar(ocupacion, p.id, inicio, fin)
+        if caso.doctor_id:
+            insort(doctores.setdefault(caso.doctor_id, []), (inicio, inicio + timedelta(minutes=duracion)))
+        asignado_min[p.id] += duracion + TIEMPO_ASEO
+
+        asignaciones.append({
+            "indice": i, "pabellon_id": p.id, "pabellon_nombre": p.nombre,
+            "fecha": fecha, "hora_inicio": inicio.time(), "duracion_programada": duracion,
+            "fin_ocupacion": fin,
+        })
+
+    asignaciones.sort(key=lambda a: a["indice"])
+    sin_asignar.sort(key=lambda s: s["indice"])
+    return asignaciones, sin_asignar, estadisticas(ocupacion, pabellones, asignado_min, apertura, cierre, len(casos))
+
+
+def estadisticas(ocupacion, pabellones, asignado_min, apertura: datetime, cierre: datetime, total_casos: int):
+    jornada = (cierre - apertura).total_seconds() / 60
+    por_pabellon = []
+    ocupado_total = 0
+    for p in pabellones:
+        # Minutos ocupados dentro de la jornada (existentes + planificados)
+        ocupado = sum(
+            max(0, (min(fin, cierre) - max(ini, apertura)).total_seconds() / 60)
+            for ini, fin in ocupacion.get(p.id, [])
+        )
+        ocupado_total += ocupado
+        por_pabellon.append({
+            "pabellon_id": p.id, "minutos_planificados": asignado_min[p.id],
+            "minutos_ocupados": int(ocupado), "utilizacion": round(ocupado / jornada, 3) if jornada else 0.0,
+        })
+
+    return {
+        "casos": total_casos,
+        "utilizacion_global": round(ocupado_total / (jornada * len(pabellones)), 3) if jornada and pabellones else 0.0,
+        "pabellones": por_pabellon,
+    }
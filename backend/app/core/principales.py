@@ -0,0 +1,104 @@
+# app/core/principales.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+# ======================================================
+# CACHÉ DEL USUARIO AUTENTICADO (principal)
+# ======================================================
+# get_current_user resolvía el usuario con un SELECT en cada request
+# (incluido el polling). Aquí se guarda lo necesario para autorizar
+# (id, rol, es_activo...) por username (el "sub" del token), con TTL y
+# tamaño máximo (LRU).
+#
+# Los endpoints que modifican un usuario lo invalidan después del commit,
+# así una desactivación (455) rige de inmediato. El TTL acota lo que
+# podría quedar desfasado si la BD se cambia por fuera de la API.
+
+TTL_SEGUNDOS = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+MAXIMO = int(os.getenv("PRINCIPAL_CACHE_MAX", "1024"))
+
+
+class Principal(NamedTuple):
+    id: int
+    username: str
+    nombre_completo: Optional[str]
+    rol: Optional[str]
+    es_activo: Optional[bool]
+
+
+class CachePrincipales:
+
+    def __init__(self, ttl: float = TTL_SEGUNDOS, maximo: int = MAXIMO):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._entradas = OrderedDict()   # username -> (vence, Principal)
+        self._lock = threading.Lock()
+        # Cada invalidación sube la generación: una lectura de BD que empezó
+        # antes no puede guardar un principal ya obsoleto
+        self._generacion = 0
+        self._oyentes = []   # funciones(username, usuario_id) avisadas al invalidar
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, username: str):
+        """(principal | None, generación) — la generación se pasa a guardar()."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(username)
+            if entrada and entrada[0] > ahora:
+                self._entradas.move_to_end(username)
+                self.aciertos += 1
+                return entrada[1], self._generacion
+            if entrada:
+                del self._entradas[username]
+            self.fallos += 1
+            return None, self._generacion
+
+    def guardar(self, principal: Principal, generacion: int):
+        with self._lock:
+            if generacion != self._generacion:
+                return
+            self._entradas[principal.username] = (time.monotonic() + self.ttl, principal)
+            self._entradas.move_to_end(principal.username)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, username: Optional[str] = None, usuario_id: Optional[int] = None):
+        """Quita al usuario (por username o id) de la caché."""
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += 1
+            if username is not None:
+                self._entradas.pop(username, None)
+            if usuario_id is not None:
+                for nombre, (_, p) in list(self._entradas.items()):
+                    if p.id == usuario_id:
+                        del self._entradas[nombre]
+        for oyente in self._oyentes:
+            oyente(username, usuario_id)
+
+    def al_invalidar(self, oyente):
+        """Registra `oyente(username, usuario_id)`; p.ej. el hub cierra los sockets del usuario."""
+        self._oyentes.append(oyente)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas), "maximo": self.maximo, "ttl_segundos": self.ttl,
+                "aciertos": self.aciertos, "fallos": self.fallos, "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            }
+
+
+principales = CachePrincipales()
@@ -0,0 +1,99 @@
+# app/core/resumen.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# ======================================================
+# SNAPSHOT DEL RESUMEN DEL DASHBOARD
+# ======================================================
+# Todas las pantallas consultan /dashboard/resumen cada 30 s, pero los KPIs
+# solo cambian cuando cambia la agenda. Se guarda el JSON ya serializado
+# y se invalida en after_commit de cualquier sesión marcada por
+# models.marcar_agenda_modificada (escrituras de cirugías, transiciones
+# del scheduler, bulk, y cambios de pacientes/pabellones/tipos).
+#
+# El TTL acota lo desfasado si la BD se modifica por fuera de este proceso.
+# El snapshot es del día: a medianoche deja de servir solo.
+
+TTL_SEGUNDOS = float(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+
+
+class SnapshotResumen:
+
+    def __init__(self, ttl: float = TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calculo = asyncio.Lock()   # un solo recálculo a la vez
+        self._entrada = None             # (fecha, vence, cuerpo JSON)
+        # Una invalidación durante un recálculo impide guardar el resultado
+        self._generacion = 0
+        self.aciertos = 0
+        self.calculos = 0
+        self.invalidaciones = 0
+
+    def _vigente(self):
+        entrada = self._entrada
+        if entrada and entrada[0] == date.today() and entrada[1] > time.monotonic():
+            return entrada[2]
+        return None
+
+    async def obtener(self, calcular):
+        """Cuerpo JSON del resumen; `calcular()` (async) se llama solo si no hay snapshot vigente."""
+        cuerpo = self._vigente()
+        if cuerpo is not None:
+            self.aciertos += 1
+            return cuerpo
+
+        async with self._calculo:
+            # Otro request pudo recalcular mientras esperábamos
+            cuerpo = self._vigente()
+            if cuerpo is not None:
+                self.aciertos += 1
+                return cuerpo
+
+            generacion = self._generacion
+            datos = await calcular()
+            cuerpo = json.dumps(datos, separators=(",", ":"), default=str).encode()
+            self.calculos += 1
+            with self._lock:
+                if generacion == self._generacion:
+                    self._entrada = (date.today(), time.monotonic() + self.ttl, cuerpo)
+            return cuerpo
+
+    def invalidar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entrada = None
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        entrada = self._entrada
+        return {
+            "vigente": self._vigente() is not None,
+            "bytes": len(entrada[2]) if entrada else 0,
+            "ttl_segundos": self.ttl,
+            "aciertos": self.aciertos,
+            "calculos": self.calculos,
+            "invalidaciones": self.invalidaciones,
+        }
+
+
+resumen = SnapshotResumen()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_al_confirmar(session):
+    if session.info.pop("agenda_modificada", False):
+        resumen.invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marca(session):
+    session.info.pop("agenda_modificada", None)
@@ -0,0 +1,44 @@
+# app/core/rut.py
+
+import re
+from typing import Optional
+
+# ======================================================
+# RUT CHILENO
+# ======================================================
+# Forma canónica: cuerpo sin puntos ni ceros a la izquierda, guion y dígito
+# verificador en mayúscula ("12.345.678-k" → "12345678-K"). Es la que se
+# guarda en Paciente.rut_normalizado (índice único) para deduplicar.
+
+_NO_RUT = re.compile(r"[^0-9kK]")
+
+
+def digito_verificador(cuerpo: str) -> str:
+    """Dígito verificador por módulo 11."""
+    suma = sum(int(d) * (2 + i % 6) for i, d in enumerate(reversed(cuerpo)))
+    resto = 11 - suma % 11
+    return {11: "0", 10: "K"}.get(resto, str(resto))
+
+
+def limpiar_rut(rut: Optional[str]) -> Optional[str]:
+    """Forma canónica SIN validar el dígito (sirve para datos antiguos)."""
+    if not rut:
+        return None
+    limpio = _NO_RUT.sub("", rut).upper()
+    cuerpo, dv = limpio[:-1].lstrip("0"), limpio[-1:]
+    if not cuerpo.isdigit() or not dv:
+        return None
+    return f"{cuerpo}-{dv}"
+
+
+def normalizar_rut(rut: Optional[str]) -> Optional[str]:
+    """Forma canónica; lanza ValueError si el formato o el dígito no calzan."""
+    if rut is None or not rut.strip():
+        return None
+    canonico = limpiar_rut(rut)
+    if canonico is None or len(canonico) > 10:
+        raise ValueError(f"RUT con formato inválido: {rut}")
+    cuerpo, dv = canonico.split("-")
+    if digito_verificador(cuerpo) != dv:
+        raise ValueError(f"RUT con dígito verificador inválido: {rut}")
+    return canonico
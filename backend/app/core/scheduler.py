@@ -0,0 +1,224 @@
+# app/core/scheduler.py
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.db.database import SessionLocal
+from app.db import models
+from app.db.models import EstadoCirugia
+from app.core.eventos import hub
+from app.core import metricas
+
+# ======================================================
+# SCHEDULER DE TRANSICIONES AUTOMÁTICAS
+# ======================================================
+# Mantiene un min-heap con el próximo vencimiento de cada cirugía abierta:
+#   PROGRAMADA → EN_CURSO   (al llegar la hora de inicio)
+#   EN_CURSO   → COMPLICADA (al pasar inicio + duración + extra)
+# Un hilo duerme hasta el vencimiento más próximo y dispara esa transición
+# una sola vez. Los endpoints que cambian horarios llaman a `rearmar`.
+
+SCHEDULER_ACTIVO = os.getenv("SCHEDULER_ESTADOS", "1") != "0"
+# Si un disparo falla (BD caída, lock timeout) la transición se reintenta
+# con backoff exponencial: 1 s, 2 s, 4 s... hasta este tope, sin rendirse
+REINTENTO_MAX_S = float(os.getenv("SCHEDULER_REINTENTO_MAX_S", "60"))
+
+log = logging.getLogger(__name__)
+
+TRANSICIONES = {
+    EstadoCirugia.PROGRAMADA: EstadoCirugia.EN_CURSO,
+    EstadoCirugia.EN_CURSO: EstadoCirugia.COMPLICADA,
+}
+
+
+def calcular_vencimiento(estado, inicio_ts: datetime, fin_estimado_ts: datetime):
+    """Devuelve el instante en que la cirugía debe cambiar de estado (o None si no aplica)."""
+    if estado == EstadoCirugia.PROGRAMADA:
+        return inicio_ts
+    if estado == EstadoCirugia.EN_CURSO:
+        return fin_estimado_ts
+    return None
+
+
+class SchedulerEstados:
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._heap = []            # (vence, seq, cirugia_id, estado_origen)
+        self._armados = {}         # cirugia_id -> (vence, estado_origen) vigente
+        self._fallos = {}          # cirugia_id -> disparos fallidos seguidos
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._hilo = None
+        self._detener = False
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    @property
+    def pendientes(self) -> int:
+        return len(self._armados)
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+    def iniciar(self):
+        if self.activo:
+            return
+        self._detener = False
+        self._cargar_pendientes()
+        self._hilo = threading.Thread(target=self._bucle, name="scheduler-estados", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        with self._cond:
+            self._detener = True
+            self._cond.notify_all()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+        self._hilo = None
+
+    def _cargar_pendientes(self):
+        db = self._session_factory()
+        try:
+            abiertas = db.query(
+                models.Cirugia.id, models.Cirugia.estado, models.Cirugia.inicio_ts, models.Cirugia.fin_estimado_ts
+            ).filter(models.Cirugia.estado.in_(list(TRANSICIONES))).all()
+        finally:
+            db.close()
+
+        with self._cond:
+            self._heap.clear()
+            self._armados.clear()
+            for fila in abiertas:
+                self._armar(fila.id, fila.estado, fila.inicio_ts, fila.fin_estimado_ts)
+            self._cond.notify_all()
+
+    # -----------------------------
+    # API para los endpoints
+    # -----------------------------
+    def rearmar(self, cirugia):
+        """Recalcula el vencimiento de una cirugía tras crearla o modificarla."""
+        if cirugia is None:
+            return
+        with self._cond:
+            self._armar(cirugia.id, cirugia.estado, cirugia.inicio_ts, cirugia.fin_estimado_ts)
+            self._cond.notify_all()
+
+    def recargar(self):
+        """Rearma todo desde la BD (tras escrituras masivas que no pasan por rearmar)."""
+        if self.activo:
+            self._cargar_pendientes()
+
+    def desarmar(self, cirugia_id: int):
+        # La entrada del heap queda huérfana y se descarta al llegar a la cima
+        with self._cond:
+            self._armados.pop(cirugia_id, None)
+            self._fallos.pop(cirugia_id, None)
+
+    def _armar(self, cirugia_id, estado, inicio_ts, fin_estimado_ts):
+        estado = EstadoCirugia(estado) if isinstance(estado, str) else estado
+        vence = calcular_vencimiento(estado, inicio_ts, fin_estimado_ts)
+        if vence is None:
+            self._armados.pop(cirugia_id, None)
+            return
+        self._armados[cirugia_id] = (vence, estado)
+        heapq.heappush(self._heap, (vence, next(self._seq), cirugia_id, estado))
+
+    # -----------------------------
+    # Hilo de disparo
+    # -----------------------------
+    def _bucle(self):
+        while True:
+            with self._cond:
+                if self._detener:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                vence, _, cirugia_id, origen = self._heap[0]
+                if self._armados.get(cirugia_id) != (vence, origen):
+                    heapq.heappop(self._heap)   # entrada obsoleta
+                    continue
+
+                espera = (vence - datetime.now()).total_seconds()
+                if espera > 0:
+                    self._cond.wait(timeout=espera)
+                    continue
+
+                heapq.heappop(self._heap)
+                del self._armados[cirugia_id]
+
+            metricas.SCHEDULER_ATRASO.observar(-espera)
+            try:
+                with metricas.medir_trabajo("scheduler"):
+                    self._disparar(cirugia_id, origen)
+            except Exception:
+                self._reintentar(cirugia_id, origen)
+            else:
+                self._fallos.pop(cirugia_id, None)
+
+    def _reintentar(self, cirugia_id: int, origen: EstadoCirugia):
+        fallos = self._fallos.get(cirugia_id, 0) + 1
+        self._fallos[cirugia_id] = fallos
+        demora = min(REINTENTO_MAX_S, 2 ** (fallos - 1))
+        log.exception("Scheduler: falló la transición de la cirugía %s (intento %s), reintento en %ss",
+                      cirugia_id, fallos, demora)
+        with self._cond:
+            # Si un endpoint la rearmó mientras tanto, manda lo vigente
+            if cirugia_id in self._armados:
+                return
+            vence = datetime.now() + timedelta(seconds=demora)
+            self._armados[cirugia_id] = (vence, origen)
+            heapq.heappush(self._heap, (vence, next(self._seq), cirugia_id, origen))
+            self._cond.notify_all()
+
+    def _disparar(self, cirugia_id: int, origen: EstadoCirugia):
+        # UPDATE condicional sobre los timestamps: si otro proceso cambió el
+        # horario o el estado, no afecta filas y la fila se rearma con lo vigente.
+        columna_ts = models.Cirugia.inicio_ts if origen == EstadoCirugia.PROGRAMADA else models.Cirugia.fin_estimado_ts
+        ahora = datetime.now()
+
+        db = self._session_factory()
+        try:
+            seq = models.cambio_pendiente(db)
+            fila = db.execute(
+                update(models.Cirugia)
+                .where(models.Cirugia.id == cirugia_id, models.Cirugia.estado == origen, columna_ts <= ahora)
+                .values(estado=TRANSICIONES[origen], cambio_seq=seq, actualizado_en=ahora)
+                .returning(
+                    models.Cirugia.id, models.Cirugia.estado, models.Cirugia.inicio_ts,
+                    models.Cirugia.fin_estimado_ts, models.Cirugia.pabellon_id
+                )
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.commit()
+
+            if fila is not None:
+                metricas.TRANSICIONES.inc("scheduler", fila.estado.value)
+                hub.publicar("estado", id=fila.id, pabellon_id=fila.pabellon_id, estado=fila.estado.value)
+
+            if fila is None:
+                fila = db.query(
+                    models.Cirugia.id, models.Cirugia.estado, models.Cirugia.inicio_ts, models.Cirugia.fin_estimado_ts
+                ).filter(models.Cirugia.id == cirugia_id).first()
+            elif origen == EstadoCirugia.PROGRAMADA:
+                log.debug("Cirugía %s activada (inicio %s, ahora %s)", cirugia_id, fila.inicio_ts, ahora)
+        finally:
+            db.close()
+
+        if fila is not None:
+            with self._cond:
+                self._armar(fila.id, fila.estado, fila.inicio_ts, fila.fin_estimado_ts)
+                self._cond.notify_all()
+
+
+scheduler = SchedulerEstados()
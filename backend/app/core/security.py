@@ -12,8 +12,10 @@ from fastapi.security import OAuth2PasswordBearer
 
 from sqlalchemy.orm import Session   # ← IMPORT NECESARIO
 
-from app.db.database import get_db
+from app.db.database import abrir_sesion, en_sesion
 from app.db import models
+from app.core.principales import Principal, principales
+from app.core.hashing import pool_hashing
 
 # ======================================================
 # CONFIGURACIÓN
@@ -27,19 +29,40 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 720
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Costo de bcrypt. Con BCRYPT_REHASH=1, al hacer login se re-hashea la
+# contraseña de quien tenga un hash con otro costo (se guarda el nuevo).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_REHASH = os.getenv("BCRYPT_REHASH", "0") == "1"
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # ======================================================
 # FUNCIONES DE CONTRASEÑAS
 # ======================================================
 
+# Todo bcrypt corre en el pool dedicado (ver core/hashing.py): 503 si está saturado
+
 def verify_password(plain_password, hashed_password):
     """Verifica si la contraseña ingresada coincide con la encriptada."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pool_hashing.ejecutar_bloqueante(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password):
     """Encripta una contraseña plana."""
-    return pwd_context.hash(password)
+    return pool_hashing.ejecutar_bloqueante(pwd_context.hash, password)
+
+def _verificar_y_actualizar(plain_password, hashed_password):
+    if BCRYPT_REHASH:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    return pwd_context.verify(plain_password, hashed_password), None
+
+async def verificar_password_async(plain_password, hashed_password):
+    """
+    Versión para endpoints async (login). Devuelve (valida, nuevo_hash);
+    nuevo_hash solo viene si BCRYPT_REHASH está activo y el costo cambió.
+    """
+    if not hashed_password:
+        return False, None
+    return await pool_hashing.ejecutar(_verificar_y_actualizar, plain_password, hashed_password)
 
 # ======================================================
 # JWT
@@ -62,20 +85,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 # VALIDACIÓN DEL TOKEN
 # ======================================================
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    """
-    Valida el token JWT, verifica existencia del usuario y su estado.
-    Devuelve códigos compatibles con el frontend:
-      - 401 → Token inválido o expirado
-      - 455 → Usuario inactivo
-    """
-
-    # -----------------------------
-    # 1. Validación del token JWT
-    # -----------------------------
+def decodificar_token(token: str) -> str:
+    """Valida la firma/expiración del JWT y devuelve el username (sub). 401 si no es válido."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -94,20 +105,54 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
+    return username
+
+def buscar_principal(db: Session, username: str):
+    return db.query(
+        models.Usuario.id, models.Usuario.username, models.Usuario.nombre_completo,
+        models.Usuario.rol, models.Usuario.es_activo
+    ).filter(models.Usuario.username == username).first()
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Dependencia de los endpoints protegidos (ver resolver_principal)."""
+    return await resolver_principal(token)
+
+async def resolver_principal(token: str):
+    """
+    Valida el token JWT, verifica existencia del usuario y su estado.
+    También la usan el WebSocket y el SSE del tablero (token por query).
+    Devuelve un Principal (id, username, nombre_completo, rol, es_activo),
+    no el objeto ORM: si se necesita modificar al usuario, cargarlo desde db.
+    Es async: con la caché caliente no abre sesión ni ocupa el threadpool.
+    Códigos compatibles con el frontend:
+      - 401 → Token inválido o expirado
+      - 455 → Usuario inactivo
+    """
+
     # -----------------------------
-    # 2. Verificar usuario en BD
+    # 1. Validación del token JWT
     # -----------------------------
-    usuario = db.query(models.Usuario).filter(
-        models.Usuario.username == username
-    ).first()
+    username = decodificar_token(token)
+
+    # -----------------------------
+    # 2. Verificar usuario (caché → BD)
+    # -----------------------------
+    usuario, generacion = principales.obtener(username)
 
     if usuario is None:
-        # Si el token era correcto pero el usuario ya no existe
-        raise HTTPException(
-            status_code=401,
-            detail="Usuario no encontrado (token inválido)",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
+        async with abrir_sesion() as db:
+            fila = await en_sesion(db, buscar_principal, username)
+
+        if fila is None:
+            # Si el token era correcto pero el usuario ya no existe
+            raise HTTPException(
+                status_code=401,
+                detail="Usuario no encontrado (token inválido)",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+
+        usuario = Principal(*fila)
+        principales.guardar(usuario, generacion)
 
     # -----------------------------
     # 3. Usuario inactivo → 455
@@ -0,0 +1,15 @@
+# app/core/texto.py
+
+import re
+import unicodedata
+from typing import Optional
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def plegar(texto: Optional[str]) -> Optional[str]:
+    """Minúsculas, sin tildes ni signos y con un solo espacio: "Pérez-Ñuñez" → "perez nunez"."""
+    if texto is None:
+        return None
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.lower()).strip()
@@ -0,0 +1,57 @@
+# app/core/versiones.py
+
+import threading
+import uuid
+
+from fastapi import HTTPException, Request, Response
+
+# ======================================================
+# VERSIONES POR RECURSO (ETag / If-None-Match)
+# ======================================================
+# Cada recurso tiene un contador en memoria que los endpoints de escritura
+# incrementan después del commit. El ETag combina el contador con una
+# "época" aleatoria del proceso, así un reinicio nunca responde 304 a un
+# ETag emitido antes. Supone un solo proceso de API (como en run.py).
+
+EPOCA = uuid.uuid4().hex[:8]
+
+
+class VersionesRecursos:
+
+    def __init__(self):
+        self._versiones = {}
+        self._lock = threading.Lock()
+
+    def actual(self, recurso: str) -> int:
+        return self._versiones.get(recurso, 0)
+
+    def incrementar(self, recurso: str) -> int:
+        with self._lock:
+            self._versiones[recurso] = self._versiones.get(recurso, 0) + 1
+            return self._versiones[recurso]
+
+    def etag(self, recurso: str) -> str:
+        return f'"{recurso}-{EPOCA}-{self.actual(recurso)}"'
+
+
+versiones = VersionesRecursos()
+
+
+def etag_condicional(recurso: str):
+    """
+    Dependencia para GETs de listas: si el If-None-Match del cliente coincide
+    con la versión actual responde 304 sin tocar la BD; si no, agrega el ETag.
+    El ETag se toma ANTES de consultar: si hay una escritura en medio, el
+    cliente recibe datos nuevos con un ETag viejo y solo vuelve a descargar.
+    """
+    async def dependencia(request: Request, response: Response):   # sin I/O: no usa el threadpool
+        etag = versiones.etag(recurso)
+        recibidos = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+        if etag in recibidos or "*" in recibidos:
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+    return dependencia
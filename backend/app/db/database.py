@@ -1,9 +1,15 @@
 import os
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
+from app.db.monitor_pool import clase_medida, monitor_sync, monitor_async
+
 # ----------------------------------------------------------------
 # CONFIGURACIÓN DE BASE DE DATOS (NUBE AZURE)
 # ----------------------------------------------------------------
@@ -24,7 +30,56 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("FATAL: No se encontró la variable DATABASE_URL en el archivo .env")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# ----------------------------------------------------------------
+# POOL DE CONEXIONES (configurable por entorno)
+# ----------------------------------------------------------------
+# Azure cierra las conexiones ociosas: sin pre-ping ni recycle, la primera
+# consulta tras un rato muerto falla o se queda colgada. Las ráfagas de
+# polling agotan el pool por defecto (5 + 10), así que el tamaño se ajusta
+# con los datos de GET /internal/db-pool.
+#
+#   DB_POOL_SIZE              conexiones fijas                  (5)
+#   DB_MAX_OVERFLOW           conexiones extra en ráfagas       (10)
+#   DB_POOL_TIMEOUT           segundos esperando una conexión   (30)
+#   DB_POOL_RECYCLE           reciclar conexiones de más de N s (1800, -1 = nunca)
+#   DB_POOL_PRE_PING          probar la conexión al sacarla     (1)
+#   DB_STATEMENT_TIMEOUT_MS   cortar sentencias lentas, solo PostgreSQL (0 = sin límite)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+def opciones_engine(url: str, monitor, asincrono: bool = False):
+    """(kwargs de create_engine/create_async_engine, config a reportar) según las variables DB_*."""
+    u = make_url(url)
+    opciones = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    config = dict(opciones)
+
+    # SQLite en memoria usa un pool de una sola conexión: no aplica tamaño
+    if not (u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:")):
+        base = AsyncAdaptedQueuePool if asincrono else QueuePool
+        opciones.update(
+            poolclass=clase_medida(base, monitor),
+            pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+        )
+        config.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+    if DB_STATEMENT_TIMEOUT_MS and u.get_backend_name() == "postgresql":
+        if asincrono:
+            opciones["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            opciones["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        config["statement_timeout_ms"] = DB_STATEMENT_TIMEOUT_MS
+    return opciones, config
+
+
+_opciones, _config = opciones_engine(SQLALCHEMY_DATABASE_URL, monitor_sync)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_opciones)
+monitor_sync.vincular(engine, _config)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -33,4 +88,70 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ----------------------------------------------------------------
+# MODO ASYNC (DB_ASYNC=1): asyncpg para PostgreSQL, aiosqlite local
+# ----------------------------------------------------------------
+# Con el modo sync cada espera a la BD ocupa un hilo del threadpool, así
+# que la concurrencia la limita la cantidad de hilos. En modo async las
+# rutas calientes esperan a la BD sin ocupar hilos.
+#
+# Las rutas portadas escriben su consulta como una función síncrona
+# fn(session, ...) y la corren con `en_sesion`: en modo async vía
+# AsyncSession.run_sync (I/O async por debajo), en modo sync en el
+# threadpool como siempre. El mismo código sirve para ambos modos.
+
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+
+def url_asincrona(url: str) -> str:
+    """postgresql(+psycopg2):// → postgresql+asyncpg://, sqlite:// → sqlite+aiosqlite://"""
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if u.get_backend_name() == "postgresql":
+        query = dict(u.query)
+        # asyncpg no entiende sslmode (p.ej. ?sslmode=require de Azure): usa ssl
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return u.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    raise ValueError(f"DB_ASYNC no soporta el motor {u.get_backend_name()}")
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    _url_async = os.getenv("DATABASE_URL_ASYNC") or url_asincrona(SQLALCHEMY_DATABASE_URL)
+    _opciones, _config = opciones_engine(_url_async, monitor_async, asincrono=True)
+    async_engine = create_async_engine(_url_async, **_opciones)
+    monitor_async.vincular(async_engine.sync_engine, _config)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def abrir_sesion():
+    """AsyncSession en modo async; Session síncrona en modo sync."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def get_db_async():
+    async with abrir_sesion() as db:
+        yield db
+
+
+async def en_sesion(db, fn, *args, **kwargs):
+    """Corre fn(session, *args) sin bloquear el event loop, en cualquiera de los dos modos."""
+    if DB_ASYNC:
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
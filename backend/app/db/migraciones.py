@@ -0,0 +1,174 @@
+# app/db/migraciones.py
+
+import logging
+
+from sqlalchemy import bindparam, delete, func, insert, inspect, select, text
+
+from .database import Base, SessionLocal
+from . import models
+from app.core.texto import plegar
+
+log = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------
+# MIGRACIONES LIGERAS
+# ----------------------------------------------------------------
+# `create_all` solo crea tablas que no existen: no agrega columnas ni
+# índices nuevos a tablas ya creadas (p.ej. clinica.db o la BD en Azure).
+# Aquí se agregan las columnas/índices faltantes y se rellenan los datos
+# derivados de las filas antiguas.
+# ----------------------------------------------------------------
+
+
+def agregar_columnas_faltantes(engine):
+    insp = inspect(engine)
+    agregadas = []
+
+    with engine.begin() as conn:
+        for tabla in Base.metadata.sorted_tables:
+            if not insp.has_table(tabla.name):
+                continue
+
+            existentes = {c["name"] for c in insp.get_columns(tabla.name)}
+            for col in tabla.columns:
+                if col.name in existentes:
+                    continue
+                tipo = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {col.name} {tipo}"))
+                agregadas.append(f"{tabla.name}.{col.name}")
+
+            indices = {i["name"] for i in insp.get_indexes(tabla.name)}
+            for idx in tabla.indexes:
+                if idx.name not in indices:
+                    # p.ej. ix_cirugias_pabellon_fecha en una BD existente
+                    idx.create(conn)
+                    agregadas.append(idx.name)
+
+    return agregadas
+
+
+def rellenar_timestamps_cirugias():
+    db = SessionLocal()
+    try:
+        pendientes = db.query(models.Cirugia).filter(models.Cirugia.inicio_ts.is_(None)).all()
+        for c in pendientes:
+            c.inicio_ts, c.fin_estimado_ts = models.calcular_timestamps(
+                c.fecha, c.hora_inicio, c.duracion_programada, c.extra_time
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def rellenar_rut_normalizado():
+    # Si dos RUT antiguos coinciden en forma canónica, solo el primero la recibe
+    db = SessionLocal()
+    try:
+        pendientes = db.query(models.Paciente.id, models.Paciente.rut).filter(
+            models.Paciente.rut.isnot(None), models.Paciente.rut_normalizado.is_(None)
+        ).order_by(models.Paciente.id).all()
+        if not pendientes:
+            return
+        usados = {r for (r,) in db.query(models.Paciente.rut_normalizado).filter(
+            models.Paciente.rut_normalizado.isnot(None))}
+
+        duplicados = []
+        for pid, rut in pendientes:
+            canonico = models.limpiar_rut(rut)
+            if canonico is None:
+                continue
+            if canonico in usados:
+                duplicados.append(pid)
+                continue
+            usados.add(canonico)
+            db.query(models.Paciente).filter(models.Paciente.id == pid).update(
+                {models.Paciente.rut_normalizado: canonico}, synchronize_session=False
+            )
+        db.commit()
+        if duplicados:
+            log.warning("Pacientes con RUT duplicado (sin rut_normalizado): %s", duplicados)
+    finally:
+        db.close()
+
+
+def rellenar_nombre_normalizado():
+    db = SessionLocal()
+    try:
+        pendientes = db.query(models.Paciente.id, models.Paciente.nombre).filter(
+            models.Paciente.nombre_normalizado.is_(None)
+        ).all()
+        if pendientes:
+            db.execute(
+                models.Paciente.__table__.update()
+                .where(models.Paciente.__table__.c.id == bindparam("pid"))
+                .values(nombre_normalizado=bindparam("plegado")),
+                [{"pid": pid, "plegado": plegar(nombre)} for pid, nombre in pendientes]
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def crear_indice_trigramas(engine):
+    # Solo PostgreSQL: índice GIN de trigramas para /pacientes/buscar.
+    # Crear la extensión puede requerir permisos: si falla, la búsqueda
+    # sigue funcionando (más lenta) con LIKE sobre nombre_normalizado.
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_pacientes_nombre_trgm "
+                "ON pacientes USING gin (nombre_normalizado gin_trgm_ops)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_pacientes_rut_prefijo "
+                "ON pacientes (rut_normalizado text_pattern_ops)"
+            ))
+    except Exception as e:
+        log.warning("No se pudo crear el índice pg_trgm: %s", e)
+
+
+def inicializar_secuencias(engine):
+    # Las filas existentes entran al delta-sync con la primera secuencia
+    db = SessionLocal()
+    try:
+        db.query(models.Cirugia).filter(models.Cirugia.cambio_seq.is_(None)).update(
+            {models.Cirugia.cambio_seq: 1}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    # El contador de cambios ya no es la fila "cirugias" de `secuencias`
+    # (un UPDATE que serializaba cada escritura): la nueva fuente parte
+    # después del mayor cambio_seq existente para que /cambios no retroceda.
+    with engine.begin() as conn:
+        maximo = max(
+            conn.scalar(select(func.max(models.Cirugia.cambio_seq))) or 0,
+            conn.scalar(select(func.max(models.CirugiaEliminada.cambio_seq))) or 0,
+            conn.scalar(select(models.Secuencia.valor).where(models.Secuencia.nombre == "cirugias")) or 0,
+        )
+        conn.execute(delete(models.Secuencia).where(models.Secuencia.nombre == "cirugias"))
+        if engine.dialect.name == "postgresql":
+            conn.execute(
+                text("SELECT setval('cirugias_cambio_seq', GREATEST(:maximo, "
+                     "(SELECT last_value FROM cirugias_cambio_seq)))"),
+                {"maximo": max(maximo, 1)},
+            )
+        elif maximo:
+            # AUTOINCREMENT sigue desde el mayor id insertado alguna vez (no baja)
+            conn.execute(insert(models.NumeroCambio).values(id=maximo))
+            conn.execute(delete(models.NumeroCambio).where(models.NumeroCambio.id == maximo))
+
+
+def aplicar_migraciones(engine):
+    agregadas = agregar_columnas_faltantes(engine)
+    if agregadas:
+        log.info("Columnas e índices agregados: %s", ", ".join(agregadas))
+    rellenar_timestamps_cirugias()
+    rellenar_rut_normalizado()
+    rellenar_nombre_normalizado()
+    crear_indice_trigramas(engine)
+    inicializar_secuencias(engine)
@@ -1,11 +1,15 @@
 # app/db/models.py
 
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Date, Time,
-    ForeignKey, Enum
+    Column, Integer, String, Boolean, Date, Time, DateTime,
+    ForeignKey, Enum, Index, Sequence, event, insert, delete, select, inspect, text, update
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from .database import Base
+from app.core.rut import limpiar_rut
+from app.core.texto import plegar
+from datetime import datetime, timedelta
 import enum
 
 
@@ -47,7 +51,9 @@ class Paciente(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String, nullable=False)
+    nombre_normalizado = Column(String)   # sin tildes/minúsculas, para /pacientes/buscar
     rut = Column(String, unique=True)
+    rut_normalizado = Column(String, unique=True, index=True)   # "12345678-5", para deduplicar
     telefono = Column(String)
     email = Column(String)
     fecha_nacimiento = Column(Date)
@@ -111,8 +117,187 @@ class Cirugia(Base):
 
     es_aseo = Column(Boolean, default=False, nullable=False)
 
+    # Instantes precalculados (fecha + hora_inicio y + duración + extra, sin aseo).
+    # Se mantienen en before_insert/before_update y permiten transiciones
+    # set-based apoyadas en los índices (estado, ts).
+    inicio_ts = Column(DateTime)
+    fin_estimado_ts = Column(DateTime)
+
+    # Seguimiento de cambios para el delta-sync (/cirugias/cambios)
+    cambio_seq = Column(Integer, index=True)
+    actualizado_en = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_cirugias_estado_inicio_ts", "estado", "inicio_ts"),
+        Index("ix_cirugias_estado_fin_estimado_ts", "estado", "fin_estimado_ts"),
+        Index("ix_cirugias_inicio_ts_id", "inicio_ts", "id"),   # listado paginado
+        # Choques de horario (IndiceAgenda.cargar, buscar_conflictos, cargar_ocupacion)
+        Index("ix_cirugias_pabellon_fecha", "pabellon_id", "fecha"),
+    )
+
     # Relaciones ORM
     paciente_rel = relationship("Paciente", back_populates="cirugias")
     doctor_rel = relationship("Usuario", back_populates="cirugias_doctor")
     pabellon_rel = relationship("Pabellon", back_populates="cirugias")
-    tipo_cirugia_rel = relationship("TipoCirugia", back_populates="cirugias")
\ No newline at end of file
+    tipo_cirugia_rel = relationship("TipoCirugia", back_populates="cirugias")
+
+
+# ---------------------------------------------------
+# SEGUIMIENTO DE CAMBIOS (delta-sync)
+# ---------------------------------------------------
+class CirugiaEliminada(Base):
+    """Tombstone de una cirugía borrada, para que los clientes la quiten."""
+    __tablename__ = "cirugias_eliminadas"
+
+    id = Column(Integer, primary_key=True)
+    cirugia_id = Column(Integer, nullable=False)
+    pabellon_id = Column(Integer)
+    cambio_seq = Column(Integer, nullable=False, index=True)
+    eliminado_en = Column(DateTime, default=datetime.now)
+
+
+class Secuencia(Base):
+    """Valores con nombre del delta-sync (p.ej. hasta qué cambio_seq se purgaron
+    tombstones). Ya NO es el contador de cambios: ver siguiente_secuencia."""
+    __tablename__ = "secuencias"
+
+    nombre = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+
+# Fuente del cambio_seq: una secuencia de la BD en PostgreSQL y, en el
+# resto, una tabla AUTOINCREMENT que nunca reutiliza un id.
+#
+# El número se asigna al CONFIRMAR, no al escribir: mientras la transacción
+# está abierta sus filas llevan CAMBIO_PENDIENTE y `numerar_cambios`
+# (before_commit) las renumera justo antes del COMMIT, dentro de un lock
+# que dura hasta el COMMIT (el de escritura de SQLite; en PostgreSQL un
+# pg_advisory_xact_lock). Así el orden de los números es el orden de
+# commit: quien ve el cambio N ya ve todos los anteriores, aunque la
+# transacción haya escrito sus filas mucho antes (p.ej. una importación).
+CAMBIO_PENDIENTE = -1
+BLOQUEO_NUMERACION = 0x63616D62   # pg_advisory_xact_lock(bigint): no se cruza con (pabellón, día)
+
+CAMBIO_SEQ = Sequence("cirugias_cambio_seq", metadata=Base.metadata)
+
+
+class NumeroCambio(Base):
+    __tablename__ = "numeros_cambio"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+
+
+def siguiente_secuencia(conexion) -> int:
+    """Próximo número de la secuencia. Solo la llama `numerar_cambios`, que
+    garantiza el orden de commit; las escrituras usan `cambio_pendiente`."""
+    if conexion.dialect.name == "postgresql":
+        return conexion.execute(select(CAMBIO_SEQ.next_value())).scalar()
+    valor = conexion.execute(insert(NumeroCambio)).inserted_primary_key[0]
+    conexion.execute(delete(NumeroCambio).where(NumeroCambio.id == valor))
+    return valor
+
+
+# Modelos cuyo cambio invalida vistas derivadas de la agenda (p.ej. el
+# resumen del dashboard, que muestra nombres de paciente/pabellón/tipo).
+# La sesión queda marcada y el caché se invalida recién en after_commit.
+MODELOS_AGENDA = (Cirugia, Paciente, Pabellon, TipoCirugia)
+
+
+def marcar_agenda_modificada(session):
+    session.info["agenda_modificada"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def registrar_escrituras_masivas(estado):
+    # insert()/update()/delete() ejecutados con la sesión (bulk, transiciones)
+    if (estado.is_insert or estado.is_update or estado.is_delete) and \
+            any(m.class_ in MODELOS_AGENDA for m in estado.all_mappers):
+        marcar_agenda_modificada(estado.session)
+
+
+def cambio_pendiente(session) -> int:
+    """cambio_seq para escrituras masivas (insert/update) de la transacción:
+    se numera en el commit junto con el resto de sus cambios."""
+    session.info["cambios_pendientes"] = True
+    return CAMBIO_PENDIENTE
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_cambios_cirugias(session, flush_context, instances):
+    if any(isinstance(o, MODELOS_AGENDA) for o in (*session.new, *session.dirty, *session.deleted)):
+        marcar_agenda_modificada(session)
+
+    nuevas = [o for o in session.new if isinstance(o, Cirugia)]
+    modificadas = [o for o in session.dirty if isinstance(o, Cirugia) and session.is_modified(o)]
+    eliminadas = [o for o in session.deleted if isinstance(o, Cirugia)]
+    if not (nuevas or modificadas or eliminadas):
+        return
+
+    seq = cambio_pendiente(session)
+    ahora = datetime.now()
+    for c in nuevas + modificadas:
+        c.cambio_seq = seq
+        c.actualizado_en = ahora
+    for c in eliminadas:
+        session.add(CirugiaEliminada(cirugia_id=c.id, pabellon_id=c.pabellon_id, cambio_seq=seq, eliminado_en=ahora))
+
+
+@event.listens_for(Session, "before_commit")
+def numerar_cambios(session):
+    if session.in_nested_transaction():
+        return
+    session.flush()   # el flush del commit viene DESPUÉS de este evento
+    if not session.info.pop("cambios_pendientes", False):
+        return
+
+    conexion = session.connection()
+    if conexion.dialect.name == "postgresql":
+        conexion.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": BLOQUEO_NUMERACION})
+    seq = siguiente_secuencia(conexion)
+    for modelo in (Cirugia, CirugiaEliminada):
+        conexion.execute(update(modelo).where(modelo.cambio_seq == CAMBIO_PENDIENTE).values(cambio_seq=seq))
+    # Objetos que sobreviven al commit (expire_on_commit=False)
+    for obj in session.identity_map.values():
+        if isinstance(obj, (Cirugia, CirugiaEliminada)) and obj.__dict__.get("cambio_seq") == CAMBIO_PENDIENTE:
+            set_committed_value(obj, "cambio_seq", seq)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def descartar_cambios_pendientes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("cambios_pendientes", None)
+
+
+def calcular_timestamps(fecha, hora_inicio, duracion, extra=0):
+    """Devuelve (inicio_ts, fin_estimado_ts) para una cirugía."""
+    if fecha is None or hora_inicio is None:
+        return None, None
+    inicio = datetime.combine(fecha, hora_inicio)
+    return inicio, inicio + timedelta(minutes=(duracion or 0) + (extra or 0))
+
+
+@event.listens_for(Cirugia, "before_insert")
+@event.listens_for(Cirugia, "before_update")
+def sincronizar_timestamps(mapper, connection, target):
+    target.inicio_ts, target.fin_estimado_ts = calcular_timestamps(
+        target.fecha, target.hora_inicio, target.duracion_programada, target.extra_time
+    )
+
+
+@event.listens_for(Paciente, "before_insert")
+def normalizar_paciente_nuevo(mapper, connection, target):
+    target.rut_normalizado = limpiar_rut(target.rut)
+    target.nombre_normalizado = plegar(target.nombre)
+
+
+@event.listens_for(Paciente, "before_update")
+def sincronizar_normalizados(mapper, connection, target):
+    # Solo si cambió el campo: los RUT antiguos duplicados quedan con
+    # rut_normalizado NULL (ver migraciones.rellenar_rut_normalizado) y
+    # recalcularlo al editar otro dato chocaría con el índice único.
+    estado = inspect(target)
+    if estado.attrs.rut.history.has_changes():
+        target.rut_normalizado = limpiar_rut(target.rut)
+    if estado.attrs.nombre.history.has_changes():
+        target.nombre_normalizado = plegar(target.nombre)
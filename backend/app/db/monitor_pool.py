@@ -0,0 +1,183 @@
+# app/db/monitor_pool.py
+
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event, exc
+
+# ======================================================
+# INSTRUMENTACIÓN DEL POOL DE CONEXIONES
+# ======================================================
+# Con los eventos del pool (connect, checkout, checkin, close, invalidate)
+# se cuentan las conexiones en uso, el máximo observado, cuánto tiempo se
+# retiene cada una y el churn (conexiones abiertas/cerradas/invalidadas).
+#
+# El tiempo de ESPERA por una conexión no tiene evento propio: lo mide
+# la subclase del pool que devuelve `clase_medida` alrededor de _do_get
+# (incluye abrir la conexión si hay que crear una nueva u overflow).
+
+LIMITES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histograma:
+
+    def __init__(self):
+        self.cubetas = [0] * (len(LIMITES_MS) + 1)
+        self.cantidad = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms: float):
+        self.cubetas[bisect_left(LIMITES_MS, ms)] += 1
+        self.cantidad += 1
+        self.total_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+
+    def percentil(self, p: float):
+        """Cota superior (ms) del percentil p según las cubetas."""
+        if not self.cantidad:
+            return None
+        acumulado = 0
+        for limite, n in zip(LIMITES_MS + (None,), self.cubetas):
+            acumulado += n
+            if acumulado >= p * self.cantidad:
+                return min(limite, round(self.maximo_ms, 1)) if limite is not None else round(self.maximo_ms, 1)
+
+    def como_dict(self):
+        etiquetas = [f"<={l}ms" for l in LIMITES_MS] + [f">{LIMITES_MS[-1]}ms"]
+        return {
+            "cantidad": self.cantidad,
+            "promedio_ms": round(self.total_ms / self.cantidad, 2) if self.cantidad else None,
+            "p50_ms": self.percentil(0.50),
+            "p95_ms": self.percentil(0.95),
+            "p99_ms": self.percentil(0.99),
+            "maximo_ms": round(self.maximo_ms, 1),
+            "cubetas": dict(zip(etiquetas, self.cubetas)),
+        }
+
+
+class MonitorPool:
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.engine = None
+        self.config = {}
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def limpiar(self):
+        with self._lock:
+            self.espera = Histograma()
+            self.retencion = Histograma()
+            self.checkouts = 0
+            self.timeouts = 0
+            self.creadas = 0
+            self.cerradas = 0
+            self.invalidadas = 0
+            self.maximo_en_uso = 0
+            self.desde = time.time()
+
+    # -----------------------------
+    # Enganche al engine
+    # -----------------------------
+    def vincular(self, engine, config: dict):
+        """Escucha los eventos del pool de `engine` (sync, o el sync_engine de uno async)."""
+        self.engine = engine
+        self.config = config
+        event.listen(engine, "connect", self._al_conectar)
+        event.listen(engine, "checkout", self._al_checkout)
+        event.listen(engine, "checkin", self._al_checkin)
+        event.listen(engine, "close", self._al_cerrar)
+        event.listen(engine, "close_detached", self._al_cerrar)
+        event.listen(engine, "invalidate", self._al_invalidar)
+        event.listen(engine, "soft_invalidate", self._al_invalidar)
+
+    def _al_conectar(self, dbapi_conn, registro):
+        with self._lock:
+            self.creadas += 1
+
+    def _al_checkout(self, dbapi_conn, registro, proxy):
+        registro.info["checkout_en"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.maximo_en_uso = max(self.maximo_en_uso, self.en_uso() or 0)
+
+    def _al_checkin(self, dbapi_conn, registro):
+        inicio = registro.info.pop("checkout_en", None) if registro is not None else None
+        if inicio is not None:
+            with self._lock:
+                self.retencion.registrar((time.perf_counter() - inicio) * 1000)
+
+    def _al_cerrar(self, dbapi_conn, *_):
+        with self._lock:
+            self.cerradas += 1
+
+    def _al_invalidar(self, dbapi_conn, registro, excepcion):
+        with self._lock:
+            self.invalidadas += 1
+
+    # Llamados desde el pool medido
+    def registrar_espera(self, segundos: float):
+        with self._lock:
+            self.espera.registrar(segundos * 1000)
+
+    def registrar_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    # -----------------------------
+    # Lectura
+    # -----------------------------
+    @property
+    def pool(self):
+        # engine.dispose() reemplaza el pool: siempre leer el actual
+        return self.engine.pool if self.engine is not None else None
+
+    def en_uso(self):
+        checkedout = getattr(self.pool, "checkedout", None)
+        return checkedout() if checkedout else None
+
+    def estadisticas(self):
+        pool = self.pool
+        with self._lock:
+            return {
+                "pool": type(pool).__name__ if pool else None,
+                "config": self.config,
+                "estado": pool.status() if pool else None,
+                "en_uso": self.en_uso(),
+                "en_reposo": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "maximo_en_uso": self.maximo_en_uso,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera": self.espera.como_dict(),
+                "retencion": self.retencion.como_dict(),
+                "churn": {"creadas": self.creadas, "cerradas": self.cerradas, "invalidadas": self.invalidadas},
+                "desde": self.desde,
+            }
+
+
+def clase_medida(base, monitor: MonitorPool):
+    """Subclase de `base` que mide la espera por conexión en _do_get.
+
+    Es una clase (no un parche a la instancia) para sobrevivir a
+    engine.dispose(), que recrea el pool con self.__class__.
+    """
+    class PoolMedido(base):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                monitor.registrar_timeout()
+                raise
+            finally:
+                monitor.registrar_espera(time.perf_counter() - inicio)
+
+    PoolMedido.__name__ = base.__name__
+    return PoolMedido
+
+
+monitor_sync = MonitorPool("sync")
+monitor_async = MonitorPool("async")
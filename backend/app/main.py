@@ -1,19 +1,73 @@
 # app/main.py
-from fastapi import FastAPI
-from app.db.database import Base, engine
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Response
+from app.db.database import Base, engine, SessionLocal, async_engine
 # AGREGAMOS 'dashboard' AQUÍ
-from app.api.endpoints import pabellones, cirugias, auth, usuarios, pacientes, tipos_cirugia, dashboard 
+from app.api.endpoints import pabellones, cirugias, auth, usuarios, pacientes, tipos_cirugia, dashboard, tiempo_real, internal, catalogos
 from app.db import models
+from app.db.migraciones import aplicar_migraciones
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.scheduler import scheduler, SCHEDULER_ACTIVO
+from app.core.eventos import hub
+from app.core import busqueda, delta
+from app.core.catalogos import catalogos as cache_catalogos
+from app.core.metricas import MiddlewareMetricas, instrumentar_engine, registro, METRICAS_TOKEN
+from app.core.diagnostico import diagnostico, MiddlewareDiagnostico, DIAGNOSTICO_ACTIVO
+
+# Logs operativos de la app (scheduler, migraciones, purgas, diagnóstico SQL).
+# LOG_LEVEL=DEBUG muestra también las transiciones y el resumen por request.
+_log_app = logging.getLogger("app")
+_log_app.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not _log_app.handlers:
+    _manejador = logging.StreamHandler()
+    _manejador.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log_app.addHandler(_manejador)
 
 # Crea todas las tablas en la base de datos (solo si no existen)
 models.Base.metadata.create_all(bind=engine)
+# ...y agrega columnas/índices nuevos a tablas que ya existían
+aplicar_migraciones(engine)
+
+# Sentencias y tiempo SQL por request para /metrics
+instrumentar_engine(engine)
+if async_engine is not None:
+    instrumentar_engine(async_engine.sync_engine)
+
+# Modo diagnóstico (DIAGNOSTICO_SQL=1): consultas lentas y N+1 por request
+if DIAGNOSTICO_ACTIVO:
+    diagnostico.instrumentar_engine(engine)
+    if async_engine is not None:
+        diagnostico.instrumentar_engine(async_engine.sync_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hub de eventos en tiempo real: se publica desde threads hacia este loop
+    hub.vincular(asyncio.get_running_loop())
+    # Catálogos (pabellones, tipos) en memoria: write-through desde sus endpoints
+    cache_catalogos.cargar(SessionLocal)
+    # Tombstones del delta-sync más antiguos que la retención
+    with SessionLocal() as db:
+        delta.purgar_tombstones(db)
+    # Scheduler de transiciones automáticas (PROGRAMADA → EN_CURSO → COMPLICADA)
+    if SCHEDULER_ACTIVO:
+        scheduler.iniciar()
+    # Índice de búsqueda de pacientes en memoria (solo sin PostgreSQL)
+    if busqueda.usa_indice_local(engine):
+        busqueda.indice.precargar(SessionLocal)
+    yield
+    scheduler.detener()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 # Inicializa la aplicación FastAPI
 app = FastAPI(
     title="API Gestión de Pabellones - Clínica BAK",
     description="Backend para gestionar la asignación de pabellones de cirugía en tiempo real.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Habilitar CORS
@@ -28,8 +82,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Siguiente-Cursor"],
 )
 
+# Latencia, bytes y SQL por ruta (se agrega último: envuelve también a CORS)
+app.add_middleware(MiddlewareMetricas)
+if DIAGNOSTICO_ACTIVO:
+    app.add_middleware(MiddlewareDiagnostico)
+
 # Agrega los routers de los endpoints para que FastAPI los reconozca
 app.include_router(auth.router, tags=["Autenticación"])
 app.include_router(pabellones.router, prefix="/pabellones", tags=["Pabellones"])
@@ -37,11 +97,25 @@ app.include_router(cirugias.router, prefix="/cirugias", tags=["Cirugías"])
 app.include_router(usuarios.router, prefix="/usuarios", tags=["Usuarios"])
 app.include_router(pacientes.router, prefix="/pacientes", tags=["Pacientes"])
 app.include_router(tipos_cirugia.router, prefix="/tipos-cirugia", tags=["Tipos de Cirugía"])
+app.include_router(catalogos.router, prefix="/catalogos", tags=["Catálogos"])
 
 # NUEVO ROUTER PARA DASHBOARD
 app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
 
+# Push de cambios del tablero (WebSocket + fallback SSE)
+app.include_router(tiempo_real.router, tags=["Tiempo Real"])
+
+# Instrumentación interna (solo Admin)
+app.include_router(internal.router, prefix="/internal", tags=["Interno"])
+
 @app.get("/", tags=["Root"])
 def read_root():
     # Endpoint simple para verificar que el backend esté vivo
-    return {"message": "API de Gestión de Pabellones activa. Ir a /docs para la documentación."}
\ No newline at end of file
+    return {"message": "API de Gestión de Pabellones activa. Ir a /docs para la documentación."}
+
+@app.get("/metrics", include_in_schema=False)
+def metricas(authorization: str = Header(None)):
+    # Formato de texto de Prometheus; con METRICAS_TOKEN definido exige "Bearer <token>"
+    if METRICAS_TOKEN and authorization != f"Bearer {METRICAS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return Response(registro.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
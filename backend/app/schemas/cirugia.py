@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import date, time, datetime
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from app.db.models import EstadoCirugia
 
 
@@ -49,4 +49,148 @@ class CirugiaOut(BaseModel):
     hora_fin_estimada: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# ---------------------------------------------------
+# LECTURA EXPANDIDA (?expand=paciente,doctor,tipo,pabellon)
+# ---------------------------------------------------
+# Nombres inline para que el cliente no descargue los catálogos completos
+class CirugiaExpandida(CirugiaOut):
+    paciente_nombre: Optional[str] = None
+    paciente_rut: Optional[str] = None
+    doctor_nombre: Optional[str] = None
+    tipo_nombre: Optional[str] = None
+    tipo_duracion: Optional[int] = None
+    pabellon_nombre: Optional[str] = None
+
+
+# ---------------------------------------------------
+# TABLERO (snapshot agregado por pabellón)
+# ---------------------------------------------------
+class CirugiaTablero(CirugiaExpandida):
+    pass
+
+
+class PabellonTablero(BaseModel):
+    id: int
+    nombre: str
+    es_compleja: bool
+    capacidad: int
+    tasks: List[CirugiaTablero] = []
+
+
+# ---------------------------------------------------
+# DELTA-SYNC (/cirugias/cambios)
+# ---------------------------------------------------
+class CirugiaEliminadaOut(BaseModel):
+    id: int
+    pabellon_id: Optional[int] = None
+    cambio_seq: int
+
+
+class CambiosCirugias(BaseModel):
+    cursor: int
+    resync: bool = False
+    cirugias: List[CirugiaOut] = []
+    eliminadas: List[CirugiaEliminadaOut] = []
+
+
+# ---------------------------------------------------
+# VALIDACIÓN EN LOTE (/cirugias/validar)
+# ---------------------------------------------------
+class PropuestaIntervalo(BaseModel):
+    pabellon_id: int
+    fecha: date
+    hora_inicio: time
+    duracion_programada: int
+    extra_time: int = 0
+    cirugia_id: Optional[int] = None   # si reprograma una cirugía existente
+
+
+class ResultadoValidacion(BaseModel):
+    indice: int
+    ok: bool
+    conflictos: List[int] = []              # cirugías existentes
+    conflictos_propuestas: List[int] = []   # índices de propuestas anteriores del lote
+
+
+# ---------------------------------------------------
+# HUECOS LIBRES (/cirugias/slots)
+# ---------------------------------------------------
+class SlotLibre(BaseModel):
+    pabellon_id: int
+    pabellon_nombre: str
+    es_compleja: bool
+    fecha: date
+    hora_inicio: time
+    inicio: datetime
+    fin_ocupacion: datetime   # inicio + duración + aseo
+    hueco_hasta: datetime     # fin del hueco libre que contiene al slot
+
+
+class SolicitudSlot(BaseModel):
+    tipo_cirugia_id: int
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    compleja: bool = False
+    duracion_programada: Optional[int] = None   # por defecto, la del tipo
+
+
+class ResultadoSlot(BaseModel):
+    indice: int
+    slot: Optional[SlotLibre] = None
+    error: Optional[str] = None
+
+
+# ---------------------------------------------------
+# PLANIFICADOR DEL DÍA (/cirugias/planificar)
+# ---------------------------------------------------
+class CasoPendiente(BaseModel):
+    tipo_cirugia_id: int
+    doctor_id: Optional[int] = None
+    paciente_id: Optional[int] = None
+    duracion_programada: Optional[int] = None   # por defecto, la del tipo
+    desde: Optional[time] = None                # hora más temprana de inicio
+    hasta: Optional[time] = None                # hora límite de término
+    compleja: bool = False
+
+
+class SolicitudPlan(BaseModel):
+    fecha: date
+    casos: List[CasoPendiente]
+    jornada_inicio: time = time(8, 0)
+    jornada_fin: time = time(20, 0)
+    dry_run: bool = True
+
+
+class AsignacionPlan(BaseModel):
+    indice: int
+    pabellon_id: int
+    pabellon_nombre: str
+    fecha: date
+    hora_inicio: time
+    duracion_programada: int
+    fin_ocupacion: datetime
+
+
+class CasoSinAsignar(BaseModel):
+    indice: int
+    motivo: str
+
+
+class PlanDia(BaseModel):
+    fecha: date
+    dry_run: bool
+    asignaciones: List[AsignacionPlan] = []
+    sin_asignar: List[CasoSinAsignar] = []
+    estadisticas: Dict[str, Any] = {}
+    cirugia_ids: List[int] = []
+
+
+# ---------------------------------------------------
+# IMPORTACIÓN MASIVA (/cirugias/bulk)
+# ---------------------------------------------------
+class CirugiaImportada(CirugiaBase):
+    # Permite migrar agendas históricas (FINALIZADA/CANCELADA no ocupan pabellón)
+    estado: EstadoCirugia = EstadoCirugia.PROGRAMADA
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class ErrorFila(BaseModel):
+    linea: int
+    error: str
+
+
+class ReporteImportacion(BaseModel):
+    modo: str                 # "parcial" (commit por lote) o "todo" (todo o nada)
+    confirmado: bool          # False si "todo" se revirtió por algún error
+    procesadas: int
+    insertadas: int
+    con_error: int
+    errores: List[ErrorFila] = []
+    errores_omitidos: int = 0   # errores sin detalle (más allá del máximo)
@@ -18,6 +18,7 @@ class PacienteCreate(PacienteBase):
 
 class PacienteUpdate(BaseModel):
     nombre: Optional[str] = None
+    rut: Optional[str] = None
     telefono: Optional[str] = None
     email: Optional[str] = None
     direccion: Optional[str] = None
@@ -0,0 +1,313 @@
+"""
+Prueba de carga que reproduce el polling real del frontend.
+
+Simula a la vez:
+  - N tableros (scrum-cirugias.ts) que cada 10 s hacen un ciclo de carga;
+  - M dashboards que piden /dashboard/resumen cada 30 s;
+  - un goteo de escrituras (POST /cirugias/) y de logins (POST /token).
+
+El ciclo del tablero depende de --patron:
+  original  el del frontend antes del tablero agregado: actualizar-estados,
+            los tres catálogos (pacientes, tipos, usuarios), /pabellones/ y
+            un GET /cirugias/?pabellon_id=X por pabellón
+  actual    el de hoy: actualizar-estados y /cirugias/tablero
+
+La API corre en un proceso hijo (uvicorn) sobre un SQLite temporal o la BD
+de --db, sembrada a la escala pedida (ver datos.py). El reporte trae, por
+endpoint, throughput y latencia p50/p95/p99, y las sentencias SQL por
+segundo (leídas de /metrics). Se guarda en JSON para comparar corridas:
+
+    python benchmarks/carga_polling.py --tableros 40 --dashboards 10 --segundos 60
+    python benchmarks/carga_polling.py --patron actual --comparar benchmarks/resultados/carga_original_....json
+    python benchmarks/carga_polling.py --db postgresql://... --cirugias 200000
+
+--acelerar divide los intervalos (10 s / 30 s / escrituras / logins) para
+meter más carga en corridas cortas sin cambiar la proporción entre clientes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description="Prueba de carga con el patrón de polling del frontend")
+parser.add_argument("--db", help="URL de BD (por defecto un SQLite temporal)")
+parser.add_argument("--patron", choices=["original", "actual"], default="original")
+parser.add_argument("--tableros", type=int, default=20, help="clientes con el tablero abierto")
+parser.add_argument("--dashboards", type=int, default=5, help="clientes con el dashboard abierto")
+parser.add_argument("--escrituras", type=float, default=6, help="cirugías creadas por minuto")
+parser.add_argument("--logins", type=float, default=2, help="logins por minuto")
+parser.add_argument("--segundos", type=float, default=60)
+parser.add_argument("--acelerar", type=float, default=1, help="divide todos los intervalos")
+parser.add_argument("--cirugias", type=int, default=5000, help="escala: cirugías sembradas")
+parser.add_argument("--pabellones", type=int, default=12)
+parser.add_argument("--pacientes", type=int, default=2000)
+parser.add_argument("--puerto", type=int, default=8791)
+parser.add_argument("--salida", help="ruta del reporte JSON (por defecto benchmarks/resultados/)")
+parser.add_argument("--comparar", help="reporte JSON anterior contra el cual comparar")
+parser.add_argument("--servidor", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+INTERVALO_TABLERO = 10 / args.acelerar
+INTERVALO_DASHBOARD = 30 / args.acelerar
+
+
+# ------------------------------------------------------
+# Proceso hijo: la API
+# ------------------------------------------------------
+def servidor():
+    import uvicorn
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto, log_level="warning")
+
+
+# ------------------------------------------------------
+# Mediciones
+# ------------------------------------------------------
+class Mediciones:
+
+    def __init__(self):
+        self.latencias = {}          # endpoint -> [segundos]
+        self.estados = {}            # endpoint -> Counter(status)
+        self.errores = Counter()     # endpoint -> 5xx o error de red
+
+    async def medir(self, endpoint, peticion):
+        inicio = time.perf_counter()
+        try:
+            r = await peticion
+            estado = r.status_code
+        except Exception:
+            r, estado = None, "error"
+        self.latencias.setdefault(endpoint, []).append(time.perf_counter() - inicio)
+        self.estados.setdefault(endpoint, Counter())[str(estado)] += 1
+        if estado == "error" or estado >= 500:
+            self.errores[endpoint] += 1
+        return r
+
+    def reporte(self, duracion):
+        endpoints = {}
+        for endpoint, latencias in sorted(self.latencias.items()):
+            latencias.sort()
+            pct = lambda p: round(latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000, 1)
+            endpoints[endpoint] = {
+                "requests": len(latencias), "rps": round(len(latencias) / duracion, 2),
+                "errores": self.errores[endpoint], "estados": dict(self.estados[endpoint]),
+                "promedio_ms": round(sum(latencias) / len(latencias) * 1000, 1),
+                "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            }
+        return endpoints
+
+
+# ------------------------------------------------------
+# Clientes simulados
+# ------------------------------------------------------
+async def esperar_hasta(proximo, fin):
+    await asyncio.sleep(max(0, min(proximo, fin) - time.perf_counter()))
+
+
+async def tablero(http, med, pabellones, fin):
+    proximo = time.perf_counter() + random.uniform(0, INTERVALO_TABLERO)
+    await esperar_hasta(proximo, fin)
+    while time.perf_counter() < fin:
+        await med.medir("POST /cirugias/actualizar-estados", http.post("/cirugias/actualizar-estados"))
+        if args.patron == "original":
+            _, _, _, r = await asyncio.gather(
+                med.medir("GET /pacientes/", http.get("/pacientes/")),
+                med.medir("GET /tipos-cirugia/", http.get("/tipos-cirugia/")),
+                med.medir("GET /usuarios/", http.get("/usuarios/")),
+                med.medir("GET /pabellones/", http.get("/pabellones/")),
+            )
+            ids = [p["id"] for p in r.json()] if r is not None and r.status_code == 200 else pabellones
+            await asyncio.gather(*(
+                med.medir("GET /cirugias/?pabellon_id", http.get("/cirugias/", params={"pabellon_id": i}))
+                for i in ids
+            ))
+        else:
+            await med.medir("GET /cirugias/tablero", http.get("/cirugias/tablero"))
+        proximo += INTERVALO_TABLERO
+        await esperar_hasta(proximo, fin)
+
+
+async def dashboard(http, med, fin):
+    proximo = time.perf_counter() + random.uniform(0, INTERVALO_DASHBOARD)
+    await esperar_hasta(proximo, fin)
+    while time.perf_counter() < fin:
+        await med.medir("GET /dashboard/resumen", http.get("/dashboard/resumen"))
+        proximo += INTERVALO_DASHBOARD
+        await esperar_hasta(proximo, fin)
+
+
+async def goteo(por_minuto, accion, fin):
+    if por_minuto <= 0:
+        return
+    intervalo = 60 / por_minuto / args.acelerar
+    while True:
+        # Llegadas de Poisson: intervalos exponenciales con esa media
+        proximo = time.perf_counter() + random.expovariate(1 / intervalo)
+        await esperar_hasta(proximo, fin)
+        if time.perf_counter() >= fin:
+            return
+        await accion()
+
+
+async def cargar(token, ids):
+    import httpx
+    from datos import USUARIO, CLAVE
+
+    med = Mediciones()
+    pabellones = ids["pabellones"]
+    conexiones = args.tableros * (args.pabellones + 1) + args.dashboards + 4
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.puerto}", timeout=120,
+                                 headers={"Authorization": f"Bearer {token}"},
+                                 limits=httpx.Limits(max_connections=conexiones)) as http:
+
+        async def escribir():
+            inicio = datetime.combine(date.today(), datetime.min.time()) + timedelta(minutes=random.randrange(0, 23 * 60, 5))
+            cuerpo = {"paciente_id": ids["paciente"], "doctor_id": None, "pabellon_id": random.choice(pabellones),
+                      "tipo_cirugia_id": ids["tipo"], "fecha": inicio.date().isoformat(),
+                      "hora_inicio": inicio.strftime("%H:%M"), "duracion_programada": 30}
+            # Un 400 por solapamiento es una respuesta normal, no un error
+            await med.medir("POST /cirugias/", http.post("/cirugias/", json=cuerpo))
+
+        async def login():
+            await med.medir("POST /token", http.post("/token", data={"username": USUARIO, "password": CLAVE}))
+
+        sentencias_antes = await sentencias_sql(http)
+        fin = time.perf_counter() + args.segundos
+        inicio = time.perf_counter()
+        await asyncio.gather(
+            *(tablero(http, med, pabellones, fin) for _ in range(args.tableros)),
+            *(dashboard(http, med, fin) for _ in range(args.dashboards)),
+            goteo(args.escrituras, escribir, fin),
+            goteo(args.logins, login, fin),
+        )
+        duracion = time.perf_counter() - inicio
+        sentencias = await sentencias_sql(http) - sentencias_antes
+
+    endpoints = med.reporte(duracion)
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "duracion_s": round(duracion, 1),
+        "totales": {
+            "requests": total, "rps": round(total / duracion, 2),
+            "errores": sum(e["errores"] for e in endpoints.values()),
+            "sentencias_sql": sentencias, "sentencias_sql_por_s": round(sentencias / duracion, 1),
+        },
+        "endpoints": endpoints,
+    }
+
+
+SERIES_SQL = re.compile(r"^(http_sql_sentencias_sum|sql_sentencias_fuera_de_request_total)(\{.*\})? (\S+)$", re.M)
+
+
+async def sentencias_sql(http) -> int:
+    """Sentencias SQL ejecutadas por la API desde que levantó (según /metrics)."""
+    texto = (await http.get("/metrics")).text
+    return int(sum(float(m.group(3)) for m in SERIES_SQL.finditer(texto)))
+
+
+# ------------------------------------------------------
+# Proceso padre: datos, servidor, reporte
+# ------------------------------------------------------
+def preparar(url):
+    os.environ["DATABASE_URL"] = url
+    from app.db.database import SessionLocal, engine
+    from app.db import models
+    from app.core.security import create_access_token
+    import datos
+
+    datos.preparar_esquema(engine)
+    inicio = time.perf_counter()
+    escala = datos.sembrar(SessionLocal, cirugias=args.cirugias, pabellones=args.pabellones, pacientes=args.pacientes)
+    print(f"🌱 BD lista en {time.perf_counter() - inicio:.1f}s: {escala}")
+    db = SessionLocal()
+    try:
+        ids = {
+            "pabellones": [p for (p,) in db.query(models.Pabellon.id).order_by(models.Pabellon.id)],
+            "tipo": db.query(models.TipoCirugia.id).filter(models.TipoCirugia.nombre == datos.TIPO).scalar(),
+            "paciente": db.query(models.Paciente.id).order_by(models.Paciente.id).limit(1).scalar(),
+        }
+    finally:
+        db.close()
+    engine.dispose()
+    return create_access_token({"sub": datos.USUARIO}), ids, escala
+
+
+def esperar_servidor():
+    import httpx
+    for _ in range(150):
+        try:
+            httpx.get(f"http://127.0.0.1:{args.puerto}/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("El servidor no levantó")
+
+
+def imprimir(reporte, anterior=None):
+    t = reporte["totales"]
+    print(f"🏁 patrón {args.patron}: {args.tableros} tableros, {args.dashboards} dashboards, "
+          f"{args.segundos:.0f}s (x{args.acelerar:g})")
+    print(f"   total {t['rps']} req/s, {t['errores']} errores, {t['sentencias_sql_por_s']} sentencias SQL/s")
+    previos = (anterior or {}).get("endpoints", {})
+    for endpoint, e in reporte["endpoints"].items():
+        linea = (f"   {endpoint:38} {e['rps']:8} req/s  p50={e['p50_ms']}ms p95={e['p95_ms']}ms "
+                 f"p99={e['p99_ms']}ms  errores={e['errores']}")
+        if endpoint in previos:
+            linea += f"  (p95 antes {previos[endpoint]['p95_ms']}ms)"
+        print(linea)
+    if anterior:
+        a = anterior["totales"]
+        print(f"   vs {args.comparar}: {a['rps']} → {t['rps']} req/s, "
+              f"{a['sentencias_sql_por_s']} → {t['sentencias_sql_por_s']} sentencias SQL/s")
+
+
+def main():
+    url = args.db or f"sqlite:///{tempfile.mkdtemp()}/carga.db"
+    token, ids, escala = preparar(url)
+
+    entorno = dict(os.environ, DATABASE_URL=url)
+    entorno.pop("METRICAS_TOKEN", None)
+    hijo = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--servidor", "--puerto", str(args.puerto)],
+        cwd=RAIZ, env=entorno
+    )
+    try:
+        esperar_servidor()
+        resultado = asyncio.run(cargar(token, ids))
+    finally:
+        hijo.terminate()
+        hijo.wait()
+
+    parametros = {k: v for k, v in vars(args).items() if k not in ("servidor", "salida", "comparar")}
+    parametros["db"] = "postgresql" if url.startswith("postgresql") else "sqlite"
+    reporte = {"fecha": datetime.now().isoformat(timespec="seconds"), "parametros": parametros,
+               "escala": escala, **resultado}
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar) as f:
+            anterior = json.load(f)
+    imprimir(reporte, anterior)
+
+    salida = args.salida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"carga_{args.patron}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"📄 Reporte: {salida}")
+
+
+if __name__ == "__main__":
+    servidor() if args.servidor else main()
@@ -0,0 +1,189 @@
+"""
+Benchmark de concurrencia: modo de BD sync vs async (DB_ASYNC).
+
+Levanta la API dos veces (DB_ASYNC=0 y DB_ASYNC=1) sobre la misma BD y
+la carga con muchos clientes concurrentes que hacen lo que hace el front:
+tablero, lista de cirugías del día y pabellones. Para que se note el costo
+de esperar a una BD remota (Azure), en SQLite se agrega una latencia
+artificial por sentencia que ocupa el hilo que ejecuta, igual que la red.
+
+    python benchmarks/concurrencia_db.py                          # SQLite temporal
+    python benchmarks/concurrencia_db.py --latencia-ms 50 --clientes 300
+    python benchmarks/concurrencia_db.py --db postgresql://...    # latencia real
+
+En ambos modos el pool de conexiones es igual de grande (--pool): así el
+límite lo pone el modo (hilos vs. event loop) y no el pool.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, time as hora
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+parser = argparse.ArgumentParser(description="Benchmark sync vs async de la capa de BD")
+parser.add_argument("--db", help="URL de BD (por defecto un SQLite temporal)")
+parser.add_argument("--clientes", type=int, default=50, help="clientes concurrentes")
+parser.add_argument("--segundos", type=float, default=10)
+parser.add_argument("--latencia-ms", type=float, default=20, help="latencia simulada por sentencia (solo SQLite)")
+parser.add_argument("--pool", type=int, default=200, help="conexiones del pool en ambos modos")
+parser.add_argument("--puerto", type=int, default=8790)
+parser.add_argument("--salida", help="guardar el resultado en JSON")
+parser.add_argument("--servidor", choices=["sync", "async"], help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+# ------------------------------------------------------
+# Proceso hijo: la API en un modo
+# ------------------------------------------------------
+def servidor():
+    os.environ["DB_ASYNC"] = "1" if args.servidor == "async" else "0"
+    os.environ["SCHEDULER_ESTADOS"] = "0"
+    os.environ["DB_POOL_SIZE"] = str(args.pool)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+
+    from sqlalchemy import event
+    from app.db import database
+
+    url = os.environ["DATABASE_URL"]
+
+    if url.startswith("sqlite") and args.latencia_ms > 0:
+        demora = args.latencia_ms / 1000
+
+        # El trace callback de sqlite3 corre en el hilo que ejecuta la
+        # sentencia: en sync un worker del threadpool, en async el hilo
+        # de aiosqlite. El event loop nunca duerme.
+        @event.listens_for(database.engine, "connect")
+        def latencia_sync(conexion, _):
+            conexion.set_trace_callback(lambda _: time.sleep(demora))
+
+        if database.DB_ASYNC:
+            @event.listens_for(database.async_engine.sync_engine, "connect")
+            def latencia_async(conexion, _):
+                crudo = conexion.driver_connection
+                conexion.await_(crudo._execute(lambda: crudo._conn.set_trace_callback(lambda _: time.sleep(demora))))
+
+    import uvicorn
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto, log_level="warning")
+
+
+# ------------------------------------------------------
+# Proceso padre: datos, carga y reporte
+# ------------------------------------------------------
+def preparar(url):
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SCHEDULER_ESTADOS", "0")
+    from app.db.database import SessionLocal, engine
+    from app.db import models
+    from app.db.migraciones import aplicar_migraciones
+    from app.core.security import create_access_token, pwd_context
+
+    models.Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+
+    db = SessionLocal()
+    admin = db.query(models.Usuario).filter(models.Usuario.username == "bench_admin").first()
+    if not admin:
+        admin = models.Usuario(username="bench_admin", nombre_completo="Bench", rol="Admin",
+                               hashed_password=pwd_context.hash("bench"))
+        doctor = models.Usuario(username="bench_doc", nombre_completo="Dr Bench", rol="Doctor")
+        paciente = models.Paciente(nombre="Paciente Bench")
+        tipo = models.TipoCirugia(nombre=f"Bench {time.time()}", duracion_estimada=60)
+        pabellones = [models.Pabellon(nombre=f"Bench {i}") for i in range(6)]
+        db.add_all([admin, doctor, paciente, tipo] + pabellones)
+        db.flush()
+        db.add_all([
+            models.Cirugia(paciente_id=paciente.id, doctor_id=doctor.id, tipo_cirugia_id=tipo.id,
+                           pabellon_id=p.id, fecha=date.today(), hora_inicio=hora(8 + 2 * i),
+                           duracion_programada=60, extra_time=0, es_aseo=False)
+            for p in pabellones for i in range(6)
+        ])
+        db.commit()
+    db.close()
+    return create_access_token({"sub": "bench_admin"})
+
+
+async def cargar(token):
+    import httpx
+
+    base = f"http://127.0.0.1:{args.puerto}"
+    rutas = ["/cirugias/tablero", f"/cirugias/?fecha={date.today()}", "/pabellones/"]
+    latencias, errores = [], 0
+    fin = time.perf_counter() + args.segundos
+
+    async with httpx.AsyncClient(base_url=base, timeout=60, headers={"Authorization": f"Bearer {token}"},
+                                 limits=httpx.Limits(max_connections=args.clientes)) as http:
+        async def cliente(i):
+            nonlocal errores
+            n = i
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    r = await http.get(rutas[n % len(rutas)])
+                    if r.status_code != 200:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append(time.perf_counter() - inicio)
+                n += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(i) for i in range(args.clientes)))
+        duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    pct = lambda p: round(latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000, 1) if latencias else None
+    return {"requests": len(latencias), "errores": errores, "rps": round(len(latencias) / duracion, 1),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+
+def esperar_servidor():
+    import httpx
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{args.puerto}/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("El servidor no levantó")
+
+
+def main():
+    url = args.db or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    token = preparar(url)
+
+    resultados = {}
+    for modo in ("sync", "async"):
+        hijo = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--servidor", modo, "--puerto", str(args.puerto),
+             "--pool", str(args.pool), "--latencia-ms", str(args.latencia_ms)],
+            cwd=RAIZ, env=dict(os.environ, DATABASE_URL=url)
+        )
+        try:
+            esperar_servidor()
+            asyncio.run(cargar(token))   # calentamiento (conexiones, caché de principal)
+            resultados[modo] = asyncio.run(cargar(token))
+        finally:
+            hijo.terminate()
+            hijo.wait()
+
+    print(f"🏁 {args.clientes} clientes x {args.segundos}s, latencia simulada {args.latencia_ms}ms, pool {args.pool}")
+    for modo, r in resultados.items():
+        print(f"   {modo:5}  {r['rps']:8} req/s  p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms  errores={r['errores']}")
+    if resultados["sync"]["rps"]:
+        print(f"   ganancia async: x{resultados['async']['rps'] / resultados['sync']['rps']:.2f} en throughput")
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    servidor() if args.servidor else main()
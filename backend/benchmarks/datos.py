@@ -0,0 +1,126 @@
+"""
+Datos sintéticos para los benchmarks y la prueba de carga.
+
+Siembra pabellones, doctores, pacientes, un tipo de cirugía y N cirugías
+repartidas en días consecutivos que terminan después de hoy: cada pabellón
+tiene SLOTS_POR_DIA cirugías por día (inicio cada 80 min desde las 08:00),
+así que no hay solapamientos y el día de hoy siempre tiene agenda. Los
+estados son coherentes con la hora actual (pasadas FINALIZADA, en curso
+EN_CURSO, futuras PROGRAMADA); `vencidas` deja algunas pasadas en
+PROGRAMADA para que las transiciones automáticas tengan trabajo.
+
+Inserta con INSERT masivos (como la importación): 1M de filas en SQLite
+toma del orden de un minuto.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import insert, func, select
+
+from app.db import models
+from app.db.models import EstadoCirugia
+from app.db.migraciones import aplicar_migraciones
+from app.core.agenda import TIEMPO_ASEO
+from app.core.security import get_password_hash
+from app.core.texto import plegar
+
+SLOTS_POR_DIA = 10
+DURACION = 60
+PASO = timedelta(minutes=DURACION + TIEMPO_ASEO + 5)
+LOTE = 10_000
+
+USUARIO = "carga_admin"
+TIPO = "Cirugía de carga"
+CLAVE = "carga"
+
+
+def preparar_esquema(engine):
+    models.Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+
+
+def sembrado(db) -> bool:
+    return db.query(models.Usuario.id).filter(models.Usuario.username == USUARIO).first() is not None
+
+
+def sembrar(session_factory, cirugias=1000, pabellones=12, pacientes=2000, doctores=20, vencidas=0, semilla=1):
+    """Siembra la BD (una sola vez: si ya está sembrada no hace nada) y devuelve un resumen."""
+    azar = random.Random(semilla)
+    db = session_factory()
+    try:
+        if not sembrado(db):
+            _sembrar(db, azar, cirugias, pabellones, pacientes, doctores, vencidas)
+        return {
+            "cirugias": db.scalar(select(func.count()).select_from(models.Cirugia)),
+            "pabellones": db.scalar(select(func.count()).select_from(models.Pabellon)),
+            "pacientes": db.scalar(select(func.count()).select_from(models.Paciente)),
+        }
+    finally:
+        db.close()
+
+
+def _sembrar(db, azar, cirugias, pabellones, pacientes, doctores, vencidas):
+    db.add(models.Usuario(username=USUARIO, nombre_completo="Admin Carga", rol="Admin",
+                          hashed_password=get_password_hash(CLAVE)))
+    db.add_all([models.Usuario(username=f"carga_doc{i}", nombre_completo=f"Dr Carga {i}", rol="Doctor")
+                for i in range(doctores)])
+    db.add_all([models.Pabellon(nombre=f"Pabellón {i + 1}", es_compleja=(i % 4 == 0)) for i in range(pabellones)])
+    tipo = models.TipoCirugia(nombre=TIPO, duracion_estimada=DURACION)
+    db.add(tipo)
+    db.flush()
+
+    for inicio in range(0, pacientes, LOTE):
+        db.execute(insert(models.Paciente), [
+            {"nombre": f"Paciente {i}", "nombre_normalizado": plegar(f"Paciente {i}")}
+            for i in range(inicio, min(pacientes, inicio + LOTE))
+        ])
+
+    ids_pabellones = [p for (p,) in db.query(models.Pabellon.id).order_by(models.Pabellon.id)]
+    ids_doctores = [u for (u,) in db.query(models.Usuario.id).filter(models.Usuario.rol == "Doctor")]
+    ids_pacientes = [p for (p,) in db.query(models.Paciente.id)]
+
+    # Días necesarios; hoy queda cerca del final (la mayor parte es historia)
+    por_dia = SLOTS_POR_DIA * len(ids_pabellones)
+    dias = max(1, -(-cirugias // por_dia))
+    primer_dia = date.today() - timedelta(days=max(0, dias - 2))
+    ahora = datetime.now()
+    seq = models.cambio_pendiente(db)
+
+    filas, pendientes_vencidas = [], vencidas
+    for n in range(cirugias):
+        dia, resto = divmod(n, por_dia)
+        slot, indice_pabellon = divmod(resto, len(ids_pabellones))
+        inicio_ts = datetime.combine(primer_dia + timedelta(days=dia), time(8)) + slot * PASO
+        fin_ts = inicio_ts + timedelta(minutes=DURACION)
+
+        if fin_ts <= ahora:
+            estado = EstadoCirugia.FINALIZADA
+            if pendientes_vencidas and inicio_ts.date() == ahora.date():
+                estado, pendientes_vencidas = EstadoCirugia.PROGRAMADA, pendientes_vencidas - 1
+        elif inicio_ts <= ahora:
+            estado = EstadoCirugia.EN_CURSO
+        else:
+            estado = EstadoCirugia.PROGRAMADA
+
+        filas.append({
+            "paciente_id": azar.choice(ids_pacientes) if ids_pacientes else None,
+            "doctor_id": azar.choice(ids_doctores) if ids_doctores else None,
+            "pabellon_id": ids_pabellones[indice_pabellon], "tipo_cirugia_id": tipo.id,
+            "fecha": inicio_ts.date(), "hora_inicio": inicio_ts.time(),
+            "duracion_programada": DURACION, "extra_time": 0, "estado": estado, "es_aseo": False,
+            "inicio_ts": inicio_ts, "fin_estimado_ts": fin_ts, "cambio_seq": seq, "actualizado_en": ahora,
+        })
+        if len(filas) >= LOTE:
+            db.execute(insert(models.Cirugia), filas)
+            filas = []
+    if filas:
+        db.execute(insert(models.Cirugia), filas)
+
+    # Vencidas de días anteriores si hoy no alcanzó
+    if pendientes_vencidas:
+        sub = (select(models.Cirugia.id)
+               .where(models.Cirugia.estado == EstadoCirugia.FINALIZADA)
+               .order_by(models.Cirugia.inicio_ts.desc()).limit(pendientes_vencidas))
+        db.query(models.Cirugia).filter(models.Cirugia.id.in_(sub)).update(
+            {models.Cirugia.estado: EstadoCirugia.PROGRAMADA}, synchronize_session=False)
+    db.commit()
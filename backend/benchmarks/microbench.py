@@ -0,0 +1,294 @@
+"""
+Microbenchmarks de las rutas calientes de la agenda.
+
+Mide, a varios tamaños de datos (por defecto 100, 10k y 1M cirugías):
+
+  actualizar_estados   cirugias.actualizar_estados_automaticos (con filas vencidas
+                       que se reponen antes de cada repetición)
+  buscar_conflictos    agenda.buscar_conflictos: el chequeo de choques de crear_cirugia
+  solapamiento_lineal  hay_solapamiento contra todos los intervalos (el loop antiguo)
+  indice_conflictos    IndiceAgenda.conflictos con todos los intervalos en una clave
+  calcular_fin         N llamadas a cirugias.calcular_fin
+  cirugia_to_out       N filas → cirugia_to_out → JSON (serialización de listados)
+  resumen_dashboard    dashboard.calcular_resumen (agregado del /dashboard/resumen)
+
+Cada caso se repite hasta juntar --tiempo segundos y al menos
+MIN_REPETICIONES veces (una sola medición no alcanza para comparar), y se
+reporta la mediana. Con --comparar (por defecto contra
+benchmarks/baselines/microbench.json) falla con código 1 si algún caso es
+más lento que su baseline por más de --umbral:
+
+    python benchmarks/microbench.py                                 # todo, compara con el baseline
+    python benchmarks/microbench.py --tamanos 100,10000 --solo calcular_fin,cirugia_to_out
+    python benchmarks/microbench.py --guardar-baseline              # reemplaza el baseline
+
+Los baselines dependen de la máquina: se regeneran al cambiar de equipo.
+Las BD de cada tamaño (SQLite, ver datos.py) se guardan en --datos y se
+reutilizan durante el día: sembrar 1M de filas toma alrededor de un minuto.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as hora, timedelta
+from typing import List, NamedTuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, DIRECTORIO)
+
+BASELINE = os.path.join(DIRECTORIO, "baselines", "microbench.json")
+DATOS = os.path.join(tempfile.gettempdir(), "microbench_pabellones")
+
+parser = argparse.ArgumentParser(description="Microbenchmarks de las rutas calientes de la agenda")
+parser.add_argument("--tamanos", default="100,10000,1000000", help="cirugías por caso, separadas por coma")
+parser.add_argument("--solo", help="casos a correr, separados por coma")
+parser.add_argument("--tiempo", type=float, default=1.0, help="segundos de repeticiones por caso")
+parser.add_argument("--umbral", type=float, default=0.30, help="regresión tolerada (0.30 = 30%% más lento)")
+parser.add_argument("--comparar", default=BASELINE, help="baseline contra el cual comparar ('' para no comparar)")
+parser.add_argument("--guardar-baseline", action="store_true", help="guardar el resultado como baseline")
+parser.add_argument("--salida", help="guardar también el resultado en este JSON")
+parser.add_argument("--datos", default=DATOS, help="directorio de las BD sembradas")
+
+# La app crea su engine al importarse: que no toque la BD de desarrollo
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SCHEDULER_ESTADOS", "0")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints.cirugias import actualizar_estados_automaticos, calcular_fin, cirugia_to_out, hay_solapamiento
+from app.api.endpoints.dashboard import calcular_resumen
+from app.core import agenda
+from app.db import models
+from app.db.migraciones import agregar_columnas_faltantes
+from app.db.models import EstadoCirugia
+from app.schemas.cirugia import CirugiaOut
+import datos
+
+VENCIDAS = 100        # filas que actualizar_estados encuentra vencidas en cada repetición
+MIN_REPETICIONES = 3
+MAX_REPETICIONES = 1000
+
+
+# ------------------------------------------------------
+# Datos
+# ------------------------------------------------------
+_sesiones = {}
+
+
+def sesiones(n: int):
+    """sessionmaker de una BD SQLite con n cirugías (sembrada una vez por día)."""
+    if n not in _sesiones:
+        os.makedirs(DATOS, exist_ok=True)
+        ruta = os.path.join(DATOS, f"cirugias_{n}_{date.today():%Y%m%d}.db")
+        engine = create_engine(f"sqlite:///{ruta}", connect_args={"check_same_thread": False})
+        # Basta el esquema de los modelos más los índices nuevos en una BD ya sembrada
+        # (el resto de las migraciones usa el SessionLocal de la app)
+        models.Base.metadata.create_all(bind=engine)
+        agregar_columnas_faltantes(engine)
+        fabrica = sessionmaker(bind=engine, autoflush=False)
+        inicio = time.perf_counter()
+        escala = datos.sembrar(fabrica, cirugias=n, pacientes=min(n, 50_000))
+        print(f"🌱 BD de {n} cirugías lista en {time.perf_counter() - inicio:.1f}s ({escala['cirugias']} filas)")
+        _sesiones[n] = fabrica
+    return _sesiones[n]
+
+
+class FilaCirugia(NamedTuple):
+    """Lo que cirugia_to_out lee de una cirugía, sin el costo de una instancia ORM."""
+    id: int
+    paciente_id: int
+    doctor_id: int
+    pabellon_id: int
+    tipo_cirugia_id: int
+    fecha: date
+    hora_inicio: hora
+    duracion_programada: int
+    extra_time: int
+    estado: EstadoCirugia
+
+
+def filas_en_memoria(n: int):
+    hoy = date.today()
+    return [
+        FilaCirugia(i, 1, 1, i % 12 + 1, 1, hoy + timedelta(days=i // 120), hora(8 + i % 10),
+                    60, i % 3 * 10, EstadoCirugia.PROGRAMADA)
+        for i in range(n)
+    ]
+
+
+def intervalos_en_memoria(n: int):
+    # n ocupaciones consecutivas de 90 min (aseo incluido) en una misma clave
+    base = datetime.combine(date.today(), hora(0))
+    return [(base + timedelta(minutes=90 * i), base + timedelta(minutes=90 * i + 90), i) for i in range(n)]
+
+
+# ------------------------------------------------------
+# Casos: cada uno prepara y devuelve (ejecutar, reponer)
+# `reponer` corre antes de cada repetición y no se mide.
+# ------------------------------------------------------
+CASOS = {}
+
+
+def caso(nombre):
+    def registrar(funcion):
+        CASOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+@caso("actualizar_estados")
+def caso_actualizar_estados(n):
+    db = sesiones(n)()
+    ahora = datetime.now()
+    vencidas = [i for (i,) in db.execute(
+        select(models.Cirugia.id).where(models.Cirugia.fin_estimado_ts <= ahora)
+        .order_by(models.Cirugia.inicio_ts.desc()).limit(VENCIDAS)
+    )]
+
+    def reponer():
+        if vencidas:
+            db.execute(update(models.Cirugia).where(models.Cirugia.id.in_(vencidas))
+                       .values(estado=EstadoCirugia.PROGRAMADA).execution_options(synchronize_session=False))
+            db.commit()
+
+    return (lambda: actualizar_estados_automaticos(db)), reponer
+
+
+@caso("buscar_conflictos")
+def caso_buscar_conflictos(n):
+    db = sesiones(n)()
+    pabellon_id = db.scalar(select(models.Cirugia.pabellon_id).limit(1))
+    return (lambda: agenda.buscar_conflictos(db, pabellon_id, date.today(), hora(10), 60)), None
+
+
+@caso("solapamiento_lineal")
+def caso_solapamiento_lineal(n):
+    intervalos = intervalos_en_memoria(n)
+    ini, fin = intervalos[n // 2][0], intervalos[n // 2][1]
+    return (lambda: [i for a, b, i in intervalos if hay_solapamiento(ini, fin, a, b)]), None
+
+
+@caso("indice_conflictos")
+def caso_indice_conflictos(n):
+    intervalos = intervalos_en_memoria(n)
+    indice = agenda.IndiceAgenda()
+    for a, b, i in intervalos:
+        indice.agregar("clave", a, b, i)
+    ini, fin, _ = intervalos[n // 2]
+    return (lambda: indice.conflictos("clave", ini, fin)), None
+
+
+@caso("calcular_fin")
+def caso_calcular_fin(n):
+    filas = filas_en_memoria(n)
+    return (lambda: [calcular_fin(f.fecha, f.hora_inicio, f.duracion_programada, f.extra_time) for f in filas]), None
+
+
+@caso("cirugia_to_out")
+def caso_cirugia_to_out(n):
+    filas = filas_en_memoria(n)
+    adaptador = TypeAdapter(List[CirugiaOut])
+    return (lambda: adaptador.dump_json([cirugia_to_out(f) for f in filas])), None
+
+
+@caso("resumen_dashboard")
+def caso_resumen_dashboard(n):
+    db = sesiones(n)()
+    return (lambda: calcular_resumen(db)), None
+
+
+# ------------------------------------------------------
+# Medición
+# ------------------------------------------------------
+def medir(ejecutar, reponer, tiempo: float = 1.0):
+    tiempos, gastado = [], 0.0
+    while len(tiempos) < MAX_REPETICIONES:
+        if reponer:
+            reponer()
+        inicio = time.perf_counter()
+        ejecutar()
+        t = time.perf_counter() - inicio
+        tiempos.append(t)
+        gastado += t
+        if gastado >= tiempo and len(tiempos) >= MIN_REPETICIONES:
+            break
+    return {
+        "mediana_ms": round(statistics.median(tiempos) * 1000, 4),
+        "minimo_ms": round(min(tiempos) * 1000, 4),
+        "repeticiones": len(tiempos),
+    }
+
+
+def comparar(resultados, baseline, umbral: float = 0.30):
+    """Lista de (clave, actual, baseline, razón) de los casos que empeoraron más del umbral."""
+    regresiones = []
+    for clave, r in resultados.items():
+        previo = baseline.get(clave)
+        # Con pocas repeticiones en el baseline la mediana es ruido: se comparan mínimos
+        metrica = "mediana_ms" if previo and previo.get("repeticiones", 0) >= MIN_REPETICIONES else "minimo_ms"
+        if not previo or not previo[metrica]:
+            continue
+        razon = r[metrica] / previo[metrica]
+        r["vs_baseline"] = round(razon, 2)
+        if razon > 1 + umbral:
+            regresiones.append((clave, r[metrica], previo[metrica], razon))
+    return regresiones
+
+
+def main():
+    global DATOS
+    args = parser.parse_args()
+    DATOS = args.datos
+    tamanos = [int(t) for t in args.tamanos.split(",")]
+    nombres = args.solo.split(",") if args.solo else list(CASOS)
+    desconocidos = [n for n in nombres if n not in CASOS]
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(CASOS)})")
+
+    resultados = {}
+    for n in tamanos:
+        for nombre in nombres:
+            ejecutar, reponer = CASOS[nombre](n)
+            clave = f"{nombre}@{n}"
+            resultados[clave] = medir(ejecutar, reponer, args.tiempo)
+            print(f"   {clave:32} {resultados[clave]['mediana_ms']:>12} ms  (x{resultados[clave]['repeticiones']})")
+
+    regresiones = []
+    if args.comparar and os.path.exists(args.comparar) and not args.guardar_baseline:
+        with open(args.comparar) as f:
+            regresiones = comparar(resultados, json.load(f)["resultados"], args.umbral)
+
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "procesador": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+        "resultados": resultados,
+    }
+    destinos = [args.salida] if args.salida else []
+    if args.guardar_baseline:
+        destinos.append(BASELINE)
+    for destino in destinos:
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        with open(destino, "w") as f:
+            json.dump(reporte, f, indent=2)
+        print(f"📄 Guardado: {destino}")
+
+    if regresiones:
+        print(f"❌ {len(regresiones)} regresión(es) sobre el umbral de {args.umbral:.0%}:")
+        for clave, actual, previo, razon in regresiones:
+            print(f"   {clave:32} {previo} → {actual} ms  (x{razon:.2f})")
+        sys.exit(1)
+    if args.comparar and os.path.exists(args.comparar) and not args.guardar_baseline:
+        print(f"✅ Sin regresiones sobre el umbral de {args.umbral:.0%} respecto de {args.comparar}")
+
+
+if __name__ == "__main__":
+    main()
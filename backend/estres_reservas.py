@@ -0,0 +1,252 @@
+"""
+Chequeo automático de reservas concurrentes (sin reservas dobles).
+
+Lanza muchos hilos que compiten por los mismos horarios (pocas horas
+posibles, pocos pabellones) usando el mismo código que los endpoints:
+crear (POST /cirugias/), reprogramar (PUT /cirugias/{id}), mover de
+pabellón (PATCH /cirugias/{id}) y cancelar/reactivar (PATCH
+/cirugias/{id}/estado: al cancelar el hueco se puede volver a reservar, y
+reactivar debe chocar). Después de cada ronda verifica que NO haya dos
+cirugías activas solapadas en un pabellón.
+
+En SQLite las rondas alternan entre las franjas normales de bloqueo_agenda
+y una sola franja para todas las claves (lock striping con colisiones:
+claves distintas comparten lock), que es el caso que debe seguir siendo
+correcto y sin deadlocks.
+
+    python estres_reservas.py                       # SQLite temporal, 6 rondas
+    python estres_reservas.py --rondas 20 --hilos 64
+    python estres_reservas.py --db postgresql://... # contra Postgres
+    python estres_reservas.py --sin-bloqueo         # control negativo: debe fallar
+
+Sale con código 1 si encuentra reservas dobles, si algún hilo termina con
+una excepción inesperada o queda colgado, o si ninguna reserva se aceptó
+(el chequeo no habría probado nada).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time as reloj
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+parser = argparse.ArgumentParser(description="Chequeo de reservas concurrentes")
+parser.add_argument("--db", help="URL de BD (por defecto un SQLite temporal)")
+parser.add_argument("--rondas", type=int, default=6)
+parser.add_argument("--hilos", type=int, default=32)
+parser.add_argument("--intentos", type=int, default=40, help="operaciones por hilo y ronda")
+parser.add_argument("--pabellones", type=int, default=4)
+parser.add_argument("--espera", type=float, default=120, help="segundos antes de dar un hilo por colgado")
+parser.add_argument("--sin-bloqueo", action="store_true", help="desactiva bloqueo_agenda (control negativo)")
+args = parser.parse_args()
+
+if args.db:
+    os.environ["DATABASE_URL"] = args.db
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/estres.db"
+os.environ.setdefault("SCHEDULER_ESTADOS", "0")
+
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.db.migraciones import aplicar_migraciones
+from app.api.endpoints import cirugias
+from app.core import bloqueos
+from app.core.agenda import intervalo_ocupado, ESTADOS_LIBRES
+from app.db.models import EstadoCirugia
+from app.schemas.cirugia import CirugiaCreate, CirugiaUpdate
+
+models.Base.metadata.create_all(bind=engine)
+aplicar_migraciones(engine)
+
+FECHA = date.today() + timedelta(days=365)
+
+
+def preparar():
+    db = SessionLocal()
+    doctor = models.Usuario(username=f"estres_{random.random()}", nombre_completo="Dr Estrés", rol="Doctor")
+    paciente = models.Paciente(nombre="Paciente Estrés")
+    tipo = db.query(models.TipoCirugia).first() or models.TipoCirugia(nombre="Estrés", duracion_estimada=60)
+    pabellones = [models.Pabellon(nombre=f"Estrés {random.random()}") for _ in range(args.pabellones)]
+    db.add_all([doctor, paciente, tipo] + pabellones)
+    db.commit()
+    ids = dict(doctor=doctor.id, paciente=paciente.id, tipo=tipo.id, pabellones=[p.id for p in pabellones])
+    db.close()
+    return ids
+
+
+def limpiar(ids):
+    db = SessionLocal()
+    db.query(models.Cirugia).filter(models.Cirugia.pabellon_id.in_(ids["pabellones"])).delete()
+    db.commit()
+    db.close()
+
+
+OPERACIONES = ["crear", "crear", "reprogramar", "mover", "cancelar", "reactivar"]
+
+
+def hora_al_azar(rnd):
+    # Pocas horas posibles → muchos hilos compiten por los mismos huecos
+    return time(rnd.randrange(7, 20), rnd.choice([0, 15, 30, 45]))
+
+
+class Ronda:
+
+    def __init__(self, ids):
+        self.ids = ids
+        self._lock = threading.Lock()
+        self.resultados = Counter()
+        self.creadas = []
+        self.errores = []
+
+    def contar(self, clave):
+        with self._lock:
+            self.resultados[clave] += 1
+
+    def crear(self, db, rnd):
+        datos = CirugiaCreate(
+            paciente_id=self.ids["paciente"], doctor_id=self.ids["doctor"], tipo_cirugia_id=self.ids["tipo"],
+            pabellon_id=rnd.choice(self.ids["pabellones"]), fecha=FECHA,
+            hora_inicio=hora_al_azar(rnd), duracion_programada=rnd.choice([30, 60, 90]),
+        )
+        nueva = cirugias.crear_cirugia(datos, db)
+        with self._lock:
+            self.creadas.append(nueva.id)
+
+    def reprogramar(self, db, rnd, cirugia_id):
+        cirugias.modificar(cirugia_id, CirugiaUpdate(hora_inicio=hora_al_azar(rnd)), db)
+
+    def mover(self, db, rnd, cirugia_id):
+        cirugias.mover(cirugia_id, {"pabellon_id": rnd.choice(self.ids["pabellones"])}, db)
+
+    def cancelar(self, db, rnd, cirugia_id):
+        cirugias.estado(cirugia_id, {"nuevo_estado": EstadoCirugia.CANCELADA.value}, db)
+
+    def reactivar(self, db, rnd, cirugia_id):
+        cirugias.estado(cirugia_id, {"nuevo_estado": EstadoCirugia.PROGRAMADA.value}, db)
+
+    def trabajador(self):
+        rnd = random.Random()
+        for _ in range(args.intentos):
+            with self._lock:
+                existente = rnd.choice(self.creadas) if self.creadas else None
+            operacion = rnd.choice(OPERACIONES) if existente else "crear"
+            db = SessionLocal()
+            try:
+                if operacion == "crear":
+                    self.crear(db, rnd)
+                else:
+                    getattr(self, operacion)(db, rnd, existente)
+                self.contar(f"{operacion}_ok")
+            except HTTPException:
+                self.contar(f"{operacion}_choque")
+                db.rollback()
+            except OperationalError:
+                self.contar("bd_ocupada")   # SQLite: "database is locked"
+                db.rollback()
+            except Exception as e:
+                with self._lock:
+                    self.errores.append(f"{operacion}: {e!r}")
+                db.rollback()
+            finally:
+                db.close()
+
+    def correr(self):
+        hilos = [threading.Thread(target=self.trabajador, daemon=True) for _ in range(args.hilos)]
+        for h in hilos: h.start()
+        limite = reloj.monotonic() + args.espera
+        for h in hilos: h.join(max(0.0, limite - reloj.monotonic()))
+        return sum(h.is_alive() for h in hilos)
+
+
+def reservas_dobles(ids):
+    db = SessionLocal()
+    filas = db.query(models.Cirugia).filter(
+        models.Cirugia.fecha == FECHA,
+        models.Cirugia.pabellon_id.in_(ids["pabellones"]),
+        models.Cirugia.estado.notin_(ESTADOS_LIBRES)
+    ).all()
+    db.close()
+
+    dobles = []
+    por_pabellon = {}
+    for c in filas:
+        por_pabellon.setdefault(c.pabellon_id, []).append(
+            intervalo_ocupado(c.fecha, c.hora_inicio, c.duracion_programada, c.extra_time) + (c.id,)
+        )
+    for intervalos in por_pabellon.values():
+        intervalos.sort()
+        # Contra el que termina más tarde de los anteriores, no solo el vecino
+        fin, previo = None, None
+        for ini, termino, cid in intervalos:
+            if fin is not None and ini < fin:
+                dobles.append((previo, cid))
+            if fin is None or termino > fin:
+                fin, previo = termino, cid
+    return len(filas), dobles
+
+
+@contextmanager
+def franjas(cantidad):
+    """Reemplaza temporalmente las franjas de bloqueo de SQLite."""
+    originales = bloqueos.FRANJAS, bloqueos._franjas
+    bloqueos.FRANJAS, bloqueos._franjas = cantidad, [threading.Lock() for _ in range(cantidad)]
+    try:
+        yield
+    finally:
+        bloqueos.FRANJAS, bloqueos._franjas = originales
+
+
+def main():
+    if args.sin_bloqueo:
+        @contextmanager
+        def sin_bloqueo(db, *claves):
+            yield
+        cirugias.bloqueo_agenda = sin_bloqueo
+
+    ids = preparar()
+    print(f"🏥 {args.rondas} rondas de {args.hilos} hilos x {args.intentos} operaciones sobre "
+          f"{args.pabellones} pabellones ({engine.dialect.name}, bloqueo={'NO' if args.sin_bloqueo else 'SI'})")
+
+    fallas, aceptadas = [], 0
+    for numero in range(1, args.rondas + 1):
+        # Rondas pares: todas las claves en una sola franja (solo aplica a SQLite)
+        cantidad = 1 if numero % 2 == 0 else bloqueos.FRANJAS
+        limpiar(ids)
+        ronda = Ronda(ids)
+        inicio = reloj.perf_counter()
+        with franjas(cantidad):
+            colgados = ronda.correr()
+        duracion = reloj.perf_counter() - inicio
+        total, dobles = reservas_dobles(ids)
+        aceptadas += ronda.resultados["crear_ok"]
+
+        detalle = " ".join(f"{k}={v}" for k, v in sorted(ronda.resultados.items()))
+        print(f"   ronda {numero} (franjas={cantidad}): {detalle} activas={total} "
+              f"dobles={len(dobles)} en {duracion:.2f}s")
+        if dobles:
+            fallas.append(f"ronda {numero}: {len(dobles)} reservas dobles, p.ej. {dobles[:5]}")
+        if ronda.errores:
+            fallas.append(f"ronda {numero}: {len(ronda.errores)} excepciones inesperadas, p.ej. {ronda.errores[:3]}")
+        if colgados:
+            fallas.append(f"ronda {numero}: {colgados} hilos siguen bloqueados tras {args.espera:.0f}s (¿deadlock?)")
+            break   # los hilos colgados siguen tomando locks: las rondas siguientes no son confiables
+
+    if not aceptadas:
+        fallas.append("ninguna reserva fue aceptada: el chequeo no probó nada")
+
+    if fallas:
+        for falla in fallas:
+            print(f"❌ {falla}")
+        sys.exit(1)
+    print("✅ Sin reservas dobles.")
+
+
+if __name__ == "__main__":
+    main()
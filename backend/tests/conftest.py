@@ -0,0 +1,101 @@
+# tests/conftest.py
+#
+# La app crea su engine al importarse: la BD de pruebas (un SQLite
+# temporal) y las opciones se fijan ANTES de importar cualquier módulo de
+# `app`. Cada test parte con el esquema recreado y las cachés de proceso
+# vacías.
+
+import os
+import tempfile
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="pabellones_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DIRECTORIO}/pruebas.db"
+os.environ["SCHEDULER_ESTADOS"] = "0"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.db.migraciones import aplicar_migraciones
+from app.core import busqueda, delta
+from app.core.catalogos import catalogos
+from app.core.principales import principales
+from app.core.resumen import resumen
+from app.core.security import create_access_token, get_password_hash
+
+CLAVE = "1234"
+MANANA = date.today() + timedelta(days=1)
+
+
+def token(username: str) -> str:
+    return create_access_token({"sub": username})
+
+
+def cabeceras(username: str = "admin") -> dict:
+    return {"Authorization": f"Bearer {token(username)}"}
+
+
+@pytest.fixture
+def bd():
+    """Esquema nuevo con datos mínimos; devuelve los ids sembrados."""
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+
+    principales.limpiar()
+    busqueda.indice.invalidar()
+    resumen.invalidar()
+    delta._proxima_purga = 0.0
+
+    db = SessionLocal()
+    admin = models.Usuario(username="admin", nombre_completo="Admin", rol="Admin",
+                           hashed_password=get_password_hash(CLAVE))
+    doctor = models.Usuario(username="doc", nombre_completo="Dr House", rol="Doctor")
+    otro_doctor = models.Usuario(username="doc2", nombre_completo="Dra Grey", rol="Doctor")
+    pabellones = [models.Pabellon(nombre=f"Pabellón {i + 1}", es_compleja=(i == 0)) for i in range(3)]
+    tipo = models.TipoCirugia(nombre="Apendicectomía", duracion_estimada=60)
+    paciente = models.Paciente(nombre="Juan Pérez", rut="12.345.678-5")
+    db.add_all([admin, doctor, otro_doctor, tipo, paciente] + pabellones)
+    db.commit()
+    ids = {
+        "admin": admin.id, "doctor": doctor.id, "otro_doctor": otro_doctor.id, "tipo": tipo.id,
+        "paciente": paciente.id, "pabellones": [p.id for p in pabellones],
+    }
+    db.close()
+    catalogos.cargar(SessionLocal)
+    return ids
+
+
+@pytest.fixture
+def sesion(bd):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def cliente(bd):
+    """TestClient autenticado como admin (con el lifespan de la app)."""
+    with TestClient(app) as c:
+        c.headers.update(cabeceras("admin"))
+        yield c
+
+
+@pytest.fixture
+def cirugia(cliente, bd):
+    """Crea cirugías por la API: cirugia(hora_inicio="09:00", pabellon=0, ...)."""
+    def crear(hora_inicio="09:00", pabellon=0, fecha=MANANA, duracion=60, doctor=None, esperado=201, **extra):
+        cuerpo = dict(
+            paciente_id=bd["paciente"], doctor_id=doctor or bd["doctor"], tipo_cirugia_id=bd["tipo"],
+            pabellon_id=bd["pabellones"][pabellon], fecha=fecha.isoformat(), hora_inicio=hora_inicio,
+            duracion_programada=duracion, **extra,
+        )
+        r = cliente.post("/cirugias/", json=cuerpo)
+        assert r.status_code == esperado, r.text
+        return r.json()
+    return crear
@@ -0,0 +1,152 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.core import delta
+from app.db import models
+from app.db.database import SessionLocal
+from app.db.models import EstadoCirugia
+
+from conftest import MANANA
+
+
+def _cambios(cliente, since=0):
+    r = cliente.get(f"/cirugias/cambios?since={since}")
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _nueva(bd, hora):
+    h, m = map(int, hora.split(":"))
+    return models.Cirugia(
+        paciente_id=bd["paciente"], doctor_id=bd["doctor"], tipo_cirugia_id=bd["tipo"],
+        pabellon_id=bd["pabellones"][0], fecha=MANANA, hora_inicio=datetime.min.replace(hour=h, minute=m).time(),
+        duracion_programada=30, extra_time=0, estado=EstadoCirugia.PROGRAMADA, es_aseo=False,
+    )
+
+
+def test_cursor_avanza_con_los_cambios(cliente, cirugia):
+    a = cirugia("08:00")
+    primero = _cambios(cliente)
+    assert [c["id"] for c in primero["cirugias"]] == [a["id"]]
+
+    b = cirugia("10:00")
+    segundo = _cambios(cliente, primero["cursor"])
+    assert [c["id"] for c in segundo["cirugias"]] == [b["id"]]
+    assert segundo["cursor"] > primero["cursor"]
+    assert _cambios(cliente, segundo["cursor"])["cirugias"] == []
+
+
+def test_cambio_confirmado_despues_de_uno_posterior_se_entrega(cliente, bd, cirugia):
+    # La transacción larga escribe primero (como una importación modo=todo)
+    # y confirma después de otra; antes se numeraba al escribir, así que su
+    # número quedaba por debajo de un cursor ya entregado.
+    larga = SessionLocal()
+    x = _nueva(bd, "12:00")
+    larga.add(x)
+    larga.flush()
+    assert x.cambio_seq == models.CAMBIO_PENDIENTE
+
+    antes = _cambios(cliente)
+    assert antes["cirugias"] == []
+
+    # La otra transacción intenta escribir mientras la larga sigue abierta
+    # (en SQLite espera el lock de escritura; en PostgreSQL confirmaría antes)
+    otra = {}
+    hilo = threading.Thread(target=lambda: otra.update(c=cirugia("15:00", pabellon=1)))
+    hilo.start()
+    hilo.join(0.2)
+
+    larga.commit()
+    hilo.join(10)
+    larga.refresh(x)
+    assert x.cambio_seq > antes["cursor"]
+
+    despues = _cambios(cliente, antes["cursor"])
+    assert {c["id"] for c in despues["cirugias"]} == {x.id, otra["c"]["id"]}
+    larga.close()
+
+
+def test_numeros_en_orden_de_commit(bd, sesion):
+    primera, segunda = _nueva(bd, "08:00"), _nueva(bd, "10:00")
+    sesion.add(primera)
+    sesion.flush()
+    otra = SessionLocal()
+    otra.expire_on_commit = False
+    sesion.commit()
+    otra.add(segunda)
+    otra.commit()
+    # Sin expirar: el número definitivo se copia a los objetos de la sesión
+    assert segunda.cambio_seq > primera.cambio_seq > 0
+    otra.close()
+
+
+def test_escritura_masiva_se_numera_al_confirmar(cliente, bd, sesion):
+    sesion.add(_nueva(bd, "08:00"))
+    sesion.commit()
+    cursor = _cambios(cliente)["cursor"]
+
+    seq = models.cambio_pendiente(sesion)
+    sesion.execute(update(models.Cirugia).values(extra_time=15, cambio_seq=seq))
+    sesion.commit()
+
+    cambios = _cambios(cliente, cursor)
+    assert [c["extra_time"] for c in cambios["cirugias"]] == [15]
+    assert cambios["cursor"] > cursor
+
+
+def test_rollback_no_deja_cambios_pendientes(bd, sesion):
+    sesion.add(_nueva(bd, "08:00"))
+    sesion.flush()
+    sesion.rollback()
+    assert "cambios_pendientes" not in sesion.info
+
+
+# -----------------------------
+# Tombstones y horizonte
+# -----------------------------
+def _eliminar_y_envejecer(cliente, sesion, cirugia_id, dias):
+    assert cliente.delete(f"/cirugias/{cirugia_id}").status_code == 204
+    sesion.execute(update(models.CirugiaEliminada).where(models.CirugiaEliminada.cirugia_id == cirugia_id)
+                   .values(eliminado_en=datetime.now() - timedelta(days=dias)))
+    sesion.commit()
+
+
+def test_eliminada_llega_como_tombstone(cliente, cirugia):
+    a = cirugia("08:00")
+    cursor = _cambios(cliente)["cursor"]
+    assert cliente.delete(f"/cirugias/{a['id']}").status_code == 204
+
+    cambios = _cambios(cliente, cursor)
+    assert [e["id"] for e in cambios["eliminadas"]] == [a["id"]]
+    assert not cambios["resync"]
+
+
+def test_purga_fija_el_horizonte_y_pide_resync(cliente, sesion, cirugia):
+    vieja, reciente = cirugia("08:00"), cirugia("10:00")
+    cursor_viejo = _cambios(cliente)["cursor"]
+    _eliminar_y_envejecer(cliente, sesion, vieja["id"], delta.RETENCION_DIAS + 1)
+    _eliminar_y_envejecer(cliente, sesion, reciente["id"], 1)
+
+    assert delta.purgar_tombstones(sesion) == 1
+    horizonte = delta.horizonte(sesion)
+    assert horizonte > cursor_viejo
+
+    # Anterior al horizonte: no puede saber qué se borró, recarga todo
+    r = _cambios(cliente, cursor_viejo)
+    assert r["resync"]
+    assert [e["id"] for e in r["eliminadas"]] == [reciente["id"]]
+    assert r["cursor"] >= horizonte
+
+    # Desde el horizonte en adelante sigue siendo incremental
+    assert not _cambios(cliente, horizonte)["resync"]
+    # since=0 ya es una carga completa: no es resync
+    assert not _cambios(cliente, 0)["resync"]
+
+
+def test_purga_sin_tombstones_viejos_no_mueve_el_horizonte(cliente, sesion, cirugia):
+    a = cirugia("08:00")
+    _eliminar_y_envejecer(cliente, sesion, a["id"], 1)
+    assert delta.purgar_tombstones(sesion) == 0
+    assert delta.horizonte(sesion) == 0
@@ -0,0 +1,62 @@
+import logging
+from collections import Counter
+
+import pytest
+
+from app.core import diagnostico
+from app.core.diagnostico import presupuesto_consultas
+
+from conftest import MANANA
+
+
+@pytest.fixture
+def agenda(cliente, bd):
+    """Cirugías en los 3 pabellones, con pacientes y doctores distintos (un N+1 se notaría)."""
+    pacientes = [cliente.post("/pacientes/", json={"nombre": f"Paciente {i}"}).json()["id"] for i in range(4)]
+    doctores = [bd["doctor"], bd["otro_doctor"]]
+    for i in range(8):
+        r = cliente.post("/cirugias/", json=dict(
+            paciente_id=pacientes[i % 4], doctor_id=doctores[i % 2], tipo_cirugia_id=bd["tipo"],
+            pabellon_id=bd["pabellones"][i % 3], fecha=MANANA.isoformat(), hora_inicio=f"{8 + i:02d}:00",
+            duracion_programada=45,
+        ))
+        assert r.status_code == 201, r.text
+    # Deja el principal del admin en caché: se mide solo el endpoint
+    cliente.get("/cirugias/tablero")
+
+
+def test_presupuesto_tablero(cliente, agenda):
+    with presupuesto_consultas(1):
+        r = cliente.get("/cirugias/tablero")
+    assert r.status_code == 200
+    assert sum(len(p["tasks"]) for p in r.json()) == 8
+
+
+@pytest.mark.parametrize("consulta", [
+    "", "?expand=paciente,doctor,tipo,pabellon", "?limite=3", "?fields=id,hora_inicio&expand=paciente,doctor",
+])
+def test_presupuesto_listado(cliente, agenda, consulta):
+    with presupuesto_consultas(1):
+        r = cliente.get(f"/cirugias/{consulta}")
+    assert r.status_code == 200
+    assert len(r.json()) == (3 if "limite" in consulta else 8)
+
+
+def test_presupuesto_excedido_lista_las_sentencias(cliente, agenda):
+    with pytest.raises(AssertionError, match=r"Se esperaban a lo más 0 sentencias SQL y hubo 1"):
+        with presupuesto_consultas(0):
+            cliente.get("/cirugias/tablero")
+
+
+def test_hallazgos_van_al_log(caplog):
+    traza = diagnostico._Traza({"method": "GET", "path": "/cirugias/"})
+    traza.sentencias = 7
+    traza.selects = Counter({"SELECT * FROM pacientes WHERE id = ?": 7})
+
+    with caplog.at_level(logging.DEBUG, logger="app.core.diagnostico"):
+        diagnostico.diagnostico.cerrar_request(traza, 200, 0.01)
+
+    niveles = {r.levelno for r in caplog.records if "N+1" in r.getMessage() and "Posible" in r.getMessage()}
+    assert niveles == {logging.WARNING}
+    resumen = [r for r in caplog.records if "sentencias SQL" in r.getMessage()]
+    assert [r.levelno for r in resumen] == [logging.DEBUG]
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def test_reservas_concurrentes_sin_dobles(tmp_path):
+    # En un proceso aparte: el script fija su propia BD antes de importar la app
+    entorno = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    r = subprocess.run(
+        [sys.executable, "estres_reservas.py", "--db", f"sqlite:///{tmp_path}/estres.db",
+         "--rondas", "2", "--hilos", "16", "--intentos", "25", "--espera", "60"],
+        cwd=BACKEND, env=entorno, capture_output=True, text=True, timeout=300,
+    )
+    assert r.returncode == 0, r.stdout + r.stderr
+    assert "Sin reservas dobles" in r.stdout
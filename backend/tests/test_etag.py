@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.diagnostico import contar_consultas
+
+# (lista, cuerpo de un POST que la modifica)
+RECURSOS = {
+    "/pabellones/": {"nombre": "Pabellón nuevo", "es_compleja": False, "capacidad": 1},
+    "/tipos-cirugia/": {"nombre": "Colecistectomía", "duracion_estimada": 90},
+    "/pacientes/": {"nombre": "Ana", "rut": "11.111.111-1"},
+    "/usuarios/": {"username": "enfermera", "nombre_completo": "Enfermera", "rol": "Enfermera", "password": "x"},
+}
+
+
+@pytest.mark.parametrize("ruta", list(RECURSOS))
+def test_if_none_match_vigente_responde_304(cliente, ruta):
+    r = cliente.get(ruta)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "no-cache"
+
+    r = cliente.get(ruta, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+    assert r.content == b""
+    # También dentro de una lista de ETags, y con "*"
+    assert cliente.get(ruta, headers={"If-None-Match": f'"otro", {etag}'}).status_code == 304
+    assert cliente.get(ruta, headers={"If-None-Match": "*"}).status_code == 304
+
+
+@pytest.mark.parametrize("ruta, cuerpo", list(RECURSOS.items()))
+def test_escritura_cambia_el_etag(cliente, ruta, cuerpo):
+    antes = cliente.get(ruta)
+    assert cliente.post(ruta, json=cuerpo).status_code in (200, 201)
+
+    r = cliente.get(ruta, headers={"If-None-Match": antes.headers["etag"]})
+    assert r.status_code == 200
+    assert r.headers["etag"] != antes.headers["etag"]
+    assert len(r.json()) == len(antes.json()) + 1
+
+
+def test_escritura_no_afecta_a_otro_recurso(cliente):
+    etag = cliente.get("/pabellones/").headers["etag"]
+    cliente.post("/pacientes/", json=RECURSOS["/pacientes/"])
+    assert cliente.get("/pabellones/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_304_no_consulta_la_bd(cliente):
+    etag = cliente.get("/pacientes/").headers["etag"]
+    with contar_consultas() as conteo:
+        assert cliente.get("/pacientes/", headers={"If-None-Match": etag}).status_code == 304
+    assert conteo.total == 0
+
+
+def test_catalogos_combinados(cliente, bd):
+    r = cliente.get("/catalogos/")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert {p["id"] for p in r.json()["pabellones"]} == set(bd["pabellones"])
+    assert cliente.get("/catalogos/", headers={"If-None-Match": etag}).status_code == 304
+
+    cliente.post("/tipos-cirugia/", json=RECURSOS["/tipos-cirugia/"])
+    r = cliente.get("/catalogos/", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()["tipos_cirugia"]) == 2
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.hashing import PoolHashing
+
+from conftest import CLAVE
+
+
+@pytest.fixture
+def pool_bloqueado():
+    """Pool de 1 worker sin cola, con el worker ocupado hasta liberar()."""
+    pool = PoolHashing(workers=1, cola_max=0)
+    liberar = threading.Event()
+    ocupado = pool.enviar(liberar.wait)
+    yield pool, liberar
+    liberar.set()
+    ocupado.result(5)
+    pool._executor.shutdown()
+
+
+def test_admite_hasta_workers_mas_cola():
+    pool = PoolHashing(workers=1, cola_max=1)
+    liberar = threading.Event()
+    futuros = [pool.enviar(liberar.wait) for _ in range(2)]
+
+    with pytest.raises(HTTPException) as rechazo:
+        pool.enviar(liberar.wait)
+    assert rechazo.value.status_code == 503
+    assert int(rechazo.value.headers["Retry-After"]) >= 1
+
+    liberar.set()
+    for f in futuros:
+        f.result(5)
+    estadisticas = pool.estadisticas()
+    assert (estadisticas["en_curso"], estadisticas["completados"], estadisticas["rechazados"]) == (0, 2, 1)
+    # Con los cupos devueltos vuelve a admitir
+    assert pool.ejecutar_bloqueante(lambda: "ok") == "ok"
+
+
+def test_el_cupo_se_libera_aunque_falle():
+    pool = PoolHashing(workers=1, cola_max=0)
+
+    def falla():
+        raise ValueError("hash inválido")
+
+    with pytest.raises(ValueError):
+        pool.ejecutar_bloqueante(falla)
+    assert pool.ejecutar_bloqueante(lambda: 1) == 1
+    assert pool.estadisticas()["en_curso"] == 0
+
+
+def test_login(cliente):
+    r = cliente.post("/token", data={"username": "admin", "password": CLAVE})
+    assert r.status_code == 200
+    assert r.json()["data"]["token"]
+    assert cliente.post("/token", data={"username": "admin", "password": "otra"}).status_code == 452
+
+
+def test_login_con_pool_saturado_responde_503(cliente, pool_bloqueado, monkeypatch):
+    pool, _ = pool_bloqueado
+    monkeypatch.setattr(security, "pool_hashing", pool)
+    r = cliente.post("/token", data={"username": "admin", "password": CLAVE})
+    assert r.status_code == 503
+    assert "retry-after" in r.headers
+    # El resto de la API sigue respondiendo
+    assert cliente.get("/cirugias/tablero").status_code == 200
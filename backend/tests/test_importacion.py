@@ -0,0 +1,113 @@
+import json
+import threading
+
+import pytest
+
+from app.core import importacion
+from app.db import models
+from app.db.database import SessionLocal
+
+from conftest import MANANA
+
+
+def _fila(bd, hora, pabellon=0, **extra):
+    return dict(paciente_id=bd["paciente"], doctor_id=bd["doctor"], tipo_cirugia_id=bd["tipo"],
+                pabellon_id=bd["pabellones"][pabellon], fecha=MANANA.isoformat(), hora_inicio=hora, **extra)
+
+
+def _ndjson(filas):
+    return "\n".join(json.dumps(f) for f in filas).encode()
+
+
+def _importar(cliente, cuerpo, modo, formato="ndjson", ruta="/cirugias/bulk"):
+    r = cliente.post(f"{ruta}?modo={modo}&formato={formato}", content=cuerpo)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _cantidad():
+    db = SessionLocal()
+    n = db.query(models.Cirugia).count()
+    db.close()
+    return n
+
+
+@pytest.fixture
+def lotes_de_dos(monkeypatch):
+    original = importacion.por_lotes
+    monkeypatch.setattr(importacion, "por_lotes", lambda filas: original(filas, 2))
+
+
+def test_parcial_inserta_las_validas(cliente, bd):
+    filas = [_fila(bd, "08:00"), _fila(bd, "08:30"), _fila(bd, "10:00"), dict(_fila(bd, "12:00"), doctor_id=999)]
+    reporte = _importar(cliente, _ndjson(filas), "parcial")
+    assert reporte["confirmado"] and reporte["insertadas"] == 2
+    assert [e["linea"] for e in reporte["errores"]] == [2, 4]
+    assert _cantidad() == 2
+
+
+def test_todo_revierte_si_una_fila_falla(cliente, bd, lotes_de_dos):
+    # El choque está en un lote posterior al de la cirugía con la que choca
+    filas = [_fila(bd, "08:00"), _fila(bd, "10:00", pabellon=1), _fila(bd, "12:00"), _fila(bd, "08:30")]
+    reporte = _importar(cliente, _ndjson(filas), "todo")
+    assert not reporte["confirmado"] and reporte["insertadas"] == 0
+    assert [e["linea"] for e in reporte["errores"]] == [4]
+    assert _cantidad() == 0
+
+
+def test_todo_confirma_varios_lotes(cliente, bd, lotes_de_dos):
+    filas = [_fila(bd, f"{h:02d}:00", pabellon=h % 2) for h in range(8, 15)]
+    reporte = _importar(cliente, _ndjson(filas), "todo")
+    assert reporte["confirmado"] and reporte["insertadas"] == 7
+    assert _cantidad() == 7
+
+
+def test_todo_mantiene_el_bloqueo_hasta_el_commit(cliente, bd, monkeypatch):
+    original = importacion.confirmar_o_revertir
+    concurrente = {}
+
+    def confirmar_con_reserva_concurrente(db, reporte, por_lote):
+        # Otro request quiere el mismo horario mientras la importación no confirma
+        hilo = threading.Thread(target=lambda: concurrente.update(
+            respuesta=cliente.post("/cirugias/", json=_fila(bd, "09:00"))
+        ))
+        hilo.start()
+        hilo.join(0.3)
+        concurrente["esperando"] = hilo.is_alive()
+        concurrente["hilo"] = hilo
+        return original(db, reporte, por_lote)
+
+    monkeypatch.setattr(importacion, "confirmar_o_revertir", confirmar_con_reserva_concurrente)
+    reporte = _importar(cliente, _ndjson([_fila(bd, "09:00")]), "todo")
+    concurrente["hilo"].join(10)
+
+    assert reporte["confirmado"]
+    assert concurrente["esperando"]
+    assert concurrente["respuesta"].status_code == 400
+    assert "Choque de horario" in concurrente["respuesta"].json()["detail"]
+    assert _cantidad() == 1
+
+
+def test_csv_con_campo_multilinea(cliente, bd):
+    cuerpo = (
+        'nombre,rut\n'
+        '"Ana\nMaría ""la Tía""",11.111.111-1\n'
+        'Pedro,5.126.663-4\n'
+        'Pedro,5.126.663-3\n'
+    ).encode()
+    reporte = _importar(cliente, cuerpo, "parcial", formato="csv", ruta="/pacientes/bulk")
+    assert reporte["insertadas"] == 2
+    # La línea física del RUT inválido se mantiene pese al registro de dos líneas
+    assert [e["linea"] for e in reporte["errores"]] == [4]
+
+    db = SessionLocal()
+    ana = db.query(models.Paciente).filter_by(rut_normalizado="11111111-1").one()
+    assert ana.nombre == 'Ana\nMaría "la Tía"'
+    db.close()
+
+
+def test_csv_con_comillas_sin_cerrar(cliente, bd):
+    cuerpo = 'nombre,rut\nPedro,5.126.663-3\n"Ana,11.111.111-1\nLuis,12.345.678-5\n'.encode()
+    reporte = _importar(cliente, cuerpo, "parcial", formato="csv", ruta="/pacientes/bulk")
+    assert reporte["insertadas"] == 1
+    assert [e["linea"] for e in reporte["errores"]] == [3]
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.rut import digito_verificador, limpiar_rut, normalizar_rut
+from app.db import models
+from app.db.database import SessionLocal, engine
+from app.db.migraciones import rellenar_rut_normalizado
+
+
+# -----------------------------
+# RUT (módulo 11)
+# -----------------------------
+@pytest.mark.parametrize("cuerpo, dv", [("12345678", "5"), ("11111111", "1"), ("5126663", "3"),
+                                        ("10000013", "K"), ("1000013", "0")])
+def test_digito_verificador(cuerpo, dv):
+    assert digito_verificador(cuerpo) == dv
+
+
+@pytest.mark.parametrize("entrada, canonico", [
+    ("12.345.678-5", "12345678-5"), ("012345678-5", "12345678-5"),
+    ("10.000.013-k", "10000013-K"), (" 12345678 5 ", "12345678-5"), ("", None), (None, None),
+])
+def test_normalizar_rut(entrada, canonico):
+    assert normalizar_rut(entrada) == canonico
+
+
+@pytest.mark.parametrize("entrada", ["12.345.678-4", "abc", "123456789012-3"])
+def test_normalizar_rut_invalido(entrada):
+    with pytest.raises(ValueError):
+        normalizar_rut(entrada)
+
+
+def test_limpiar_rut_no_valida_el_digito():
+    assert limpiar_rut("12.345.678-4") == "12345678-4"
+
+
+# -----------------------------
+# Crear / actualizar
+# -----------------------------
+def test_crear_valida_rut_y_unicidad(cliente):
+    assert cliente.post("/pacientes/", json={"nombre": "Ana", "rut": "11.111.111-2"}).status_code == 400
+    r = cliente.post("/pacientes/", json={"nombre": "Ana", "rut": "11.111.111-1"})
+    assert r.status_code == 200
+    # Misma forma canónica escrita de otra manera
+    r = cliente.post("/pacientes/", json={"nombre": "Otra Ana", "rut": "11111111-1"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Ya existe un paciente con ese RUT"
+
+
+def test_actualizar_valida_rut_y_unicidad(cliente, bd):
+    ana = cliente.post("/pacientes/", json={"nombre": "Ana", "rut": "11.111.111-1"}).json()
+    assert cliente.put(f"/pacientes/{ana['id']}", json={"rut": "11.111.111-2"}).status_code == 400
+    # 12.345.678-5 es el paciente sembrado
+    r = cliente.put(f"/pacientes/{ana['id']}", json={"rut": "12.345.678-5"})
+    assert r.status_code == 400
+    r = cliente.put(f"/pacientes/{ana['id']}", json={"rut": "5.126.663-3"})
+    assert r.status_code == 200
+    assert r.json()["rut"] == "5.126.663-3"
+
+
+def _pacientes_antiguos_duplicados():
+    # Dos RUT antiguos con la misma forma canónica, cargados antes del índice:
+    # el backfill deja al segundo sin rut_normalizado
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO pacientes (nombre, rut) VALUES ('Legado Uno', '9.876.543-3'), ('Legado Dos', '9876543-3')"
+        ))
+    rellenar_rut_normalizado()
+    db = SessionLocal()
+    filas = db.query(models.Paciente).filter(models.Paciente.nombre.like("Legado%")).order_by(models.Paciente.id).all()
+    db.close()
+    return filas
+
+
+def test_backfill_deja_sin_normalizar_al_duplicado_antiguo(bd):
+    uno, dos = _pacientes_antiguos_duplicados()
+    assert uno.rut_normalizado == "9876543-3"
+    assert dos.rut_normalizado is None
+
+
+def test_editar_otro_dato_de_un_duplicado_antiguo(cliente, bd):
+    _, dos = _pacientes_antiguos_duplicados()
+    # El formulario de edición reenvía el RUT tal cual
+    r = cliente.put(f"/pacientes/{dos.id}", json={"nombre": "Legado Dos Corregido", "rut": dos.rut})
+    assert r.status_code == 200, r.text
+    assert r.json()["nombre"] == "Legado Dos Corregido"
+
+    db = SessionLocal()
+    fila = db.get(models.Paciente, dos.id)
+    assert fila.rut_normalizado is None
+    assert fila.nombre_normalizado == "legado dos corregido"
+    db.close()
+
+    # Cambiarle el RUT por el del otro duplicado sí choca
+    r = cliente.put(f"/pacientes/{dos.id}", json={"rut": "9.876.543-3"})
+    assert r.status_code == 400
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from app.core import planificador
+from app.db import models
+from app.db.database import SessionLocal
+from app.db.models import EstadoCirugia
+
+from conftest import MANANA
+
+
+def _casos(bd, n=4, doctor=True):
+    return [dict(tipo_cirugia_id=bd["tipo"], doctor_id=bd["doctor"] if doctor else None,
+                 paciente_id=bd["paciente"], duracion_programada=60) for _ in range(n)]
+
+
+def test_plan_no_superpone_al_doctor_con_su_agenda(cliente, bd, cirugia):
+    cirugia("08:00", pabellon=1, duracion=120)
+    r = cliente.post("/cirugias/planificar", json=dict(fecha=MANANA.isoformat(), casos=_casos(bd, 3)))
+    assert r.status_code == 200
+    plan = r.json()
+    assert len(plan["asignaciones"]) == 3
+    # El doctor está ocupado de 08:00 a 10:00, y sus casos no pueden solaparse entre sí
+    inicios = sorted(a["hora_inicio"] for a in plan["asignaciones"])
+    assert inicios[0] >= "10:00"
+    assert len(set(inicios)) == 3
+
+
+def test_confirmar_plan_guarda_las_cirugias(cliente, bd):
+    r = cliente.post("/cirugias/planificar", json=dict(fecha=MANANA.isoformat(), casos=_casos(bd, 3), dry_run=False))
+    assert r.status_code == 200
+    assert len(r.json()["cirugia_ids"]) == 3
+
+
+def test_plan_obsoleto_por_el_doctor_responde_409(cliente, bd, monkeypatch):
+    original = planificador.planificar
+
+    def planificar_y_agendar_al_doctor(db, fecha, casos, *args):
+        resultado = original(db, fecha, casos, *args)
+        # Entre el cálculo y el bloqueo, otro request agenda al mismo doctor en
+        # un pabellón que no participa del plan, justo a la hora del primer caso
+        primera = resultado[0][0]
+        otro = models.Pabellon(nombre="Pabellón externo")
+        externa = SessionLocal()
+        externa.add(otro)
+        externa.flush()
+        externa.add(models.Cirugia(
+            paciente_id=bd["paciente"], doctor_id=bd["doctor"], tipo_cirugia_id=bd["tipo"], pabellon_id=otro.id,
+            fecha=primera["fecha"], hora_inicio=primera["hora_inicio"], duracion_programada=30,
+            extra_time=0, estado=EstadoCirugia.PROGRAMADA, es_aseo=False,
+        ))
+        externa.commit()
+        externa.close()
+        return resultado
+
+    monkeypatch.setattr(planificador, "planificar", planificar_y_agendar_al_doctor)
+    r = cliente.post("/cirugias/planificar", json=dict(fecha=MANANA.isoformat(), casos=_casos(bd, 2), dry_run=False))
+    assert r.status_code == 409
+
+    db = SessionLocal()
+    # Solo quedó la cirugía agendada "por fuera": el plan no se guardó
+    assert db.query(models.Cirugia).count() == 1
+    db.close()
+
+
+def test_choques_doctores_ignora_casos_sin_doctor(sesion, bd):
+    inicio = datetime.combine(MANANA, datetime.min.time()) + timedelta(hours=9)
+    asignaciones = [dict(indice=0, fecha=MANANA, hora_inicio=inicio.time(), duracion_programada=60)]
+    casos = [type("Caso", (), {"doctor_id": None})()]
+    assert planificador.choques_doctores(sesion, MANANA, casos, asignaciones) == []
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.diagnostico import contar_consultas
+from app.core.principales import CachePrincipales, Principal, principales
+
+from conftest import cabeceras, token
+
+
+def _principal(id=1, username="doc", activo=True):
+    return Principal(id, username, "Dr House", "Doctor", activo)
+
+
+# -----------------------------
+# Caché
+# -----------------------------
+def test_guardar_con_generacion_vieja_se_descarta():
+    cache = CachePrincipales()
+    _, generacion = cache.obtener("doc")
+    # Se invalida mientras la lectura de BD estaba en curso
+    cache.invalidar("doc")
+    cache.guardar(_principal(), generacion)
+    assert cache.obtener("doc")[0] is None
+
+
+def test_invalidar_por_id():
+    cache = CachePrincipales()
+    cache.guardar(_principal(id=7, username="doc"), cache.obtener("doc")[1])
+    cache.invalidar(usuario_id=7)
+    assert cache.obtener("doc")[0] is None
+
+
+def test_ttl_y_maximo():
+    cache = CachePrincipales(ttl=0.05, maximo=2)
+    for i, nombre in enumerate(["a", "b", "c"]):
+        cache.guardar(_principal(id=i, username=nombre), cache.obtener(nombre)[1])
+    # "a" salió por LRU
+    assert cache.obtener("a")[0] is None
+    assert cache.obtener("c")[0] is not None
+    time.sleep(0.06)
+    assert cache.obtener("c")[0] is None
+
+
+def test_oyentes_reciben_la_invalidacion():
+    cache = CachePrincipales()
+    avisos = []
+    cache.al_invalidar(lambda username, usuario_id: avisos.append((username, usuario_id)))
+    cache.invalidar("doc")
+    cache.invalidar(usuario_id=3)
+    assert avisos == [("doc", None), (None, 3)]
+
+
+# -----------------------------
+# get_current_user
+# -----------------------------
+def _pabellones(cliente, username):
+    return cliente.get("/pabellones/", headers=cabeceras(username))
+
+
+def test_principal_en_cache_no_consulta_la_bd(cliente):
+    assert _pabellones(cliente, "doc").status_code == 200
+    with contar_consultas() as conteo:
+        assert _pabellones(cliente, "doc").status_code == 200
+    assert conteo.total == 0
+
+
+def test_desactivar_rige_de_inmediato(cliente, bd):
+    assert _pabellones(cliente, "doc").status_code == 200
+    r = cliente.put(f"/usuarios/{bd['doctor']}", json={"es_activo": False})
+    assert r.status_code == 200, r.text
+    assert _pabellones(cliente, "doc").status_code == 455
+
+    cliente.put(f"/usuarios/{bd['doctor']}", json={"es_activo": True})
+    assert _pabellones(cliente, "doc").status_code == 200
+
+
+def test_eliminar_rige_de_inmediato(cliente, bd):
+    assert _pabellones(cliente, "doc2").status_code == 200
+    assert cliente.delete(f"/usuarios/{bd['otro_doctor']}").status_code == 200
+    assert _pabellones(cliente, "doc2").status_code == 401
+
+
+def test_cambio_de_rol_rige_de_inmediato(cliente, bd):
+    reset = f"/usuarios/{bd['doctor']}/reset-password"
+    assert cliente.post(reset, json={"password": "x"}, headers=cabeceras("doc2")).status_code == 403
+    cliente.put(f"/usuarios/{bd['otro_doctor']}", json={"rol": "Admin"})
+    assert cliente.post(reset, json={"password": "x"}, headers=cabeceras("doc2")).status_code == 200
+
+
+def test_invalidar_cierra_el_websocket_del_usuario(cliente, bd):
+    with cliente.websocket_connect(f"/ws/tablero?token={token('doc')}") as ws:
+        cliente.put(f"/usuarios/{bd['doctor']}", json={"es_activo": False})
+        with pytest.raises(WebSocketDisconnect) as cierre:
+            ws.receive_text()
+    assert cierre.value.code == 1008
+    assert principales.estadisticas()["invalidaciones"] >= 1
@@ -0,0 +1,91 @@
+from datetime import datetime, time
+from types import SimpleNamespace
+
+from app.core import agenda
+
+from conftest import MANANA
+
+
+def _en(hora: str, dia=MANANA) -> datetime:
+    return datetime.combine(dia, time.fromisoformat(hora))
+
+
+def _ventana(desde="08:00", hasta="12:00"):
+    return {"desde": _en(desde).isoformat(), "hasta": _en(hasta).isoformat()}
+
+
+# -----------------------------
+# Sweep-line
+# -----------------------------
+def test_redondear_a_la_granularidad():
+    assert agenda.redondear(_en("08:00")) == _en("08:00")
+    assert agenda.redondear(_en("08:00:30")) == _en("08:05")
+    assert agenda.redondear(_en("08:06")) == _en("08:10")
+
+
+def test_huecos_entre_ocupaciones():
+    ocupados = [(_en("09:00"), _en("10:30")), (_en("10:40"), _en("11:00"))]
+    assert list(agenda.huecos(ocupados, _en("08:00"), _en("12:00"), 60)) == [
+        (_en("08:00"), _en("09:00")), (_en("11:00"), _en("12:00")),
+    ]
+    # El hueco de 10 minutos entre las dos no alcanza
+    assert list(agenda.huecos(ocupados, _en("08:30"), _en("12:00"), 45)) == [(_en("11:00"), _en("12:00"))]
+
+
+def test_huecos_con_ocupacion_que_cruza_el_inicio():
+    ocupados = [(_en("07:00"), _en("08:17"))]
+    assert list(agenda.huecos(ocupados, _en("08:00"), _en("09:00"), 30)) == [(_en("08:20"), _en("09:00"))]
+
+
+def test_primeros_huecos_prefiere_pabellones_simples():
+    compleja = SimpleNamespace(id=1, es_compleja=True)
+    simples = [SimpleNamespace(id=2, es_compleja=False), SimpleNamespace(id=3, es_compleja=False)]
+    encontrados = agenda.primeros_huecos({}, [compleja] + simples, _en("08:00"), _en("12:00"), 90, 3)
+    assert [(ini, p.id) for ini, _, p in encontrados] == [(_en("08:00"), 2), (_en("08:00"), 3), (_en("08:00"), 1)]
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+def test_slots_saltan_lo_ocupado(cliente, bd, cirugia):
+    # Pabellones 2 y 3 (simples) ocupados 08:00-09:30 (60 min + aseo)
+    cirugia("08:00", pabellon=1)
+    cirugia("08:00", pabellon=2)
+    r = cliente.get("/cirugias/slots", params=dict(tipo_cirugia_id=bd["tipo"], limite=3, **_ventana()))
+    assert r.status_code == 200
+    slots = [(s["hora_inicio"], s["pabellon_id"]) for s in r.json()]
+    p = bd["pabellones"]
+    assert slots == [("08:00:00", p[0]), ("09:30:00", p[1]), ("09:30:00", p[2])]
+    assert r.json()[0]["fin_ocupacion"] == _en("09:30").isoformat()
+
+
+def test_slots_complejos_solo_en_pabellon_complejo(cliente, bd, cirugia):
+    cirugia("08:00", pabellon=0)
+    r = cliente.get("/cirugias/slots", params=dict(tipo_cirugia_id=bd["tipo"], compleja=True, **_ventana()))
+    assert {s["pabellon_id"] for s in r.json()} == {bd["pabellones"][0]}
+    assert r.json()[0]["hora_inicio"] == "09:30:00"
+
+
+def test_slots_sin_hueco_en_la_ventana(cliente, bd, cirugia):
+    cirugia("08:00", pabellon=0, duracion=200)
+    r = cliente.get("/cirugias/slots", params=dict(tipo_cirugia_id=bd["tipo"], compleja=True, **_ventana()))
+    assert r.json() == []
+
+
+def test_slots_valida_la_solicitud(cliente, bd):
+    r = cliente.get("/cirugias/slots", params=dict(tipo_cirugia_id=9999, **_ventana()))
+    assert r.status_code == 404
+    r = cliente.get("/cirugias/slots", params=dict(tipo_cirugia_id=bd["tipo"], **_ventana("10:00", "09:00")))
+    assert r.status_code == 400
+
+
+def test_slots_lote_reserva_cada_hueco_asignado(cliente, bd, cirugia):
+    cirugia("08:00", pabellon=1)
+    cirugia("08:00", pabellon=2)
+    solicitud = dict(tipo_cirugia_id=bd["tipo"], compleja=True, **_ventana())
+    r = cliente.post("/cirugias/slots/lote", json=[solicitud, solicitud, dict(solicitud, tipo_cirugia_id=9999)])
+    assert r.status_code == 200
+    primero, segundo, tercero = r.json()
+    assert primero["slot"]["hora_inicio"] == "08:00:00"
+    assert segundo["slot"]["hora_inicio"] == "09:30:00"
+    assert tercero["error"] == "Tipo de cirugía no encontrado"
@@ -1,6 +1,7 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { Store } from '@ngrx/store';
 import { ApiService } from 'src/app/shared/services/api.service';
+import { CirugiasService } from 'src/app/shared/services/cirugias.service';
 import { animate, style, transition, trigger } from '@angular/animations';
 
 @Component({
@@ -13,7 +14,7 @@ import { animate, style, transition, trigger } from '@angular/animations';
         ]),
     ],
 })
-export class DashboardComponent implements OnInit {
+export class DashboardComponent implements OnInit, OnDestroy {
     store: any;
     isLoading = true;
     
@@ -29,22 +30,37 @@ export class DashboardComponent implements OnInit {
     // Configuración del Gráfico
     cirugiasChart: any;
 
+    pollingInterval: any;
+    socket: WebSocket | null = null;
+
     constructor(
         public storeData: Store<any>, 
-        private api: ApiService
+        private api: ApiService,
+        private cirugiasService: CirugiasService
     ) {
         this.initStore();
     }
 
-ngOnInit() {
-    this.cargarDatosDashboard();
-    
-    // Auto-actualizar cada 30 segundos para detectar cambios y alertas
-    setInterval(() => {
+    ngOnInit() {
         this.cargarDatosDashboard();
-        // Aquí podrías comparar los datos nuevos con los viejos y lanzar Swal.fire() si algo cambió
-    }, 30000); 
-}
+        this.conectarTiempoReal();
+        // El polling queda solo como respaldo mientras el WebSocket esté caído
+        this.pollingInterval = setInterval(() => { if (!this.socket || this.socket.readyState !== WebSocket.OPEN) this.cargarDatosDashboard(true); }, 30000);
+    }
+    ngOnDestroy() {
+        if (this.pollingInterval) clearInterval(this.pollingInterval);
+        if (this.socket) { this.socket.onclose = null; this.socket.close(); }
+    }
+
+    // Cualquier cambio del tablero (creada, movida, estado, importada...) mueve los KPIs
+    conectarTiempoReal() {
+        this.socket = this.cirugiasService.conectarTablero();
+        this.socket.onmessage = (msg: MessageEvent) => {
+            const evento = JSON.parse(msg.data);
+            if (evento.tipo !== 'ping') this.cargarDatosDashboard(true);
+        };
+        this.socket.onclose = () => { this.socket = null; setTimeout(() => this.conectarTiempoReal(), 5000); };
+    }
 
     async initStore() {
         this.storeData.select((d) => d.index).subscribe((d) => {
@@ -56,8 +72,8 @@ ngOnInit() {
         });
     }
 
-    cargarDatosDashboard() {
-        this.isLoading = true;
+    cargarDatosDashboard(silent = false) {
+        if (!silent) this.isLoading = true;
         this.api.getDashboardResumen().subscribe({
             next: (data) => {
                 this.kpis = data.kpis;
@@ -4,7 +4,7 @@ import { animate, style, transition, trigger } from '@angular/animations';
 import { ModalComponent } from 'angular-custom-modal';
 import { ApiService } from '@shared/services/api.service';
 import { CirugiasService } from '@shared/services/cirugias.service';
-import { forkJoin, of } from 'rxjs';
+import { of } from 'rxjs';
 import { catchError } from 'rxjs/operators';
 
 @Component({
@@ -25,7 +25,9 @@ export class ScrumCirugiasComponent implements OnInit, OnDestroy {
     pacientes: any[] = [];
     doctores: any[] = [];
     tiposCirugia: any[] = [];
+    referencialesCargados = false;
     pollingInterval: any;
+    socket: WebSocket | null = null;
 
     paramsCirugia: any = { id: null, paciente_id: null, doctor_id: null, tipo_cirugia_id: null, pabellon_id: null, fecha: '', hora_inicio: '', duracion_programada: '', extra_time: 0 };
     @ViewChild('isAddCirugiaModal') isAddCirugiaModal!: ModalComponent;
@@ -34,41 +36,54 @@ export class ScrumCirugiasComponent implements OnInit, OnDestroy {
 
     ngOnInit(): void {
         this.cargarDatos();
-        this.pollingInterval = setInterval(() => this.cargarDatos(true), 10000);
+        this.conectarTiempoReal();
+        // El polling queda solo como respaldo mientras el WebSocket esté caído
+        this.pollingInterval = setInterval(() => { if (!this.socket || this.socket.readyState !== WebSocket.OPEN) this.cargarDatos(true); }, 10000);
+    }
+    ngOnDestroy() {
+        if (this.pollingInterval) clearInterval(this.pollingInterval);
+        if (this.socket) { this.socket.onclose = null; this.socket.close(); }
+    }
+
+    conectarTiempoReal() {
+        this.socket = this.cirugiasService.conectarTablero();
+        this.socket.onmessage = (msg: MessageEvent) => {
+            const evento = JSON.parse(msg.data);
+            if (evento.tipo !== 'ping') this.cargarPabellones(true);
+        };
+        this.socket.onclose = () => { this.socket = null; setTimeout(() => this.conectarTiempoReal(), 5000); };
     }
-    ngOnDestroy() { if (this.pollingInterval) clearInterval(this.pollingInterval); }
 
     cargarDatos(silent = false) {
         this.cirugiasService.actualizarEstados().subscribe({
-            next: () => { this.cargarReferenciales(); this.cargarPabellones(silent); },
-            error: () => { this.cargarReferenciales(); this.cargarPabellones(silent); }
+            next: () => this.cargarPabellones(silent),
+            error: () => this.cargarPabellones(silent)
         });
     }
 
+    // Los nombres de las tarjetas vienen inline en el tablero; los catálogos
+    // completos solo se necesitan para los selects del modal (una vez)
     cargarReferenciales() {
+        if (this.referencialesCargados) return;
+        this.referencialesCargados = true;
         this.api.getPacientes().subscribe(p => this.pacientes = p || []);
         this.api.getTiposCirugia().subscribe(t => this.tiposCirugia = t || []);
         this.api.getUsuarios().subscribe(u => this.doctores = (u || []).filter((x: any) => x.rol === 'Doctor' || x.rol === 'Medico'));
     }
 
     cargarPabellones(silent = false) {
-        this.api.getPabellones().pipe(catchError(() => of([]))).subscribe((pabellonesData: any[]) => {
-            if (!pabellonesData) return;
-            const llamadas$ = pabellonesData.map(p => this.cirugiasService.listarCirugias(p.id).pipe(catchError(() => of([]))));
-
-            forkJoin(llamadas$).subscribe((resultados: any[]) => {
-                const datosEntrantes = pabellonesData.map((p, i) => ({ ...p, tasks: resultados[i] || [] }));
-
-                if (!silent || this.pabellones.length === 0) {
-                    this.pabellones = datosEntrantes;
-                } else {
-                    this.fusionarDatos(datosEntrantes);
-                }
-                
-                // Forzamos actualización de vista
-                this.pabellones = [...this.pabellones];
-                this.cdr.detectChanges();
-            });
+        this.cirugiasService.obtenerTablero().pipe(catchError(() => of([]))).subscribe((datosEntrantes: any[]) => {
+            if (!datosEntrantes) return;
+
+            if (!silent || this.pabellones.length === 0) {
+                this.pabellones = datosEntrantes;
+            } else {
+                this.fusionarDatos(datosEntrantes);
+            }
+
+            // Forzamos actualización de vista
+            this.pabellones = [...this.pabellones];
+            this.cdr.detectChanges();
         });
     }
 
@@ -159,6 +174,7 @@ export class ScrumCirugiasComponent implements OnInit, OnDestroy {
 
     abrirModalCrear(pid: number) { this.editarCirugia(pid); }
     editarCirugia(arg: any, c: any = null) {
+        this.cargarReferenciales();
         if (c) this.paramsCirugia = { ...c };
         else this.paramsCirugia = { id: null, pabellon_id: arg, fecha: new Date().toISOString().split('T')[0], hora_inicio: '', duracion_programada: 60, extra_time: 0 };
         this.isAddCirugiaModal.open();
@@ -189,7 +205,4 @@ export class ScrumCirugiasComponent implements OnInit, OnDestroy {
         if (estado === 'FINALIZADA') return 'badge-outline-success';
         return 'badge-outline-primary';
     }
-    getPacienteNombre(id: number): string { return this.pacientes.find(p => p.id === id)?.nombre || 'Paciente'; }
-    getDoctorNombre(id: number): string { return this.doctores.find(d => d.id === id)?.nombre_completo || 'Doctor'; }
-    getTipoNombre(id: number): string { return this.tiposCirugia.find(t => t.id === id)?.nombre || 'Cirugía'; }
 }
\ No newline at end of file
@@ -91,6 +91,14 @@ export class ApiService {
         return this.http.get<any[]>(`${this.baseUrl}/tipos-cirugia/`, { headers });
     }
 
+    // --------------------------
+    // CATÁLOGOS (pabellones + tipos en una llamada, con versión/ETag)
+    // --------------------------
+    getCatalogos(): Observable<any> {
+        const headers = this.getAuthHeaders();
+        return this.http.get<any>(`${this.baseUrl}/catalogos/`, { headers });
+    }
+
     // --------------------------
     // USUARIOS (Doctores)
     // --------------------------
@@ -19,15 +19,23 @@ export class CirugiasService {
   }
 
   // --- LECTURA ---
-  listarCirugias(pabellonId?: number): Observable<any[]> {
+  // expand: 'paciente,doctor,tipo,pabellon' → nombres inline (sin descargar catálogos)
+  listarCirugias(pabellonId?: number, expand?: string): Observable<any[]> {
     const headers = this.getAuthHeaders();
-    let url = `${this.BASE_URL}/`; 
-    if (pabellonId) url += `?pabellon_id=${pabellonId}`;
-    return this.http.get<any[]>(url, { headers });
+    const params: any = {};
+    if (pabellonId) params.pabellon_id = pabellonId;
+    if (expand) params.expand = expand;
+    return this.http.get<any[]>(`${this.BASE_URL}/`, { headers, params });
   }
 
   getCirugias(): Observable<any[]> { return this.listarCirugias(); }
 
+  // Snapshot del tablero: pabellones + cirugías en una sola llamada
+  obtenerTablero(): Observable<any[]> {
+    const headers = this.getAuthHeaders();
+    return this.http.get<any[]>(`${this.BASE_URL}/tablero`, { headers });
+  }
+
   // --- ESCRITURA ---
   crearCirugia(data: any): Observable<any> {
     const headers = this.getAuthHeaders();
@@ -67,6 +75,12 @@ export class CirugiasService {
     return this.http.patch(`${this.BASE_URL}/${id}`, { pabellon_id: nuevoPabellonId }, { headers });
   }
 
+  // Canal push del tablero (eventos: creada, movida, estado, extra, eliminada...)
+  conectarTablero(): WebSocket {
+    const token = this.cookieService.get('token');
+    return new WebSocket(`${environment.api.replace(/^http/, 'ws')}/ws/tablero?token=${token}`);
+  }
+
   actualizarEstados(): Observable<any> {
     const headers = this.getAuthHeaders();
     return this.http.post(`${environment.api}/cirugias/actualizar-estados`, {}, { headers });
@@ -31,6 +31,16 @@ export class PacienteService {
     });
   }
 
+  // -------------------------------------------------------
+  // GET /pacientes/buscar?q=  → Typeahead por nombre o RUT
+  // -------------------------------------------------------
+  buscarPacientes(q: string, limite = 10): Observable<any[]> {
+    return this.http.get<any[]>(`${this.URL}/buscar`, {
+      headers: this.getAuthHeaders(),
+      params: { q, limite }
+    });
+  }
+
   // -------------------------------------------------------
   // POST /pacientes/  → Crear Paciente
   // -------------------------------------------------------